@@ -9,14 +9,53 @@ import json
 import datetime
 import hmac
 import hashlib
-import requests
+import threading
 import time
+import random
+import functools
+import importlib
+import operator
+import re
+import bisect
+import atexit
+import warnings
+import copy
+import csv
+import io
+import itertools
+import collections
+import asyncio
+import sqlite3
+import email.utils
 import urllib.parse
 import urllib.request
-import pandas as pd
-import numpy as np
+import concurrent.futures
 from enum import Enum
 
+class _LazyModule:
+    # Stand-in for a third-party module (pandas, numpy, requests) that is imported on first attribute access,
+    # so `import dbapi` stays cheap for health checks and *_json calls; submodules listed in `load` are
+    # imported along with it. Standard library modules are imported normally.
+    def __init__(self, name:str, *load):
+        self._name = name
+        self._load = load
+        self._module = None
+
+    def __getattr__(self, attr):
+        module = self._module
+        if module is None:
+            for name in self._load:
+                importlib.import_module(name)
+            module = self._module = importlib.import_module(self._name)
+        return getattr(module, attr)
+
+    def __repr__(self):
+        return f'<lazy module {self._name!r}{"" if self._module is None else " (loaded)"}>'
+
+requests = _LazyModule('requests','requests.adapters')
+pd = _LazyModule('pandas')
+np = _LazyModule('numpy')
+
 class DateOption(Enum):
     StartAndEnd=0
     Start=1
@@ -53,6 +92,20 @@ class BasketFrequency(Enum):
     ANNDEC=203
     ANNUAL=203
 
+class ConversionType(Enum):
+    Constant=0
+    Linear=1
+    Cubic=2
+    Discrete=3
+
+class TransformationType(Enum):
+    NONE=0
+    YearOverYearPctChange=1
+    SimpleDifference=2
+    AnnualizedGrowth=3
+    PctChange=4
+    YearOverYearDiff=8
+
 class DBFileType(Enum):
     Access_ACE12_1Tbl=32
     Access_ACE12_2Tbl=33
@@ -78,164 +131,2364 @@ class DBFileType(Enum):
     XML=13
     TextDat2=8
 
+# API frequency names to pandas offset aliases
+_FREQ_DICT = {'DAILY':'D','BUSINESS':'B','BUSINS':'B',\
+              'WSUNDAY':'W-SUN','WSUN':'W-SUN','WMON':'W-MON','WMONDAY':'W-MON','WTUESDAY':'W-TUE','WTUE':'W-TUE','WWEDNESDAY':'W-WED',\
+              'WWED':'W-WED','WTHURSDAY':'W-THU','WTHU':'W-THU','WFRI':'W-FRI','WFRIDAY':'W-FRI','WSAT':'W-SAT','WSATURDAY':'W-SAT',\
+              'BWSUN1':'W-SUN','BWMON1':'W-MON','BWTUE1':'W-TUE','BWWED1':'W-WED','BWTHU1':'W-THU','BWFRI1':'W-FRI','BWSAT1':'W-SAT',\
+              'BWSUN2':'W-SUN','BWMON2':'W-MON','BWTUE2':'W-TUE','BWWED2':'W-WED','BWTHU2':'W-THU','BWFRI2':'W-FRI','BWSAT2':'W-SAT',\
+              'SEMMON':'SM','MONTH':'M','MONTHLY':'M','BIMNOV':'2M','BIMDEC':'2M','QTROCT':'Q-OCT','QTRNOV':'Q-NOV','QTRDEC':'Q-DEC','QUARTERLY':'Q-DEC',\
+              'SEMJUL':'6M','SEMAUG':'6M','SEMSEP':'6M','SEMOCT':'6M','SEMNOV':'6M','SEMIANNUAL':'6M','SEMDEC':'6M',\
+              'ANNJAN':'A-JAN','ANNFEB':'A-FEB','ANNMAR':'A-MAR','ANNAPR':'A-APR','ANNMAY':'A-MAY','ANNJUN':'A-JUN','ANNJUL':'A-JUL',\
+              'ANNAUG':'A-AUG','ANNSEP':'A-SEP','ANNOCT':'A-OCT','ANNNOV':'A-NOV','ANNUAL':'A-DEC','ANNDEC':'A-DEC'}
+
+# value used by Data Buffet for missing observations (ND)
+MISSING_VALUE = -3.4028234663852886e+38
+
+def _decode_values(data):
+    # one bulk conversion to float64 and one vectorized sentinel mask (None also becomes NaN)
+    values = np.array(data, dtype=np.float64)
+    values[values == MISSING_VALUE] = np.nan
+    return values
+
+# JSON decoding straight from response bytes, with the standard library unless set_json_backend() picks orjson
+# or ujson. json_loads_arrays() also turns the numeric observation arrays of series payloads (/series, basket
+# output) into float64 arrays without holding a Python float per value.
+
+_JSON_BACKEND = {}
+_NUMERIC_ARRAY = re.compile(rb'("data"\s*:\s*)\[([-+0-9.eEnul,\s]*)\]')
+_ARRAY_MARK = '\x00dbapi-array:'
+# where the observation arrays are, per endpoint ('*' is every item of a list)
+_SERIES_ARRAYS = {'series':('data','data'),'baskets/{id}/output-file':('series','*','data','data')}
+
+def set_json_backend(name:str='json'):
+    # 'json' (the standard library, the default), 'orjson', 'ujson', or 'fastest' for the fastest one installed;
+    # returns the name in use
+    if name not in ('json','orjson','ujson','fastest'):
+        raise Exception(f'Error - unknown JSON backend {name}')
+    for candidate in (['orjson','ujson','json'] if name == 'fastest' else [name]):
+        try:
+            loads = json.loads if candidate == 'json' else importlib.import_module(candidate).loads
+        except ImportError:
+            if name != 'fastest':
+                raise Exception(f'Error - JSON backend {name} is not installed')
+            continue
+        _JSON_BACKEND.update(name=candidate,loads=loads)
+        return candidate
+
+def json_backend():
+    return _JSON_BACKEND.get('name','json')
+
+def json_loads(data):
+    # data : bytes or str
+    return _JSON_BACKEND.get('loads',json.loads)(data)
+
+def json_loads_arrays(data:bytes, path:tuple=_SERIES_ARRAYS['series']):
+    # json_loads with the numeric arrays at `path` (keys; by default the data.data of a /series response)
+    # returned as float64 arrays (null becomes NaN; the ND sentinel is left as sent). Candidate "data" arrays
+    # are cut out of the document before parsing, so the JSON backend only builds Python objects for the
+    # metadata; a cut array that is not at `path` or not all numbers comes back as the list it was.
+    if isinstance(data,str):
+        data = data.encode('utf-8')
+    spans = []
+    def cut(m):
+        spans.append(m.span(2))
+        return m.group(1) + b'"\\u0000dbapi-array:%d"' % (len(spans) - 1)
+    ret = json_loads(_NUMERIC_ARRAY.sub(cut,data))
+    if spans:
+        _put_arrays(ret,data,spans,path)
+    return ret
+
+def _parse_array(text:bytes):
+    # float64 array of the elements of a JSON array, or None unless they are all numbers or null. numpy's own
+    # text parser with the standard library backend; a fast backend parses one array at a time (a short-lived
+    # list for a single series, never for the whole payload), which is quicker
+    if json_backend() == 'json':
+        if not text.strip():
+            return np.empty(0,dtype=np.float64)
+        try:
+            values = np.fromstring(text.replace(b'null',b'nan').decode('ascii'),dtype=np.float64,sep=',')
+        except (ValueError, DeprecationWarning):
+            # malformed elements stop the parser (with a DeprecationWarning, an error under -W error or in later numpy)
+            return None
+        return values if len(values) == text.count(b',') + 1 else None
+    try:
+        values = np.array(json_loads(b'[' + text + b']'),dtype=np.float64)
+    except (ValueError, TypeError):
+        return None
+    return values if values.ndim == 1 else None
+
+def _put_arrays(obj, data:bytes, spans:list, path:tuple):
+    # replace the placeholders left by json_loads_arrays: arrays where `path` leads, the original lists elsewhere;
+    # path is None off the path. Each array is sliced out of data only when parsed
+    items = obj.items() if isinstance(obj,dict) else enumerate(obj) if isinstance(obj,list) else ()
+    for k, v in items:
+        here = path[1:] if path and (path[0] == k or path[0] == '*' and isinstance(obj,list)) else None
+        if isinstance(v,str) and v.startswith(_ARRAY_MARK):
+            a, b = spans[int(v[len(_ARRAY_MARK):])]
+            values = _parse_array(data[a:b]) if here == () else None
+            obj[k] = values if values is not None else json_loads(b'[' + data[a:b] + b']')
+        elif isinstance(v,(dict,list)):
+            _put_arrays(v,data,spans,here)
+
+@functools.lru_cache(maxsize=4096)
+def _date_index(freq:str, start:str, periods:int):
+    # series with the same shape share one (immutable) DatetimeIndex
+    return pd.date_range(freq=freq, start=start, periods=periods)
+
+@functools.lru_cache(maxsize=4096)
+def _timestamp(value:str):
+    # metadata timestamps repeat a lot (dateExecuted is shared by a whole response)
+    if value is None:
+        return None
+    return pd.Timestamp(value)
+
+def _iter_json_array(path:str, key:str='series', chunk_size:int=1024*1024):
+    # incrementally yield the items of the top-level array `key` of a JSON file, holding roughly one item in memory
+    decoder = json.JSONDecoder()
+    pattern = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+    with open(path,'r',encoding='utf-8') as f:
+        buf = ''
+        eof = False
+        pos = -1
+        while pos < 0:
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buf = buf + chunk
+            m = pattern.search(buf)
+            if m is not None:
+                pos = m.end()
+            elif eof:
+                return
+            else:
+                buf = buf[-(len(key)+64):]
+        read_size = chunk_size
+        while True:
+            while pos < len(buf) and buf[pos] in ' \t\r\n,':
+                pos = pos + 1
+            if pos < len(buf) and buf[pos] == ']':
+                return
+            try:
+                if pos >= len(buf):
+                    raise ValueError('need more data')
+                item, end = decoder.raw_decode(buf, pos)
+            except ValueError:
+                if eof:
+                    raise ValueError(f'Truncated JSON array "{key}" in {path}')
+                # item spans the buffer boundary: drop the consumed items and read more (growing the read size
+                # for very large items)
+                chunk = f.read(read_size)
+                eof = not chunk
+                buf = buf[pos:] + chunk
+                pos = 0
+                read_size = read_size * 2
+                continue
+            read_size = chunk_size
+            yield item
+            pos = end
+
+def _to_frames(records):
+    # one preallocated DataFrame per frequency (shared index, one column per mnemonic) filled in a single pass
+    groups = {}
+    for record in records:
+        groups.setdefault(record[1],[]).append(record)
+    frames = {}
+    meta = []
+    for freq, group in groups.items():
+        indexes = [_date_index(freq, start, len(values)) for _, _, start, values, _ in group]
+        full = pd.date_range(freq=freq, start=min(i[0] for i in indexes if len(i)), end=max(i[-1] for i in indexes if len(i)))
+        firsts = full.get_indexer([i[0] if len(i) else full[0] for i in indexes])
+        arr = np.full((len(full),len(group)), np.nan, order='F')
+        for col, (record, index, first) in enumerate(zip(group, indexes, firsts)):
+            values = record[3]
+            if first >= 0 and full[first:first+len(values)].equals(index):
+                arr[first:first+len(values),col] = values
+            else:
+                pos = full.get_indexer(index)
+                arr[pos[pos >= 0],col] = values[pos >= 0]
+        frames[freq] = pd.DataFrame(arr, index=full, columns=[r[0] for r in group], copy=False)
+        meta.extend(dict(mnemonic=r[0], freq=freq, start=i[0] if len(i) else None, periods=len(i), **r[4]) for r, i in zip(group, indexes))
+    meta = pd.DataFrame.from_records(meta, columns=None if meta else ['mnemonic'])
+    return frames, meta.set_index('mnemonic')
+
+_META_FIELDS = ('description','source','observed','geography','concept','geo_code','last_history','date_created','date_updated','date_accessed')
+
+def _series_to_pandas(mnemonic:str, freq:str, start:str, values, meta:dict):
+    # pd.Series carrying the same attributes as DataBuffetAPI._to_pandas
+    ret = pd.Series(index=_date_index(freq,start,len(values)),data=values)
+    ret.mnemonic = mnemonic
+    for k in _META_FIELDS:
+        v = meta.get(k)
+        if k == 'last_history' and v is not None:
+            try:
+                v = pd.Period(v,freq=ret.index.freq).to_timestamp()
+            except ValueError:
+                pass
+        elif k.startswith('date_'):
+            v = _timestamp(v) if isinstance(v,str) else v
+        setattr(ret,k,v)
+    return ret
+
+class SeriesRecord:
+    # One series without pandas: slotted metadata plus a values array, with the start date and pandas
+    # frequency in place of a DatetimeIndex. to_pandas() builds the pd.Series on demand (it is not kept).
+    __slots__ = ('mnemonic','freq','start','values') + _META_FIELDS
+
+    def __init__(self, mnemonic:str, freq:str, start:str, values, **meta):
+        self.mnemonic = mnemonic
+        self.freq = freq
+        self.start = start
+        self.values = values
+        for k in _META_FIELDS:
+            setattr(self,k,meta.get(k))
+
+    def __len__(self):
+        return len(self.values)
+
+    def __repr__(self):
+        return f'SeriesRecord({self.mnemonic!r}, freq={self.freq!r}, start={self.start!r}, periods={len(self.values)}, dtype={self.values.dtype})'
+
+    @property
+    def meta(self):
+        return {k:getattr(self,k) for k in _META_FIELDS}
+
+    @property
+    def index(self):
+        return _date_index(self.freq,self.start,len(self.values))
+
+    def to_pandas(self):
+        return _series_to_pandas(self.mnemonic,self.freq,self.start,self.values,self.meta)
+
+class SeriesBatch:
+    # Many series packed into one contiguous values buffer: series i is buffer[offsets[i]:offsets[i+1]].
+    # Metadata is kept column-wise in plain lists; SeriesRecord views and pandas objects are only built for
+    # the series that are accessed (by position or mnemonic).
+    __slots__ = ('buffer','offsets','mnemonics','freqs','starts','meta','_positions')
+
+    def __init__(self, buffer, offsets, mnemonics:list, freqs:list, starts:list, meta:dict=None):
+        self.buffer = buffer
+        self.offsets = offsets
+        self.mnemonics = mnemonics
+        self.freqs = freqs
+        self.starts = starts
+        self.meta = meta if meta is not None else {k:[None]*len(mnemonics) for k in _META_FIELDS}
+        self._positions = None
+
+    @classmethod
+    def from_records(cls, records, dtype:str='float64'):
+        # records : (mnemonic, pandas freq, start, values, meta) tuples as made by DataBuffetAPI._series_arrays, from
+        # a list or any iterable; an iterable is consumed one record at a time into a buffer that grows as needed
+        size = sum(len(r[3]) for r in records) if isinstance(records,(list,tuple)) else 1024
+        buffer = np.empty(size,dtype=dtype)
+        offsets = [0]
+        mnemonics, freqs, starts = [], [], []
+        meta = {k:[] for k in _META_FIELDS}
+        for r in records:
+            end = offsets[-1] + len(r[3])
+            if end > len(buffer):
+                # no views of the buffer exist yet, so it can be reallocated in place
+                buffer.resize(max(end,2 * len(buffer)),refcheck=False)
+            buffer[offsets[-1]:end] = r[3]
+            offsets.append(end)
+            mnemonics.append(r[0])
+            freqs.append(r[1])
+            starts.append(r[2])
+            for k in _META_FIELDS:
+                meta[k].append(r[4].get(k))
+        if len(buffer) > offsets[-1]:
+            buffer.resize(offsets[-1],refcheck=False)
+        return cls(buffer, np.array(offsets,dtype=np.int64), mnemonics, freqs, starts, meta)
+
+    def __len__(self):
+        return len(self.mnemonics)
+
+    def __repr__(self):
+        return f'SeriesBatch({len(self)} series, {len(self.buffer)} values, dtype={self.buffer.dtype}, {self.nbytes:,} bytes)'
+
+    @property
+    def nbytes(self):
+        return self.buffer.nbytes + self.offsets.nbytes
+
+    def _position(self, key):
+        if isinstance(key,str):
+            if self._positions is None:
+                self._positions = {m.upper():i for i, m in enumerate(self.mnemonics)}
+            return self._positions[key.upper().strip()]
+        return range(len(self))[key]
+
+    def __contains__(self, mnemonic:str):
+        try:
+            self._position(mnemonic)
+        except KeyError:
+            return False
+        return True
+
+    def values(self, key):
+        # view of one series' values inside the shared buffer
+        i = self._position(key)
+        return self.buffer[self.offsets[i]:self.offsets[i+1]]
+
+    def __getitem__(self, key):
+        i = self._position(key)
+        return SeriesRecord(self.mnemonics[i], self.freqs[i], self.starts[i], self.values(i), **{k:v[i] for k, v in self.meta.items()})
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def to_pandas(self, key):
+        return self[key].to_pandas()
+
+    def to_dict(self):
+        # {mnemonic: pd.Series} for every series, as get_multiseries returns by default
+        return {r.mnemonic:r.to_pandas() for r in self}
+
+    def to_frames(self):
+        # (frames, meta) as returned by get_multiseries(as_frame=True)
+        return _to_frames((r.mnemonic, r.freq, r.start, r.values, r.meta) for r in self)
+
+    def to_columnar(self, path:str, format:str='parquet', compression:str='zstd', dtype:str=None):
+        # write_columnar(self, ...); read back with read_columnar(path)
+        return write_columnar(self,path,format,compression,dtype if dtype is not None else str(self.buffer.dtype))
+
+# Local transformations and frequency conversion on already-fetched data. Frames are (date x series)
+# DataFrames with a regular DatetimeIndex, as returned by get_multiseries(as_frame=True); every operation
+# works on the whole 2-D array at once. Results follow the documented definitions and may differ from
+# the server's in details (edge periods, ND handling); check with dbapi_validate_transforms.py.
+
+# numeric frequency codes of the `freq` request parameter (user guide, Enumerations)
+_FREQ_CODES = {49:'D',50:'B',65:'W-SUN',66:'W-MON',67:'W-TUE',68:'W-WED',69:'W-THU',70:'W-FRI',71:'W-SAT',112:'SM',128:'M',155:'2M',156:'2M',
+               170:'Q-OCT',171:'Q-NOV',172:'Q-DEC',183:'6M',184:'6M',185:'6M',186:'6M',187:'6M',188:'6M',
+               193:'A-JAN',194:'A-FEB',195:'A-MAR',196:'A-APR',197:'A-MAY',198:'A-JUN',199:'A-JUL',200:'A-AUG',201:'A-SEP',
+               202:'A-OCT',203:'A-NOV',204:'A-DEC'}
+
+_PERIODS_PER_YEAR = {'D':365,'B':260,'W':52,'SM':24,'M':12,'2M':6,'Q':4,'6M':2,'A':1}
+
+def _pandas_freq(freq):
+    # pandas alias for a numeric frequency code, a BasketFrequency, an API frequency name or a pandas alias
+    if isinstance(freq,BasketFrequency):
+        return _FREQ_DICT[freq.name]
+    if isinstance(freq,int):
+        return _FREQ_CODES[freq]
+    return _FREQ_DICT.get(str(freq).upper(),freq)
+
+def _periods_per_year(freq:str):
+    return _PERIODS_PER_YEAR[freq.split('-')[0]]
+
+def _aggregation(observed):
+    # how an observation summarizes its period, from the series' observedAttribute
+    observed = str(observed or '').upper()
+    for key, how in (('SUM','sum'),('TOTAL','sum'),('END','last'),('BEGIN','first'),('START','first'),('HIGH','max'),('MAX','max'),('LOW','min'),('MIN','min')):
+        if key in observed:
+            return how
+    return 'mean'
+
+def _as_frame(data):
+    if isinstance(data,pd.Series):
+        return data.to_frame(), True
+    return data, False
+
+def _frame_freq(frame):
+    freq = frame.index.freqstr or pd.infer_freq(frame.index)
+    if freq is None:
+        raise Exception('Error - data needs a regular DatetimeIndex')
+    return freq
+
+def transform(data, transformation, freq:str=None):
+    # apply a TransformationType (or its code) to a DataFrame or Series
+    code = transformation.value if isinstance(transformation,TransformationType) else int(transformation)
+    if code == 0:
+        return data
+    frame, single = _as_frame(data)
+    freq = freq or _frame_freq(frame)
+    x = frame.to_numpy(dtype=np.float64)
+    prev = np.full_like(x,np.nan)
+    if code in (2,3,4):
+        prev[1:] = x[:-1]
+    elif code in (1,8):
+        if freq.split('-')[0] in ('D','B','W'):
+            # same date a year earlier, or the last observation within the week before it
+            pos = frame.index.get_indexer(frame.index - pd.DateOffset(years=1),method='pad',tolerance=pd.Timedelta(days=6))
+            prev[pos >= 0] = x[pos[pos >= 0]]
+        else:
+            lag = _periods_per_year(freq)
+            prev[lag:] = x[:-lag]
+    else:
+        raise Exception(f'Error - transformation {transformation} not supported')
+    with np.errstate(divide='ignore',invalid='ignore'):
+        if code in (1,4):
+            out = (x / prev - 1) * 100
+        elif code in (2,8):
+            out = x - prev
+        else:
+            out = (np.power(x / prev,_periods_per_year(freq)) - 1) * 100
+    out[~np.isfinite(out)] = np.nan
+    ret = pd.DataFrame(out,index=frame.index,columns=frame.columns)
+    return ret.iloc[:,0].rename(data.name) if single else ret
+
+def convert(data, freq, conversion=None, observed=None):
+    # Convert a DataFrame or Series to another frequency. Going to a lower frequency aggregates each complete
+    # period by the series' observedAttribute (mean, sum, last, first, max, min; `observed` is one value or one
+    # per column, e.g. meta['observed']). Going to a higher frequency uses the ConversionType (default Cubic);
+    # another anchor of the same frequency (Q-DEC -> Q-NOV) goes through monthly (daily for weekly) values.
+    frame, single = _as_frame(data)
+    src = _frame_freq(frame)
+    to = _pandas_freq(freq)
+    hows = [_aggregation(observed)] * frame.shape[1] if observed is None or isinstance(observed,str) else [_aggregation(o) for o in observed]
+    if _same_periods(src,to):
+        ret = frame
+    else:
+        parts = []
+        for how in dict.fromkeys(hows):
+            cols = [i for i, h in enumerate(hows) if h == how]
+            sub = frame.iloc[:,cols]
+            if _periods_per_year(to) < _periods_per_year(src):
+                parts.append(_aggregate(sub,src,to,how))
+            elif _periods_per_year(to) > _periods_per_year(src):
+                parts.append(_disaggregate(sub,to,conversion,how))
+            else:
+                parts.append(_rebucket(sub,to,conversion,how))
+        ret = parts[0] if len(parts) == 1 else pd.concat(parts,axis=1)[frame.columns]
+    return ret.iloc[:,0].rename(data.name) if single else ret
+
+def _same_periods(src:str, to:str):
+    # same frequency and anchor ('Q' and 'Q-DEC', 'W' and 'W-SUN' are the same periods)
+    return pd.tseries.frequencies.to_offset(src) == pd.tseries.frequencies.to_offset(to)
+
+def _rebucket(frame, to:str, conversion, how:str):
+    # same periods per year on another anchor (Q-DEC -> Q-NOV, W-SUN -> W-MON): spread each period over the
+    # months (days for weekly data) it covers, then aggregate the complete target periods
+    fine = 'D' if _periods_per_year(to) > 12 else _FREQ_DICT['MONTHLY']
+    return _aggregate(_disaggregate(frame,fine,conversion,how),fine,to,how)
+
+def _aggregate(frame, src:str, to:str, how:str):
+    r = frame.resample(to)
+    out = getattr(r,how)()
+    # only complete periods: as many observations as the source frequency has in the target period
+    offset = pd.tseries.frequencies.to_offset(to)
+    full = pd.date_range(frame.index[0] - offset,frame.index[-1] + offset,freq=src)
+    expected = pd.Series(1,index=full).resample(to).count().reindex(out.index)
+    return out.where(r.count().ge(expected,axis=0))
+
+def _disaggregate(frame, to:str, conversion, how:str):
+    code = 2 if conversion is None else (conversion.value if isinstance(conversion,ConversionType) else int(conversion))
+    index = frame.index
+    start = index[0] - pd.tseries.frequencies.to_offset(frame.index.freqstr or pd.infer_freq(index)) + pd.Timedelta(days=1)
+    target = pd.date_range(start,index[-1],freq=to)
+    # source period of every target date (periods end on their index date), and each period's first/last slot
+    bins = index.searchsorted(target)
+    count = np.bincount(bins,minlength=len(index))
+    last = np.cumsum(count) - 1
+    first = last - count + 1
+    x = frame.to_numpy(dtype=np.float64)
+    if how == 'sum':
+        with np.errstate(divide='ignore',invalid='ignore'):
+            x = x / count[:,None]
+    if code == 0:
+        out = x[bins]
+    elif code == 3:
+        out = np.full((len(target),x.shape[1]),np.nan)
+        slots = first if how == 'first' else last
+        ok = count > 0
+        out[slots[ok]] = x[ok]
+    else:
+        ok = count > 0
+        first, last, x = first[ok], last[ok], x[ok]
+        knots = first.astype(float) if how == 'first' else last.astype(float) if how == 'last' else (first + last) / 2.0
+        out = np.full((len(target),x.shape[1]),np.nan)
+        t = np.arange(len(target),dtype=float)
+        valid = ~np.isnan(x)
+        # columns sharing the same valid span are interpolated together
+        spans = {}
+        for col in range(x.shape[1]):
+            rows = np.flatnonzero(valid[:,col])
+            if len(rows):
+                spans.setdefault((rows[0],rows[-1]),[]).append(col)
+        for (r0, r1), cols in spans.items():
+            xk = knots[r0:r1+1]
+            yk = pd.DataFrame(x[r0:r1+1][:,cols]).interpolate(limit_area='inside').to_numpy()
+            tt = t[first[r0]:last[r1]+1]
+            out[first[r0]:last[r1]+1][:,cols] = _linear(xk,yk,tt) if code == 1 or len(xk) < 3 else _cubic(xk,yk,tt)
+        # no values inside source periods that are ND
+        out[np.isnan(frame.to_numpy(dtype=np.float64))[bins]] = np.nan
+    return pd.DataFrame(out,index=target,columns=frame.columns)
+
+def _linear(xk, yk, t):
+    # piecewise linear through (xk, yk[:,j]) for every column j, extrapolating the end segments
+    if len(xk) == 1:
+        return np.repeat(yk,len(t),axis=0)
+    s = np.clip(np.searchsorted(xk,t),1,len(xk) - 1)
+    w = ((t - xk[s-1]) / (xk[s] - xk[s-1]))[:,None]
+    return yk[s-1] * (1 - w) + yk[s] * w
+
+def _cubic(xk, yk, t):
+    # natural cubic spline through (xk, yk[:,j]) for every column j (one tridiagonal solve across all columns),
+    # extended linearly beyond the first and last knot
+    n = len(xk)
+    h = np.diff(xk)
+    d = np.diff(yk,axis=0) / h[:,None]
+    rhs = 6 * (d[1:] - d[:-1])
+    diag = 2 * (h[:-1] + h[1:])
+    # Thomas algorithm for the interior second derivatives
+    c = np.zeros(n - 2)
+    r = np.zeros((n - 2,yk.shape[1]))
+    for i in range(n - 2):
+        m = diag[i] - (h[i] * c[i-1] if i else 0.0)
+        c[i] = h[i+1] / m
+        r[i] = (rhs[i] - (h[i] * r[i-1] if i else 0.0)) / m
+    M = np.zeros((n,yk.shape[1]))
+    for i in range(n - 3,-1,-1):
+        M[i+1] = r[i] - c[i] * M[i+2]
+    s = np.clip(np.searchsorted(xk,t),1,n - 1)
+    hs = h[s-1][:,None]
+    a = (xk[s][:,None] - t[:,None]) / hs
+    b = 1 - a
+    out = a * yk[s-1] + b * yk[s] + ((a**3 - a) * M[s-1] + (b**3 - b) * M[s]) * hs**2 / 6
+    before, after = t < xk[0], t > xk[-1]
+    if before.any():
+        slope = d[0] - h[0] * (2 * M[0] + M[1]) / 6
+        out[before] = yk[0] + (t[before] - xk[0])[:,None] * slope
+    if after.any():
+        slope = d[-1] + h[-1] * (M[-2] + 2 * M[-1]) / 6
+        out[after] = yk[-1] + (t[after] - xk[-1])[:,None] * slope
+    return out
+
+def derive(data, freq=None, transformation=None, conversion=None, observed=None):
+    # the local equivalent of requesting freq/trans/conv from the API: convert first, then transform
+    if freq is not None:
+        data = convert(data,freq,conversion,observed)
+    if transformation is not None:
+        data = transform(data,transformation)
+    return data
+
+# Parsers for non-JSON basket outputs (CSV, Text/MA_Text, XML, Excel_2007_2010). Layouts are detected from the
+# content: a block of 'Label:' rows (mnemonic, description, ...) above rows that start with a date (series
+# down the columns), or a header row of dates with one series per row (layoutAcross). The numeric rows are
+# read in blocks by pandas' C reader (in parallel processes for large files) and go straight into a SeriesBatch.
+
+_ND_VALUES = ['','ND','NA','N/A','#N/A','NAN','nan','.','-']
+_META_LABELS = {'mnemonic':'mnemonic','series':'mnemonic','description':'description','source':'source','frequency':'freq',
+                'native frequency':'freq','freq':'freq','freqcode':'freq','geography':'geography','geo title':'geography',
+                'geotitle':'geography','concept':'concept','geo code':'geo_code','geocode':'geo_code','observed':'observed',
+                'observed attribute':'observed','observedattribute':'observed','last history':'last_history','lasthistory':'last_history',
+                'date updated':'date_updated','last updated':'date_updated','dateupdated':'date_updated','date created':'date_created',
+                'datecreated':'date_created','date downloaded':'date_accessed','date accessed':'date_accessed'}
+_DATE_CELL = re.compile(r'^\s*"?(\d{4}-\d{1,2}-\d{1,2}([ T]\d{1,2}:\d{2}(:\d{2})?)?|\d{1,2}/\d{1,2}/\d{2,4}|\d{4}[QqMm]\d{1,2}|\d{4}[-/]\d{1,2}|[12]\d{3})"?\s*$')
+
+def _meta_label(text):
+    return _META_LABELS.get(re.sub(r'[^a-z ]','',str(text).lower()).strip())
+
+def _is_date(text):
+    return bool(_DATE_CELL.match(str(text)))
+
+def _parse_dates(cells:list):
+    # DatetimeIndex (period ends for YYYYQn / YYYYMmm / YYYY) and the frequency those formats imply
+    cells = [str(c).strip().strip('"') for c in cells]
+    for pattern, freq, alias in ((r'^\d{4}[Qq]\d$','Q','Q-DEC'),(r'^\d{4}[Mm]\d{1,2}$','M','M'),(r'^\d{4}$','A','A-DEC')):
+        if all(re.match(pattern,c) for c in cells):
+            periods = pd.PeriodIndex([c.upper().replace('M','-') if freq == 'M' else c.upper() for c in cells],freq=freq)
+            return periods.to_timestamp(how='end').normalize(), alias
+    return pd.DatetimeIndex(pd.to_datetime(cells)), None
+
+def _infer_freq(dates):
+    # end-anchored pandas alias (as used by _FREQ_DICT) for a regular DatetimeIndex
+    if len(dates) < 3:
+        return None
+    freq = pd.infer_freq(dates)
+    if freq is None:
+        return None
+    months = ['JAN','FEB','MAR','APR','MAY','JUN','JUL','AUG','SEP','OCT','NOV','DEC']
+    if freq == 'MS':
+        return 'M'
+    if freq.startswith('QS-'):
+        return ('Q-DEC','Q-OCT','Q-NOV')[(months.index(freq[3:]) % 3)]
+    if freq.startswith('AS-') or freq.startswith('YS-'):
+        return f'A-{months[months.index(freq[3:]) - 1]}'
+    if freq.startswith('Y-'):
+        return 'A-' + freq[2:]
+    return freq
+
+def _encoding(head:bytes):
+    try:
+        head[:-4].decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return 'latin-1'
+
+def _separator(lines:list):
+    counts = {sep:min(line.count(sep) for line in lines) for sep in (',','\t',';','|')}
+    sep = max(counts,key=counts.get)
+    return sep if counts[sep] > 0 else r'\s{2,}'
+
+def _split_row(line:str, sep:str):
+    if len(sep) == 1:
+        return next(csv.reader([line],delimiter=sep))
+    return re.split(sep,line.strip())
+
+def _parse_chunk(data:bytes, sep:str, n_text:int, encoding:str='utf-8'):
+    # (text columns, float64 values) of a block of rows; module level so worker processes can run it
+    if not data.strip():
+        return [[] for i in range(n_text)], np.empty((0,0))
+    frame = pd.read_csv(io.BytesIO(data),sep=sep,header=None,dtype={i:str for i in range(n_text)},na_values=_ND_VALUES,
+                        keep_default_na=False,skip_blank_lines=True,encoding=encoding,engine='c' if len(sep) == 1 else 'python')
+    texts = [frame[i].fillna('').tolist() for i in range(n_text)]
+    values = frame.iloc[:,n_text:]
+    text_columns = [c for c, t in values.dtypes.items() if t == object]
+    if text_columns:
+        values = values.copy()
+        for c in text_columns:
+            values[c] = pd.to_numeric(values[c],errors='coerce')
+    # a copy: with copy-on-write the array may be a read-only view of the frame
+    values = values.to_numpy(dtype=np.float64,copy=True)
+    values[values == MISSING_VALUE] = np.nan
+    return texts, values
+
+_CHUNK_BYTES = 4*1024*1024
+
+def _line_chunks(f, size:int=None):
+    # blocks of whole lines, about `size` bytes each, read from a binary file object
+    size = max(1,size or _CHUNK_BYTES)
+    while True:
+        data = f.read(size)
+        if not data:
+            return
+        yield data + f.readline()
+
+def _parse_blocks(f, sep:str, n_text:int, encoding:str='utf-8', workers:int=1, chunk_size:int=None):
+    # (texts, values) of every block of rows read from f, in file order; with workers > 1 blocks are parsed in
+    # that many processes, with at most 2 * workers blocks read ahead
+    chunks = _line_chunks(f,chunk_size)
+    if workers > 1:
+        # a process pool only pays off when there is more than one block
+        ahead = list(itertools.islice(chunks,2))
+        chunks = itertools.chain(ahead,chunks)
+        workers = workers if len(ahead) > 1 else 1
+    if workers <= 1:
+        for data in chunks:
+            yield _parse_chunk(data,sep,n_text,encoding)
+        return
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = collections.deque()
+        for data in chunks:
+            pending.append(pool.submit(_parse_chunk,data,sep,n_text,encoding))
+            if len(pending) > 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def _stack(parts:list, n_text:int):
+    # one (texts, values) pair from blocks of rows; rows short of the widest block are padded with NaN
+    texts = [sum((p[0][i] for p in parts),[]) for i in range(n_text)]
+    width = max((p[1].shape[1] for p in parts),default=0)
+    if len(parts) == 1:
+        return texts, parts[0][1]
+    return texts, np.vstack([np.pad(p[1],((0,0),(0,width - p[1].shape[1])),constant_values=np.nan) for p in parts] or [np.empty((0,0))])
+
+def _parse_block(data, sep:str, n_text:int, encoding:str='utf-8', workers:int=1, chunk_size:int=None):
+    # the whole of a block of rows (bytes or a binary file object) as one (texts, values) pair
+    f = data if hasattr(data,'read') else io.BytesIO(data)
+    return _stack(list(_parse_blocks(f,sep,n_text,encoding,workers,chunk_size)),n_text)
+
+def _trimmed(mnemonic:str, dates, freq:str, values, meta:dict):
+    # record for one series, without the leading and trailing ND rows of a shared date axis
+    valid = np.flatnonzero(~np.isnan(values))
+    if len(valid) == 0:
+        return None
+    meta = {k:v for k, v in meta.items() if k not in ('mnemonic','freq')}
+    return mnemonic, freq, str(dates[valid[0]].date()), values[valid[0]:valid[-1]+1], meta
+
+def _table_records(f, workers:int=1):
+    # records of a CSV/Text output read from a binary file object: only the header lines are decoded in
+    # Python, the body is read in blocks by the C parser
+    start = f.tell()
+    head = f.read(65536)
+    if head[:3] == b'\xef\xbb\xbf':
+        head = head[3:]
+        start += 3
+    encoding = _encoding(head)
+    f.seek(start)
+    lines = []
+    while len(lines) < 200:
+        pos = f.tell()
+        line = f.readline()
+        if not line:
+            break
+        lines.append((pos,f.tell(),line.decode(encoding,errors='replace').rstrip('\r\n')))
+    sample = [l for _, _, l in lines if l.strip()]
+    if not sample:
+        return []
+    sep = _separator(sample[-min(len(sample),20):])
+    header = []
+    for pos, end, line in lines:
+        if not line.strip():
+            continue
+        row = _split_row(line,sep)
+        if row and _is_date(row[0]):
+            f.seek(pos)
+            return _down_records(header,f,sep,encoding,workers)
+        dates = [j for j, c in enumerate(row) if _is_date(c)]
+        if len(dates) >= 2 and _meta_label(row[0]) is not None:
+            f.seek(end)
+            return _across_records(row,dates[0],_parse_blocks(f,sep,dates[0],encoding,workers))
+        header.append(row)
+    raise Exception('Error - unrecognized basket output layout')
+
+def _series_freq(meta:dict, freq:str, dates):
+    return _FREQ_DICT.get(str(meta.get('freq') or '').upper()) or freq or _infer_freq(dates)
+
+def _down_records(header:list, f, sep:str, encoding:str='utf-8', workers:int=1):
+    texts, values = _parse_block(f,sep,1,encoding,workers)
+    return _column_records(header,texts[0],values)
+
+def _column_records(header:list, cells:list, values):
+    # one series per column of `values`, dated by `cells`; header rows are 'Label:' rows of metadata
+    dates, freq = _parse_dates(cells)
+    freq = freq or _infer_freq(dates)
+    meta = {}
+    for row in header:
+        label = _meta_label(row[0]) if row else None
+        if label is not None:
+            meta[label] = [c.strip() for c in row[1:]]
+    for j in range(values.shape[1]):
+        m = {k:(v[j] if j < len(v) else None) for k, v in meta.items()}
+        record = _trimmed(m.get('mnemonic') or f'SERIES{j+1}',dates,_series_freq(m,freq,dates),values[:,j],m)
+        if record is not None:
+            yield record
+
+def _across_records(header:list, first:int, blocks):
+    # one series per row; blocks are (texts, values) with the label cells of each row in texts
+    dates, freq = _parse_dates(header[first:])
+    freq = freq or _infer_freq(dates)
+    labels = [_meta_label(c) for c in header[:first]]
+    n = 0
+    for texts, values in blocks:
+        for i in range(values.shape[0]):
+            n += 1
+            m = {label:texts[k][i] for k, label in enumerate(labels) if label is not None}
+            record = _trimmed(m.get('mnemonic') or f'SERIES{n}',dates,_series_freq(m,freq,dates),values[i,:len(dates)],m)
+            if record is not None:
+                yield record
+
+def _cell_float(cell):
+    if isinstance(cell,(int,float)) and not isinstance(cell,bool):
+        return float(cell)
+    try:
+        return float(str(cell).strip())
+    except ValueError:
+        return np.nan
+
+def _float_rows(rows:list):
+    width = max((len(r) for r in rows),default=0)
+    values = np.array([[_cell_float(c) for c in r] + [np.nan] * (width - len(r)) for r in rows],dtype=np.float64).reshape(len(rows),width)
+    values[values == MISSING_VALUE] = np.nan
+    return values
+
+def _excel_records(source, block:int=4096):
+    # records of an Excel output, built from the rows of openpyxl's read-only reader (same layouts as CSV/Text)
+    try:
+        import openpyxl
+    except ImportError:
+        raise Exception('Error - Excel basket output requires openpyxl (pip install openpyxl)')
+    book = openpyxl.load_workbook(source,read_only=True,data_only=True)
+    try:
+        rows = book.worksheets[0].iter_rows(values_only=True)
+        header = []
+        for row in rows:
+            cells = ['' if c is None else c for c in row]
+            if not any(str(c).strip() for c in cells):
+                continue
+            if _is_date(cells[0]):
+                # dates down the first column, read in blocks of rows
+                dates, blocks, pending = [], [], [cells]
+                for row in rows:
+                    if row and row[0] is not None and str(row[0]).strip():
+                        pending.append(row)
+                    if len(pending) == block:
+                        dates += [str(r[0]) for r in pending]
+                        blocks.append(([],_float_rows([r[1:] for r in pending])))
+                        pending = []
+                dates += [str(r[0]) for r in pending]
+                blocks.append(([],_float_rows([r[1:] for r in pending])))
+                yield from _column_records([[str(c) for c in h] for h in header],dates,_stack(blocks,0)[1])
+                return
+            dates = [j for j, c in enumerate(cells) if _is_date(c)]
+            if len(dates) >= 2 and _meta_label(cells[0]) is not None:
+                first = dates[0]
+                def blocks():
+                    pending = []
+                    for row in itertools.chain(rows,[None]):
+                        if row is not None and any(c is not None and str(c).strip() for c in row):
+                            pending.append(row)
+                        if pending and (len(pending) == block or row is None):
+                            yield [['' if r[k] is None else str(r[k]).strip() for r in pending] for k in range(first)], \
+                                  _float_rows([r[first:] for r in pending])
+                            pending = []
+                yield from _across_records([str(c) for c in cells],first,blocks())
+                return
+            header.append([str(c) for c in cells])
+        if header:
+            raise Exception('Error - unrecognized basket output layout')
+    finally:
+        book.close()
+
+def _xml_fields(elem):
+    # attributes and leaf children of an element, keyed by lower-case name
+    ret = {k.split('}')[-1].lower():v for k, v in elem.attrib.items()}
+    for child in elem:
+        if len(child) == 0 and child.text is not None:
+            ret.setdefault(child.tag.split('}')[-1].lower(),child.text.strip())
+    return ret
+
+def _xml_records(source):
+    # streaming: any element with a mnemonic (attribute or child) holding observations with a date and a value
+    import xml.etree.ElementTree as ET
+    for _, elem in ET.iterparse(source,events=('end',)):
+        fields = _xml_fields(elem)
+        if 'mnemonic' not in fields:
+            continue
+        dates, values = [], []
+        for obs in elem.iter():
+            if obs is elem:
+                continue
+            f = _xml_fields(obs)
+            date = f.get('date') or f.get('period')
+            if date is not None and 'value' in f:
+                dates.append(date)
+                values.append(f['value'])
+        elem.clear()
+        if not dates:
+            continue
+        dates, freq = _parse_dates(dates)
+        meta = {_META_LABELS.get(k):v for k, v in fields.items() if _META_LABELS.get(k) is not None}
+        freq = _FREQ_DICT.get(str(meta.get('freq') or fields.get('freqcode') or '').upper()) or freq or _infer_freq(dates)
+        # a copy: with copy-on-write the array may be a read-only view of the Series
+        values = pd.to_numeric(pd.Series(values).replace(_ND_VALUES,np.nan),errors='coerce').to_numpy(dtype=np.float64,copy=True)
+        values[values == MISSING_VALUE] = np.nan
+        record = _trimmed(fields['mnemonic'],dates,freq,values,meta)
+        if record is not None:
+            yield record
+
+def _output_records(f, workers:int=1):
+    # records of a basket output read from a binary file object, by the format its first bytes show
+    head = f.read(4096)
+    f.seek(0)
+    if head[:2] == b'PK':
+        return _excel_records(f)
+    if head.lstrip(b'\xef\xbb\xbf \t\r\n')[:1] == b'<':
+        return _xml_records(f)
+    return _table_records(f,workers)
+
+def parse_basket_output(content, dtype:str='float64', workers:int=1):
+    # Parse basket output (bytes or a file path) of type CSV, Text, MA_Text, XML or Excel_2007_2010 into a SeriesBatch.
+    # The format is detected from the content. A path is read in blocks, and series go into the batch as they
+    # are parsed, so memory follows the size of the values rather than of the file. workers > 1 parses large
+    # text outputs in that many processes; Excel needs openpyxl.
+    if isinstance(content,str):
+        with open(content,'rb') as f:
+            return SeriesBatch.from_records(_output_records(f,workers),dtype)
+    return SeriesBatch.from_records(_output_records(io.BytesIO(content),workers),dtype)
+
+# Columnar export: a directory with one table per frequency (a 'date' column and one float column per
+# mnemonic) and a 'meta' side table (mnemonic, freq, start, periods and the metadata fields). Parquet is
+# compressed and reads only the requested columns; Arrow IPC is uncompressed and memory-mapped, so reads
+# are zero-copy. Needs pyarrow.
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise Exception('Error - columnar export requires pyarrow (pip install pyarrow)')
+    return pyarrow
+
+def _columnar_file(path:str, name:str, format:str):
+    return os.path.join(path,f'{name}.{"parquet" if format == "parquet" else "arrow"}')
+
+def _write_table(table, file:str, format:str, compression:str=None):
+    pa = _pyarrow()
+    tmp = f'{file}.part'
+    if format == 'parquet':
+        pa.parquet.write_table(table,tmp,compression=compression or 'none')
+    else:
+        with pa.OSFile(tmp,'wb') as sink:
+            with pa.ipc.new_file(sink,table.schema) as writer:
+                writer.write_table(table)
+    os.replace(tmp,file)
+
+def _read_table(file:str, columns:list=None, memory_map:bool=True):
+    pa = _pyarrow()
+    if file.endswith('.parquet'):
+        return pa.parquet.read_table(file,columns=columns,memory_map=memory_map)
+    source = pa.memory_map(file,'r') if memory_map else pa.OSFile(file,'rb')
+    table = pa.ipc.open_file(source).read_all()
+    return table if columns is None else table.select(columns)
+
+def write_columnar(data, path:str, format:str='parquet', compression:str='zstd', dtype:str=None):
+    # data : a SeriesBatch, (frames, meta) as returned with as_frame=True, or a {mnemonic: pd.Series} dict
+    # format : 'parquet' or 'arrow' (Arrow IPC file, uncompressed); dtype : e.g. 'float32' to halve the size
+    pa = _pyarrow()
+    if format not in ('parquet','arrow'):
+        raise Exception(f'Error - unknown columnar format {format}')
+    if isinstance(data,SeriesBatch):
+        frames, meta = data.to_frames()
+    elif isinstance(data,tuple):
+        frames, meta = data
+    else:
+        frames, meta = _to_frames((m,s.index.freqstr,str(s.index[0].date()),s.to_numpy(dtype=np.float64),
+                                   {k:getattr(s,k,None) for k in _META_FIELDS}) for m, s in data.items() if len(s))
+    os.makedirs(path,exist_ok=True)
+    for freq, frame in frames.items():
+        # arrays from numpy keep NaN as NaN (no validity bitmap), which keeps reads zero-copy
+        values = frame.to_numpy(dtype=dtype or np.float64)
+        arrays = [pa.array(frame.index.values)] + [pa.array(values[:,i]) for i in range(values.shape[1])]
+        table = pa.Table.from_arrays(arrays,names=['date'] + [str(c) for c in frame.columns])
+        _write_table(table,_columnar_file(path,f'values-{freq}',format),format,compression)
+    meta = meta.reset_index()
+    for c in meta.columns:
+        if meta[c].dtype == object:
+            meta[c] = meta[c].map(lambda v: v if v is None or isinstance(v,str) else str(v))
+    _write_table(pa.Table.from_pandas(meta,preserve_index=False),_columnar_file(path,'meta',format),format,compression)
+    return path
+
+def read_columnar(path:str, mnemonics:list=None, freqs:list=None, memory_map:bool=True, as_arrow:bool=False, as_records:bool=False):
+    # (frames, meta) like get_multiseries(as_frame=True), reading only the columns of `mnemonics` (unknown ones are
+    # skipped) and the frequencies in `freqs`. as_arrow returns pyarrow Tables in place of DataFrames (zero-copy
+    # for Arrow IPC); as_records returns a SeriesBatch.
+    format = 'parquet' if os.path.exists(_columnar_file(path,'meta','parquet')) else 'arrow'
+    meta = _read_table(_columnar_file(path,'meta',format),memory_map=memory_map).to_pandas().set_index('mnemonic')
+    if mnemonics is not None:
+        meta = meta.loc[[m for m in dict.fromkeys(mnemonics) if m in meta.index]]
+    if freqs is not None:
+        meta = meta[meta['freq'].isin(freqs)]
+    frames = {}
+    for freq, group in meta.groupby('freq',sort=False):
+        columns = None if mnemonics is None else ['date'] + list(group.index)
+        table = _read_table(_columnar_file(path,f'values-{freq}',format),columns,memory_map)
+        if as_arrow:
+            frames[freq] = table
+            continue
+        # one Fortran-ordered block, as _to_frames builds: a single copy instead of one pandas block per column
+        columns = table.column_names[1:]
+        values = np.empty((table.num_rows,len(columns)),dtype=table.schema.field(1).type.to_pandas_dtype() if columns else np.float64,order='F')
+        for i in range(len(columns)):
+            values[:,i] = table.column(i + 1).to_numpy()
+        index = pd.DatetimeIndex(table.column(0).to_numpy(),freq=freq)
+        frames[freq] = pd.DataFrame(values,index=index,columns=columns,copy=False)
+    if as_records:
+        records = []
+        for freq, frame in frames.items():
+            for m in frame.columns:
+                m_meta = meta.loc[m].to_dict()
+                first = frame.index.get_loc(m_meta['start'])
+                records.append((m,freq,str(m_meta['start'].date()),frame[m].to_numpy()[first:first + m_meta['periods']],
+                                {k:m_meta.get(k) for k in _META_FIELDS}))
+        return SeriesBatch.from_records(records,str(next(iter(frames.values())).dtypes.iloc[0]) if frames else 'float64')
+    return frames, meta
+
+class RateLimiter:
+    # Token bucket pacing requests under the API budget (300 requests per minute per access key).
+    # One instance can be shared by any number of threads / API objects; pass lock_file to
+    # share the bucket between processes on the same machine.
+    def __init__(self, rate:int=300, per:float=60.0, burst:int=10, lock_file:str=None,
+                 backoff:float=1.0, max_backoff:float=60.0, jitter:float=1.0):
+        self.rate = rate
+        self.per = per
+        self.capacity = max(1,burst)
+        self.lock_file = lock_file
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self._jitter = jitter
+        self._lock = threading.Lock()
+        self._tokens = float(self.capacity)
+        self._last = time.time()
+        self._blocked_until = 0.0
+        self._strikes = 0
+        self.total_waited = 0.0
+        self.requests = 0
+        self.throttled = 0
+
+    def _load(self, f):
+        f.seek(0)
+        fields = f.read().split()
+        if len(fields) == 4:
+            self._tokens,self._last,self._blocked_until = [float(x) for x in fields[:3]]
+            self._strikes = int(fields[3])
+
+    def _save(self, f):
+        f.seek(0)
+        f.truncate()
+        f.write(f'{self._tokens} {self._last} {self._blocked_until} {self._strikes}')
+        f.flush()
+
+    def _update(self, fn):
+        # run fn on the bucket state under the thread lock and, if configured, the file lock
+        with self._lock:
+            if self.lock_file is None:
+                return fn(time.time())
+            with open(self.lock_file,'a+') as f:
+                _lock_file(f)
+                try:
+                    self._load(f)
+                    ret = fn(time.time())
+                    self._save(f)
+                finally:
+                    _unlock_file(f)
+            return ret
+
+    def _refill(self, now:float):
+        self._tokens = min(self.capacity, self._tokens + max(0.0,now - self._last) * self.rate / self.per)
+        self._last = now
+
+    def _take(self, now:float):
+        self._refill(now)
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) * self.per / self.rate
+
+    def acquire(self):
+        waited = 0.0
+        wait = self._update(self._take)
+        while wait > 0:
+            time.sleep(wait)
+            waited += wait
+            wait = self._update(self._take)
+        with self._lock:
+            self.requests += 1
+            self.total_waited += waited
+        return waited
+
+    def throttle(self, retry_after:float=None):
+        # called on HTTP 429: empty the bucket and block everyone until the server's Retry-After
+        # (or an exponential backoff) has passed; jitter keeps a fleet of workers from waking in sync
+        def fn(now):
+            self._refill(now)
+            self._tokens = 0.0
+            self._strikes += 1
+            if retry_after is not None:
+                delay = retry_after
+            else:
+                delay = min(self._max_backoff, self._backoff * 2 ** (self._strikes - 1))
+            self._blocked_until = max(self._blocked_until, now + delay + random.uniform(0,self._jitter))
+            return self._blocked_until - now
+        delay = self._update(fn)
+        with self._lock:
+            self.throttled += 1
+        return delay
+
+    async def _call_async(self, fn, *args):
+        # with a lock_file the update may wait for another process: keep that wait off the event loop
+        if self.lock_file is None:
+            return fn(*args)
+        return await asyncio.get_running_loop().run_in_executor(None,fn,*args)
+
+    async def acquire_async(self):
+        waited = 0.0
+        wait = await self._call_async(self._update,self._take)
+        while wait > 0:
+            await asyncio.sleep(wait)
+            waited += wait
+            wait = await self._call_async(self._update,self._take)
+        with self._lock:
+            self.requests += 1
+            self.total_waited += waited
+        return waited
+
+    async def throttle_async(self, retry_after:float=None):
+        return await self._call_async(self.throttle,retry_after)
+
+    async def success_async(self):
+        if self._strikes:
+            await self._call_async(self.success)
+
+    def success(self):
+        if self._strikes:
+            def fn(now):
+                self._strikes = 0
+            self._update(fn)
+
+    def stats(self):
+        def fn(now):
+            self._refill(now)
+            return {'tokens':self._tokens,'capacity':self.capacity,'rate':self.rate,'per':self.per,
+                    'blocked_for':max(0.0,self._blocked_until - now)}
+        ret = self._update(fn)
+        ret.update({'requests':self.requests,'throttled':self.throttled,'total_waited':self.total_waited})
+        return ret
+
+def _lock_file(f):
+    if os.name == 'nt':
+        import msvcrt
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+    else:
+        import fcntl
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+def _unlock_file(f):
+    if os.name == 'nt':
+        import msvcrt
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        import fcntl
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+def _retry_after(r):
+    value = r.headers.get('Retry-After')
+    if value is None:
+        return None
+    try:
+        return max(0.0,float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+        return max(0.0,(when - datetime.datetime.now(when.tzinfo)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+def _client_error(status:int):
+    # 4xx that fails the same way on every retry (401 and 429 are retried after a new token / a pause)
+    return (400 <= status < 500) and status not in (401,429)
+
+class SeriesCache:
+    # Persistent local cache of series responses: a SQLite index with one float64 value blob per entry.
+    # Entries are keyed by endpoint + mnemonic + request parameters, expire after ttl seconds (requests
+    # pinned to a vintage version never do) and are evicted least-recently-used beyond max_bytes. Safe to
+    # share between threads and processes (WAL journal, one connection per thread). Cached observations
+    # come back as read-only float64 arrays in place of the JSON list.
+    # touch_interval : a hit only rewrites the entry's access time when it is older than this (LRU granularity)
+    def __init__(self, path:str, ttl:float=24*3600, max_bytes:int=1024**3, timeout:float=30, touch_interval:float=60):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.touch_interval = touch_interval
+        self._timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # running estimate of the stored bytes (this process's writes on top of one SUM); re-summed before evicting
+        self._total = None
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+        con = self._con()
+        con.execute('CREATE TABLE IF NOT EXISTS series (key TEXT PRIMARY KEY, mnemonic TEXT, date_updated TEXT, fetched REAL, '
+                    'accessed REAL, immutable INTEGER, nbytes INTEGER, meta TEXT, data_values BLOB)')
+        con.execute('CREATE INDEX IF NOT EXISTS series_accessed ON series (accessed)')
+        con.execute('CREATE INDEX IF NOT EXISTS series_mnemonic ON series (mnemonic)')
+
+    def _con(self):
+        con = getattr(self._local,'con',None)
+        if con is None:
+            con = sqlite3.connect(self.path,timeout=self._timeout,isolation_level=None,check_same_thread=False)
+            con.execute('PRAGMA journal_mode=WAL')
+            con.execute('PRAGMA synchronous=NORMAL')
+            self._local.con = con
+        return con
+
+    def close(self):
+        con = getattr(self._local,'con',None)
+        if con is not None:
+            con.close()
+            self._local.con = None
+
+    @staticmethod
+    def key(endpoint:str, mnemonic:str, freq:int=None, transformation:int=None, conversion:int=None, start:str=None, end:str=None, vintage:str=None, vintage_version:int=None):
+        parts = [endpoint,mnemonic.upper().strip(),freq,transformation,conversion,start,end,vintage.upper().strip() if vintage else None,vintage_version]
+        return '|'.join('' if p is None else str(p).strip() for p in parts)
+
+    def lookup(self, key:str):
+        # returns (js, stale); js is None on a miss
+        row = self._con().execute('SELECT fetched, accessed, immutable, meta, data_values FROM series WHERE key=?',(key,)).fetchone()
+        if row is None:
+            with self._lock:
+                self.misses += 1
+            return None, True
+        fetched, accessed, immutable, meta, blob = row
+        js = json.loads(meta)
+        if blob is not None:
+            js['data']['data'] = np.frombuffer(blob,dtype=np.float64)
+        stale = (not immutable) and (time.time() - fetched > self.ttl)
+        with self._lock:
+            if stale:
+                self.stale += 1
+            else:
+                self.hits += 1
+        now = time.time()
+        if now - accessed > self.touch_interval:
+            self._con().execute('UPDATE series SET accessed=? WHERE key=?',(now,key))
+        return js, stale
+
+    def get(self, key:str):
+        js, stale = self.lookup(key)
+        return None if stale else js
+
+    def put(self, key:str, js, immutable:bool=False):
+        # js is either a series-shaped dict ({'data':{..., 'data':[values]}, ...}) or any JSON value (stored whole)
+        blob = None
+        if isinstance(js,dict) and isinstance(js.get('data'),dict) and 'data' in js['data']:
+            blob = np.asarray(js['data']['data'],dtype=np.float64).tobytes()
+            js = dict(js)
+            js['data'] = {k:v for k, v in js['data'].items() if k != 'data'}
+        meta = json.dumps(js)
+        mnemonic = key.split('|')[1]
+        date_updated = js.get('dateUpdated') if isinstance(js,dict) else None
+        now = time.time()
+        nbytes = len(meta) + (len(blob) if blob is not None else 0)
+        con = self._con()
+        con.execute('INSERT OR REPLACE INTO series VALUES (?,?,?,?,?,?,?,?,?)',
+                    (key,mnemonic,date_updated,now,now,int(immutable),nbytes,meta,blob))
+        with self._lock:
+            if self._total is None:
+                self._total = con.execute('SELECT COALESCE(SUM(nbytes),0) FROM series').fetchone()[0]
+            else:
+                # a replaced entry is still counted, so the estimate only errs high
+                self._total += nbytes
+            over = self._total > self.max_bytes
+        if over:
+            self._evict()
+
+    def touch(self, key:str):
+        # mark an entry as revalidated (still current on the server)
+        self._con().execute('UPDATE series SET fetched=? WHERE key=?',(time.time(),key))
+
+    def _evict(self):
+        con = self._con()
+        total = con.execute('SELECT COALESCE(SUM(nbytes),0) FROM series').fetchone()[0]
+        if total > self.max_bytes:
+            con.execute('BEGIN IMMEDIATE')
+            try:
+                for key, nbytes in con.execute('SELECT key, nbytes FROM series ORDER BY accessed').fetchall():
+                    if total <= self.max_bytes:
+                        break
+                    con.execute('DELETE FROM series WHERE key=?',(key,))
+                    total = total - nbytes
+                    with self._lock:
+                        self.evictions += 1
+                con.execute('COMMIT')
+            except Exception:
+                con.execute('ROLLBACK')
+                with self._lock:
+                    self._total = None
+                raise
+        with self._lock:
+            self._total = total
+
+    def invalidate(self, mnemonic:str=None):
+        if mnemonic is None:
+            self._con().execute('DELETE FROM series')
+        else:
+            self._con().execute('DELETE FROM series WHERE mnemonic=?',(mnemonic.upper().strip(),))
+        with self._lock:
+            self._total = None
+
+    def stats(self):
+        entries, total = self._con().execute('SELECT COUNT(*), COALESCE(SUM(nbytes),0) FROM series').fetchone()
+        return {'entries':entries,'bytes':total,'hits':self.hits,'misses':self.misses,'stale':self.stale,'evictions':self.evictions}
+
+class SearchIndex:
+    # Local SQLite index of search results (mnemonic, description, geography, concept, ...), filled by
+    # search_iter(index=...). Each completed query is remembered with its mnemonics in result order, so a repeated
+    # query younger than max_age is answered from the index; find() runs a full-text (FTS5) query over
+    # everything seen so far, without touching the API.
+    def __init__(self, path:str, max_age:float=7*24*3600, timeout:float=30):
+        self.path = path
+        self.max_age = max_age
+        self._timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        con = self._con()
+        con.execute('CREATE TABLE IF NOT EXISTS results (mnemonic TEXT PRIMARY KEY, description TEXT, geography TEXT, '
+                    'concept TEXT, frequency TEXT, source TEXT, raw TEXT, fetched REAL)')
+        con.execute('CREATE TABLE IF NOT EXISTS queries (query TEXT PRIMARY KEY, total INTEGER, mnemonics TEXT, fetched REAL)')
+        try:
+            con.execute('CREATE VIRTUAL TABLE IF NOT EXISTS results_fts USING fts5(mnemonic, description, geography, concept, '
+                        "content='results')")
+            self.fts = True
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5: find() falls back to LIKE
+            self.fts = False
+
+    def _con(self):
+        con = getattr(self._local,'con',None)
+        if con is None:
+            con = sqlite3.connect(self.path,timeout=self._timeout,isolation_level=None,check_same_thread=False)
+            con.execute('PRAGMA journal_mode=WAL')
+            con.execute('PRAGMA synchronous=NORMAL')
+            self._local.con = con
+        return con
+
+    def close(self):
+        con = getattr(self._local,'con',None)
+        if con is not None:
+            con.close()
+            self._local.con = None
+
+    @staticmethod
+    def key(query:str):
+        return ' '.join(query.upper().split())
+
+    def add(self, results:list):
+        rows = [(r['mnemonic'],r.get('description'),r.get('geoTitle',r.get('geography')),r.get('concept'),
+                 None if r.get('frequency') is None else str(r['frequency']),r.get('source'),json.dumps(r),time.time())
+                for r in results if r.get('mnemonic')]
+        con = self._con()
+        con.execute('BEGIN IMMEDIATE')
+        try:
+            if self.fts:
+                # keep the external-content FTS table in step with replaced rows
+                for row in rows:
+                    old = con.execute('SELECT rowid, mnemonic, description, geography, concept FROM results WHERE mnemonic=?',(row[0],)).fetchone()
+                    if old is not None:
+                        con.execute("INSERT INTO results_fts (results_fts, rowid, mnemonic, description, geography, concept) VALUES ('delete',?,?,?,?,?)",old)
+            con.executemany('INSERT OR REPLACE INTO results VALUES (?,?,?,?,?,?,?,?)',rows)
+            if self.fts:
+                con.executemany('INSERT INTO results_fts (rowid, mnemonic, description, geography, concept) '
+                                'SELECT rowid, mnemonic, description, geography, concept FROM results WHERE mnemonic=?',[(r[0],) for r in rows])
+            con.execute('COMMIT')
+        except BaseException:
+            con.execute('ROLLBACK')
+            raise
+
+    def save_query(self, query:str, mnemonics:list, total:int=None):
+        self._con().execute('INSERT OR REPLACE INTO queries VALUES (?,?,?,?)',(self.key(query),total,json.dumps(mnemonics),time.time()))
+
+    def query(self, query:str, max_age:float=None):
+        # stored results of a completed query in API order, or None when unknown or older than max_age
+        max_age = self.max_age if max_age is None else max_age
+        row = self._con().execute('SELECT mnemonics, fetched FROM queries WHERE query=?',(self.key(query),)).fetchone()
+        if row is None or time.time() - row[1] > max_age:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return self.get(json.loads(row[0]))
+
+    def get(self, mnemonics:list):
+        # stored result dicts for mnemonics, in the given order (unknown ones are left out)
+        ret = {}
+        con = self._con()
+        for i in range(0,len(mnemonics),500):
+            part = mnemonics[i:i+500]
+            sql = f'SELECT mnemonic, raw FROM results WHERE mnemonic IN ({",".join("?"*len(part))})'
+            ret.update((m, json.loads(raw)) for m, raw in con.execute(sql,part))
+        return [ret[m] for m in mnemonics if m in ret]
+
+    def find(self, text:str, limit:int=100):
+        # full-text search of mnemonic, description, geography and concept, best matches first
+        con = self._con()
+        if self.fts:
+            terms = ' '.join('"' + t.replace('"','""') + '"*' for t in text.split())
+            sql = ('SELECT results.raw FROM results_fts JOIN results ON results.rowid = results_fts.rowid '
+                   'WHERE results_fts MATCH ? ORDER BY rank LIMIT ?')
+            return [json.loads(raw) for (raw,) in con.execute(sql,(terms,limit))]
+        where = ' AND '.join(["(mnemonic || ' ' || IFNULL(description,'') || ' ' || IFNULL(geography,'') || ' ' || IFNULL(concept,'')) LIKE ?"]*len(text.split()))
+        sql = f'SELECT raw FROM results WHERE {where or "1"} LIMIT ?'
+        return [json.loads(raw) for (raw,) in con.execute(sql,[f'%{t}%' for t in text.split()] + [limit])]
+
+    def stats(self):
+        con = self._con()
+        return {'results':con.execute('SELECT COUNT(*) FROM results').fetchone()[0],
+                'queries':con.execute('SELECT COUNT(*) FROM queries').fetchone()[0],'hits':self.hits,'misses':self.misses}
+
+class MetadataCache:
+    # Bounded in-memory LRU cache with a TTL for slow-changing metadata responses (frequencies, file types,
+    # basket lists, info and contents), keyed by URL. Thread-safe; values are deep-copied in and out so
+    # callers can modify what they get back.
+    def __init__(self, max_entries:int=256, ttl:float=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key:str):
+        # (found, value)
+        with self._lock:
+            entry = self._entries.pop(key,None)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl:
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return False, None
+            # re-insert to mark as most recently used
+            self._entries[key] = entry
+            self.hits += 1
+        return True, copy.deepcopy(entry[1])
+
+    def put(self, key:str, value):
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._entries.pop(key,None)
+            self._entries[key] = (time.monotonic(),value)
+            while len(self._entries) > self.max_entries:
+                del self._entries[next(iter(self._entries))]
+                self.evictions += 1
+
+    def invalidate(self, prefix:str=None):
+        # drop the entries whose key starts with prefix (all of them when prefix is None)
+        with self._lock:
+            keys = [k for k in self._entries if prefix is None or k.startswith(prefix)]
+            for k in keys:
+                del self._entries[k]
+            self.invalidations += len(keys)
+
+    def stats(self):
+        with self._lock:
+            return {'entries':len(self._entries),'hits':self.hits,'misses':self.misses,'expired':self.expired,
+                    'evictions':self.evictions,'invalidations':self.invalidations}
+
+def _periods_between(freq:str, a:str, b:str):
+    # signed number of `freq` periods from date a to date b (both on the frequency's anchors)
+    if a == b:
+        return 0
+    if pd.Timestamp(b) > pd.Timestamp(a):
+        return len(pd.date_range(start=a,end=b,freq=freq)) - 1
+    return 1 - len(pd.date_range(start=b,end=a,freq=freq))
+
+class VintageCube:
+    # On-disk vintage history: one float64 file per mnemonic holding a (vintage x date) matrix on a shared
+    # date axis (missing values and dates a vintage does not cover are NaN), plus a JSON sidecar with the
+    # frequency, first date and the (vintage, version) of every row. New vintages are appended as rows; the
+    # date axis is widened (with headroom, so forecasts growing by a period per vintage rarely rewrite the
+    # file). Reads go through read-only np.memmap views, so revision queries only touch the pages they need.
+    def __init__(self, path:str):
+        self.path = path
+        os.makedirs(path,exist_ok=True)
+        self._lock = threading.Lock()
+        self._meta = {}
+
+    def _file(self, mnemonic:str):
+        m = mnemonic.upper().strip()
+        safe = re.sub(r'[^A-Z0-9._-]','_',m)
+        return os.path.join(self.path,f'{safe}-{hashlib.sha1(m.encode("utf-8")).hexdigest()[:8]}')
+
+    def _read_meta(self, mnemonic:str):
+        m = mnemonic.upper().strip()
+        meta = self._meta.get(m)
+        if meta is None:
+            try:
+                with open(f'{self._file(m)}.json','r') as f:
+                    meta = json.load(f)
+            except FileNotFoundError:
+                return None
+            self._meta[m] = meta
+        return meta
+
+    def _write_meta(self, meta:dict):
+        name = self._file(meta['mnemonic'])
+        with open(f'{name}.json.part','w') as f:
+            json.dump(meta,f)
+        os.replace(f'{name}.json.part',f'{name}.json')
+        self._meta[meta['mnemonic']] = meta
+
+    def mnemonics(self):
+        ret = []
+        for name in sorted(os.listdir(self.path)):
+            if name.endswith('.json'):
+                with open(os.path.join(self.path,name),'r') as f:
+                    ret.append(json.load(f)['mnemonic'])
+        return ret
+
+    def vintages(self, mnemonic:str):
+        # [(vintage, version)] in row order
+        meta = self._read_meta(mnemonic)
+        return [] if meta is None else [tuple(v) for v in meta['vintages']]
+
+    def has(self, mnemonic:str, vintage:str, version:int=None):
+        return any(v == vintage and (version is None or n == version) for v, n in self.vintages(mnemonic))
+
+    def add(self, mnemonic:str, vintage:str, version:int, freq:str, start:str, values):
+        # append one vintage (values starting at `start`, pandas frequency `freq`) as a new row
+        m = mnemonic.upper().strip()
+        values = np.asarray(values,dtype=np.float64)
+        with self._lock:
+            meta = self._read_meta(m)
+            if meta is None:
+                meta = {'mnemonic':m,'freq':freq,'start':start,'width':len(values),'periods':len(values),'vintages':[]}
+                open(f'{self._file(m)}.f64','wb').close()
+            if meta['freq'] != freq:
+                raise Exception(f'Error - {m} vintage {vintage} has frequency {freq}, the cube holds {meta["freq"]}')
+            offset = _periods_between(freq,meta['start'],start)
+            if offset < 0 or offset + len(values) > meta['width']:
+                meta = self._widen(meta,min(0,offset),max(meta['periods'],offset + len(values)))
+                offset = _periods_between(freq,meta['start'],start)
+            row = np.full(meta['width'],np.nan)
+            row[offset:offset+len(values)] = values
+            rows = len(meta['vintages'])
+            with open(f'{self._file(m)}.f64','r+b') as f:
+                # drop anything past the last recorded row (left by an interrupted write)
+                f.truncate(rows * meta['width'] * 8)
+                f.seek(0,os.SEEK_END)
+                f.write(row.tobytes())
+            meta = dict(meta,periods=max(meta['periods'],offset + len(values)),vintages=meta['vintages'] + [[vintage,version]])
+            self._write_meta(meta)
+
+    def _widen(self, meta:dict, shift:int, periods:int):
+        # rewrite the file with the date axis starting `-shift` periods earlier and room for `periods` (+25%)
+        periods = periods - shift
+        width = max(periods + max(1,periods // 4),meta['width'] - shift)
+        name = self._file(meta['mnemonic'])
+        rows = len(meta['vintages'])
+        out = np.full((rows,width),np.nan)
+        if rows:
+            old = np.memmap(f'{name}.f64',dtype=np.float64,mode='r',shape=(rows,meta['width']))
+            out[:,-shift:-shift + meta['width']] = old
+            del old
+        with open(f'{name}.f64.part','wb') as f:
+            f.write(out.tobytes())
+        os.replace(f'{name}.f64.part',f'{name}.f64')
+        start = meta['start'] if shift == 0 else str(pd.date_range(end=meta['start'],periods=1 - shift,freq=meta['freq'])[0].date())
+        meta = dict(meta,start=start,width=width,periods=meta['periods'] - shift)
+        self._write_meta(meta)
+        return meta
+
+    def array(self, mnemonic:str):
+        # read-only (vintage x date) memmap, rows in vintages() order, columns in dates() order
+        meta = self._read_meta(mnemonic)
+        if meta is None:
+            raise KeyError(mnemonic)
+        rows = len(meta['vintages'])
+        if rows == 0:
+            return np.empty((0,meta['periods']))
+        return np.memmap(f'{self._file(meta["mnemonic"])}.f64',dtype=np.float64,mode='r',shape=(rows,meta['width']))[:,:meta['periods']]
+
+    def dates(self, mnemonic:str):
+        meta = self._read_meta(mnemonic)
+        if meta is None:
+            raise KeyError(mnemonic)
+        return _date_index(meta['freq'],meta['start'],meta['periods'])
+
+    def _order(self, mnemonic:str):
+        vintages = self.vintages(mnemonic)
+        order = sorted(range(len(vintages)),key=lambda i: (vintages[i][0],vintages[i][1] or 0))
+        return order, pd.MultiIndex.from_tuples([vintages[i] for i in order],names=['vintage','version'])
+
+    def history(self, mnemonic:str, date):
+        # value of one period in every vintage (oldest vintage first), read as a single column of the memmap;
+        # date may be any day in the period (monthly dates are month ends)
+        dates = self.dates(mnemonic)
+        col = dates.searchsorted(pd.Timestamp(date))
+        if col >= len(dates):
+            raise KeyError(date)
+        order, index = self._order(mnemonic)
+        return pd.Series(np.asarray(self.array(mnemonic)[:,col])[order],index=index,name=dates[col])
+
+    def revisions(self, mnemonic:str, start=None, end=None):
+        # change of every date between consecutive vintages (oldest first); start/end restrict the dates read
+        dates = self.dates(mnemonic)
+        i0 = 0 if start is None else dates.searchsorted(pd.Timestamp(start))
+        i1 = len(dates) if end is None else dates.searchsorted(pd.Timestamp(end),side='right')
+        order, index = self._order(mnemonic)
+        block = np.asarray(self.array(mnemonic)[:,i0:i1])[order]
+        return pd.DataFrame(np.diff(block,axis=0),index=index[1:],columns=dates[i0:i1])
+
+    def to_frame(self, mnemonic:str):
+        # the whole (vintage x date) matrix as a DataFrame (loads it into memory)
+        order, index = self._order(mnemonic)
+        return pd.DataFrame(np.asarray(self.array(mnemonic))[order],index=index,columns=self.dates(mnemonic))
+
+class TokenManager:
+    # Thread-safe holder of the OAuth token. The token is refreshed `margin` seconds before it expires, and
+    # refreshes are single-flight: concurrent callers that saw the same stale token share one fetch.
+    # With cache_file the token is shared with other processes of the same access key through a file
+    # readable only by its owner.
+    def __init__(self, fetch, acc_key:str='', margin:float=300, cache_file:str=None):
+        self._fetch = fetch
+        self._key_id = hashlib.sha256(acc_key.encode('utf-8')).hexdigest()
+        self.margin = margin
+        self.cache_file = cache_file
+        self._lock = threading.Lock()
+        self._token = None
+        self._expires = 0.0
+        self.refreshes = 0
+
+    def _valid(self, expires:float):
+        return time.time() < expires - self.margin
+
+    def _read_cache(self):
+        try:
+            with open(self.cache_file,'r') as f:
+                js = json.load(f)
+            if js.get('key') == self._key_id and self._valid(js['expires']):
+                return js['token'], js['expires']
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        return None, 0.0
+
+    def _write_cache(self):
+        tmp = f'{self.cache_file}.{os.getpid()}.tmp'
+        fd = os.open(tmp,os.O_WRONLY | os.O_CREAT | os.O_TRUNC,0o600)
+        with os.fdopen(fd,'w') as f:
+            json.dump({'key':self._key_id,'token':self._token,'expires':self._expires},f)
+        os.replace(tmp,self.cache_file)
+
+    def current(self):
+        # the token if it is still comfortably valid (loading it from the cache file if needed), else None
+        if self._token is not None and self._valid(self._expires):
+            return self._token
+        if self.cache_file is not None:
+            token, expires = self._read_cache()
+            if token is not None:
+                with self._lock:
+                    self._token, self._expires = token, expires
+                return token
+        return None
+
+    def set(self, token:str, expires_in:float):
+        with self._lock:
+            self._token = token
+            self._expires = time.time() + float(expires_in)
+            self.refreshes += 1
+            if self.cache_file is not None:
+                self._write_cache()
+
+    def get(self):
+        token = self.current()
+        return token if token is not None else self.refresh()
+
+    def refresh(self, stale:str=None):
+        # fetch a new token unless another thread (or process) already replaced `stale`
+        with self._lock:
+            if self._token is not None and self._token != stale and self._valid(self._expires):
+                return self._token
+        if self.cache_file is not None:
+            with open(f'{self.cache_file}.lock','a+') as lock:
+                _lock_file(lock)
+                try:
+                    token, expires = self._read_cache()
+                    if token is not None and token != stale:
+                        with self._lock:
+                            self._token, self._expires = token, expires
+                        return token
+                    return self._refresh(stale)
+                finally:
+                    _unlock_file(lock)
+        return self._refresh(stale)
+
+    def _refresh(self, stale:str=None):
+        with self._lock:
+            if self._token is not None and self._token != stale and self._valid(self._expires):
+                return self._token
+            token, expires_in = self._fetch()
+            self._token = token
+            self._expires = time.time() + float(expires_in)
+            self.refreshes += 1
+            if self.cache_file is not None:
+                self._write_cache()
+            return token
+
+class QuotaExceededError(Exception):
+    pass
+
+class QuotaLedger:
+    # Bytes received this calendar month (UTC), persisted to a JSON file that several processes can share.
+    # Received bytes are kept in memory and written under the file lock at most every flush_interval
+    # seconds (and at exit); the file is re-read at most every refresh seconds.
+    def __init__(self, path:str, refresh:float=1.0, flush_interval:float=5.0):
+        self.path = path
+        self._refresh = refresh
+        self._flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._used = 0
+        self._pending = 0
+        self._month = None
+        self._read_at = 0.0
+        self._flushed_at = time.time()
+        atexit.register(self.flush)
+
+    @staticmethod
+    def _current_month():
+        return datetime.datetime.utcnow().strftime('%Y-%m')
+
+    def _update(self, nbytes:int):
+        month = self._current_month()
+        with self._lock:
+            with open(self.path,'a+') as f:
+                _lock_file(f)
+                try:
+                    f.seek(0)
+                    try:
+                        js = json.loads(f.read() or '{}')
+                    except ValueError:
+                        js = {}
+                    used = js.get('bytes',0) if js.get('month') == month else 0
+                    if nbytes:
+                        used = used + nbytes
+                        f.seek(0)
+                        f.truncate()
+                        f.write(json.dumps({'month':month,'bytes':used}))
+                        f.flush()
+                finally:
+                    _unlock_file(f)
+            self._used, self._month, self._read_at = used, month, time.time()
+        return used
+
+    def flush(self):
+        # write the bytes counted since the last flush
+        with self._lock:
+            nbytes, self._pending = self._pending, 0
+            self._flushed_at = time.time()
+        if nbytes:
+            self._update(nbytes)
+
+    def add(self, nbytes:int):
+        with self._lock:
+            self._pending += nbytes
+            due = time.time() - self._flushed_at >= self._flush_interval
+        if due:
+            self.flush()
+        return self.used()
+
+    def used(self):
+        if self._month != self._current_month() or time.time() - self._read_at > self._refresh:
+            self._update(0)
+        return self._used + self._pending
+
+class ClientMetrics:
+    # Per-endpoint request counters, latency histograms, retries/429s/401s, bytes received (body + headers),
+    # request time (the latency histogram's sum), streamed download time and parse time, request start/end hooks and an optional monthly quota ledger (warns at
+    # warn_at of quota_bytes and refuses requests from refuse_at on).
+    BUCKETS = (0.05,0.1,0.25,0.5,1.0,2.5,5.0,10.0,30.0,60.0)
+
+    def __init__(self, ledger=None, quota_bytes:int=1024**3, warn_at:float=0.8, refuse_at:float=1.0):
+        self.ledger = QuotaLedger(ledger) if isinstance(ledger,str) else ledger
+        self.quota_bytes = quota_bytes
+        self.warn_at = warn_at
+        self.refuse_at = refuse_at
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._start_hooks = []
+        self._end_hooks = []
+        self._warned = None
+
+    def on_request_start(self, fn):
+        # fn(info) with info keys method, url, endpoint, attempt
+        self._start_hooks.append(fn)
+        return fn
+
+    def on_request_end(self, fn):
+        # fn(info) with the start keys plus status, latency, bytes
+        self._end_hooks.append(fn)
+        return fn
+
+    def _stats(self, endpoint:str):
+        stats = self._endpoints.get(endpoint)
+        if stats is None:
+            stats = {'requests':0,'errors':0,'retries':0,'throttled':0,'unauthorized':0,'bytes':0,
+                     'request_time':0.0,'download_time':0.0,'parse_time':0.0,'latency_buckets':[0]*(len(self.BUCKETS)+1)}
+            self._endpoints[endpoint] = stats
+        return stats
+
+    def check_quota(self):
+        if self.ledger is None:
+            return
+        used = self.ledger.used()
+        if used >= self.refuse_at * self.quota_bytes:
+            raise QuotaExceededError(f'Monthly data quota used: {used:,} of {self.quota_bytes:,} bytes')
+        if used >= self.warn_at * self.quota_bytes and self._warned != self.ledger._month:
+            self._warned = self.ledger._month
+            warnings.warn(f'{used/self.quota_bytes:.0%} of the monthly data quota used ({used:,} bytes)',stacklevel=3)
+
+    def start(self, method:str, url:str, attempt:int=1):
+        info = {'method':method,'url':url,'endpoint':_endpoint(url),'attempt':attempt}
+        for fn in self._start_hooks:
+            fn(info)
+        return info
+
+    def end(self, info:dict, status:int, latency:float, nbytes:int):
+        with self._lock:
+            stats = self._stats(info['endpoint'])
+            stats['requests'] += 1
+            stats['retries'] += info['attempt'] > 1
+            stats['throttled'] += status == 429
+            stats['unauthorized'] += status == 401
+            stats['errors'] += status >= 400
+            stats['bytes'] += nbytes
+            stats['request_time'] += latency
+            stats['latency_buckets'][bisect.bisect_left(self.BUCKETS,latency)] += 1
+        if self.ledger is not None and nbytes:
+            self.ledger.add(nbytes)
+        if self._end_hooks:
+            info = dict(info,status=status,latency=latency,bytes=nbytes)
+            for fn in self._end_hooks:
+                fn(info)
+
+    def add_bytes(self, url:str, nbytes:int, seconds:float=0.0):
+        # body bytes (and transfer time) of a streamed response, counted once it has been read
+        with self._lock:
+            stats = self._stats(_endpoint(url))
+            stats['bytes'] += nbytes
+            stats['download_time'] += seconds
+        if self.ledger is not None and nbytes:
+            self.ledger.add(nbytes)
+
+    def record_parse(self, url:str, seconds:float):
+        with self._lock:
+            self._stats(_endpoint(url))['parse_time'] += seconds
+
+    def snapshot(self):
+        with self._lock:
+            endpoints = {k:dict(v,latency_buckets=list(v['latency_buckets'])) for k, v in self._endpoints.items()}
+        totals = {k:sum(v[k] for v in endpoints.values()) for k in ('requests','errors','retries','throttled','unauthorized','bytes','request_time','download_time','parse_time')}
+        ret = {'endpoints':endpoints,'totals':totals,'latency_bounds':list(self.BUCKETS)}
+        if self.ledger is not None:
+            ret['quota'] = {'month':self.ledger._month,'used':self.ledger.used(),'limit':self.quota_bytes}
+        return ret
+
+    def to_prometheus(self, prefix:str='dbapi'):
+        snap = self.snapshot()
+        lines = []
+        counters = [('requests','requests_total','Requests sent'),('errors','errors_total','Responses with status >= 400'),
+                    ('retries','retries_total','Retried attempts'),('throttled','throttled_total','HTTP 429 responses'),
+                    ('unauthorized','unauthorized_total','HTTP 401 responses'),('bytes','received_bytes_total','Bytes received incl. headers'),
+                    ('download_time','download_seconds_total','Time spent reading streamed response bodies'),
+                    ('parse_time','parse_seconds_total','Time spent parsing responses')]
+        for key, name, text in counters:
+            lines.append(f'# HELP {prefix}_{name} {text}')
+            lines.append(f'# TYPE {prefix}_{name} counter')
+            for endpoint, stats in sorted(snap['endpoints'].items()):
+                lines.append(f'{prefix}_{name}{{endpoint="{endpoint}"}} {stats[key]}')
+        lines.append(f'# HELP {prefix}_request_seconds Request latency (until the headers of a streamed response)')
+        lines.append(f'# TYPE {prefix}_request_seconds histogram')
+        for endpoint, stats in sorted(snap['endpoints'].items()):
+            count = 0
+            for bound, n in zip(list(self.BUCKETS) + ['+Inf'], stats['latency_buckets']):
+                count += n
+                lines.append(f'{prefix}_request_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {count}')
+            lines.append(f'{prefix}_request_seconds_sum{{endpoint="{endpoint}"}} {stats["request_time"]}')
+            lines.append(f'{prefix}_request_seconds_count{{endpoint="{endpoint}"}} {count}')
+        if 'quota' in snap:
+            lines.append(f'# HELP {prefix}_quota_used_bytes Bytes used this month')
+            lines.append(f'# TYPE {prefix}_quota_used_bytes gauge')
+            lines.append(f'{prefix}_quota_used_bytes {snap["quota"]["used"]}')
+            lines.append(f'# HELP {prefix}_quota_limit_bytes Monthly byte quota')
+            lines.append(f'# TYPE {prefix}_quota_limit_bytes gauge')
+            lines.append(f'{prefix}_quota_limit_bytes {snap["quota"]["limit"]}')
+        return '\n'.join(lines) + '\n'
+
+_GUID = re.compile(r'[0-9A-Fa-f]{8}-[0-9A-Fa-f]{4}-[0-9A-Fa-f]{4}-[0-9A-Fa-f]{4}-[0-9A-Fa-f]{12}')
+
+def _endpoint(url:str):
+    # metrics label for a URL: its path below /data/v1 with ids replaced, e.g. baskets/{id}/output-file
+    path = urllib.parse.urlsplit(url).path
+    if '/data/v1/' in path:
+        path = path.split('/data/v1/',1)[1]
+    return _GUID.sub('{id}',path.strip('/')).lower() or '/'
+
+def _header_bytes(headers):
+    return 17 + sum(len(k) + len(v) + 4 for k, v in headers.items())
+
+def _wire_bytes(r):
+    # bytes received for a requests response: headers plus the body as sent (compressed) when known
+    try:
+        body = r.raw.tell()
+    except Exception:
+        body = 0
+    if not body and r._content_consumed and r._content:
+        body = len(r._content)
+    return _header_bytes(r.headers) + body
+
 class BaseAPI:
-    def __init__(self,acc_key:str,enc_key:str,oauth:bool = True, proxies=None, debug:bool=False):
+    def __init__(self,acc_key:str,enc_key:str,oauth:bool = True, proxies=None, debug:bool=False,
+                 pool_connections:int=4, pool_maxsize:int=16, pool_block:bool=False, keep_alive:bool=True, gzip:bool=True,
+                 rate_limiter=None, max_throttled:int=20, token_margin:float=300, token_cache:str=None, metrics=None,
+                 coalesce:bool=True, numpy_arrays:bool=False):
         self._base_uri = 'https://api.economy.com'
         self._acc_key = acc_key
         self._enc_key = enc_key
-        self._token = 'bearer None'
+        # token_cache : file used to share the OAuth token between processes (created with owner-only permissions)
+        self._tokens = TokenManager(self._request_oauth_token,acc_key,token_margin,token_cache)
+        self._hmac = (None, None)
         self._oauth = oauth
         if proxies is not None:
             self._proxies = proxies
         else:
             self._proxies = urllib.request.getproxies()
         self._debug = debug
+        # pool_connections : number of per-host pools kept alive
+        # pool_maxsize : connections kept per host; with pool_block=True it is also a hard per-host cap
+        self._pool_connections = pool_connections
+        self._pool_maxsize = pool_maxsize
+        self._pool_block = pool_block
+        self._keep_alive = keep_alive
+        self._gzip = gzip
+        self._session = None
+        self._session_lock = threading.Lock()
+        # rate_limiter : a RateLimiter to share with other clients/processes, or False to disable pacing
+        if rate_limiter is None:
+            rate_limiter = RateLimiter()
+        self._rate_limiter = rate_limiter if rate_limiter else None
+        self._max_throttled = max_throttled
+        # metrics : True, or a ClientMetrics (e.g. with a quota ledger) to record into; off by default
+        if metrics is True:
+            metrics = ClientMetrics()
+        self._metrics = metrics if metrics else None
+        # coalesce : concurrent identical GETs from different threads share one request (single-flight)
+        self._coalesce = coalesce
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self.coalesced = 0
+        # status of the last exchange sent by each thread
+        self._local = threading.local()
+        # numpy_arrays : decode the observations of /series and basket output responses straight into float64
+        # arrays (in place of the JSON list; see json_loads_arrays)
+        self._numpy_arrays = numpy_arrays
+
+    def _new_session(self):
+        s = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=self._pool_connections,pool_maxsize=self._pool_maxsize,pool_block=self._pool_block)
+        s.mount('https://',adapter)
+        s.mount('http://',adapter)
+        s.headers['Accept-Encoding'] = 'gzip, deflate' if self._gzip else 'identity'
+        s.headers['Connection'] = 'keep-alive' if self._keep_alive else 'close'
+        return s
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = self._new_session()
+        return self._session
+
+    def close(self):
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    @property
+    def rate_limiter(self):
+        return self._rate_limiter
+
+    @property
+    def metrics(self):
+        return self._metrics
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
         
+    @property
+    def tokens(self):
+        return self._tokens
+
     def get_oauth_token(self):
+        return self._request_oauth_token()[0]
+
+    def _request_oauth_token(self):
+        # (token, expires_in seconds)
         access_key = self._acc_key
         private_key = self._enc_key
         url = f'{self._base_uri}/oauth2/token'
         head = {'Content-Type':'application/x-www-form-urlencoded'}
         data = f'client_id={access_key}&client_secret={private_key}&grant_type=client_credentials'
-        r = requests.post(url=url,headers=head,data=data,proxies=self._proxies)
+        if self._rate_limiter is not None:
+            self._rate_limiter.acquire()
+        if self._metrics is not None:
+            info = self._metrics.start("post",url)
+        t0 = time.perf_counter()
+        r = self.session.post(url=url,headers=head,data=data,proxies=self._proxies)
+        if self._metrics is not None:
+            self._metrics.end(info,r.status_code,time.perf_counter() - t0,_wire_bytes(r))
         status = r.status_code
         response = r.text
-        jobj = json.loads(response)
         if status == 200:
-            return f'{jobj["token_type"]} {jobj["access_token"]}'
+            jobj = json.loads(response)
+            return f'{jobj["token_type"]} {jobj["access_token"]}', jobj.get('expires_in',3600)
         else:
             raise Exception(f'Error - Status : {status}, Msg: {response}')
             
     def get_hmac_header(self):
         timeStamp = datetime.datetime.strftime(
             datetime.datetime.utcnow(), "%Y-%m-%dT%H:%M:%SZ")
-        payload = bytes(self._acc_key + timeStamp, "utf-8")
-        signature = hmac.new(bytes(self._enc_key,"utf-8"), payload, digestmod=hashlib.sha256)    
-        head = {'AccessKeyId':self._acc_key,'Signature':signature.hexdigest(),
+        # the signature only changes with the timestamp, so reuse it within the same second
+        stamp, signature = self._hmac
+        if stamp != timeStamp:
+            payload = bytes(self._acc_key + timeStamp, "utf-8")
+            signature = hmac.new(bytes(self._enc_key,"utf-8"), payload, digestmod=hashlib.sha256).hexdigest()
+            self._hmac = (timeStamp, signature)
+        head = {'AccessKeyId':self._acc_key,'Signature':signature,
                 'Content-Type':'application/json','timestamp':timeStamp}
         return head
 
-    def request(self, method:str, url:str, payload={}, max_tries:int=5):
+    def _send(self, method:str, url:str, payload={}, max_tries:int=5, stream:bool=False, quiet:bool=False):
+        # retry loop shared by request() and download(); returns the successful response or None
+        # quiet : failures are only printed in debug mode (the caller reports them)
+        method = method.lower().strip()
+        if method not in ('get','post','put','delete'):
+            print(f'Error - method {method} not recognized')
+            return None
         status = 0
         tries = 0
-        ret = {}
-        if self._oauth:
-            if self._token == 'bearer None':
-                self._token = self.get_oauth_token()
-        while (not ((status == 200) or ((status == 304) and (method.lower().strip() == "put")))) and (tries < max_tries+1):
+        attempts = 0
+        throttled = 0
+        ret = None
+        while (ret is None) and (tries < max_tries+1):
             if self._oauth:
-                head = {'Authorization':self._token}
+                head = {'Authorization':self._tokens.get()}
             else:
                 head = self.get_hmac_header()
             head['Content-Type'] = 'application/json'
             head['Accept'] = 'application/json'
-            if method.lower().strip() == "get":
-                r = requests.get(url=url,headers=head,proxies=self._proxies)
-            elif method.lower().strip() == "post": 
-                if type(payload) is list or type(payload) is dict:
-                    r = requests.post(url=url,headers=head,json=payload,proxies=self._proxies)
-                else:
-                    r = requests.post(url=url,headers=head,data=payload,proxies=self._proxies)
-            elif method.lower().strip() == "put": 
+            kwargs = {}
+            if method != "get":
                 if type(payload) is list or type(payload) is dict:
-                    r = requests.put(url=url,headers=head,json=payload,proxies=self._proxies)
+                    kwargs['json'] = payload
                 else:
-                    r = requests.put(url=url,headers=head,data=payload,proxies=self._proxies)
-            else:
-                print(f'Error - method {method} not recognized')
-                return {}
+                    kwargs['data'] = payload
+            if self._rate_limiter is not None:
+                self._rate_limiter.acquire()
+            attempts = attempts + 1
+            if self._metrics is not None:
+                self._metrics.check_quota()
+                info = self._metrics.start(method,url,attempts)
+            t0 = time.perf_counter()
+            r = self.session.request(method,url=url,headers=head,proxies=self._proxies,stream=stream,**kwargs)
+            latency = time.perf_counter() - t0
             tries = tries + 1
             status = r.status_code
-            response = r.text
-            if status == 429:
-                print("Too many requests, wait 10 seconds and try again...")
-                time.sleep(10)
+            if (status == 200) or ((status == 304) and (method == "put")):
+                if self._rate_limiter is not None:
+                    self._rate_limiter.success()
+                ret = r
+            elif status == 429:
+                # throttling is not a failed attempt, the limiter holds back every thread sharing it
+                throttled = throttled + 1
+                if throttled <= self._max_throttled:
+                    tries = tries - 1
+                if self._rate_limiter is not None:
+                    delay = self._rate_limiter.throttle(_retry_after(r))
+                else:
+                    delay = _retry_after(r)
+                    if delay is None:
+                        delay = 10
+                    time.sleep(delay)
+                if self._debug:
+                    print(f'Too many requests, retry in {delay:.1f} seconds...')
             elif self._oauth and (status == 401):
-                print(self._token,status,response)
-                print("Get a new oauth token")
-                self._token = self.get_oauth_token()
-            elif (status == 200) or ((status == 304) and (method.lower().strip() == "put")):
-                try:
-                    ret = json.loads(response)
-                except ValueError as e:
-                    ret = r.content
+                if self._debug:
+                    print("Unauthorized, get a new oauth token")
+                self._tokens.refresh(head['Authorization'])
             else:
-                print(f'Error - Status : {status}, Msg : {response}')
-                print(f'   URL: {url}')
+                if self._debug or not quiet:
+                    print(f'Error - Status : {status}, Msg : {r.text}')
+                    print(f'   URL: {url}')
+                if _client_error(status):
+                    tries = max_tries + 1
+            if self._metrics is not None:
+                # a streamed body is counted by download() once it has been read
+                self._metrics.end(info,status,latency,_header_bytes(r.headers) if stream and ret is not None else _wire_bytes(r))
+            if ret is None:
+                r.close()
             if self._debug:
                 print(f'{status} : {url}')
+        self._local.status = status
         return ret
 
-class DataBuffetAPI(BaseAPI):
-    def __init__(self,acc_key:str,enc_key:str,oauth:bool = True,proxies=None,debug:bool=False):
-        super().__init__(acc_key,enc_key,oauth,proxies,debug)
-        self._base_uri = 'https://api.economy.com/data/v1'
-        self._freq_dict = {'DAILY':'D','BUSINESS':'B','BUSINS':'B',\
-                           'WSUNDAY':'W-SUN','WSUN':'W-SUN','WMON':'W-MON','WMONDAY':'W-MON','WTUESDAY':'W-TUE','WTUE':'W-TUE','WWEDNESDAY':'W-WED',\
-                           'WWED':'W-WED','WTHURSDAY':'W-THU','WTHU':'W-THU','WFRI':'W-FRI','WFRIDAY':'W-FRI','WSAT':'W-SAT','WSATURDAY':'W-SAT',\
-                           'BWSUN1':'W-SUN','BWMON1':'W-MON','BWTUE1':'W-TUE','BWWED1':'W-WED','BWTHU1':'W-THU','BWFRI1':'W-FRI','BWSAT1':'W-SAT',\
-                           'BWSUN2':'W-SUN','BWMON2':'W-MON','BWTUE2':'W-TUE','BWWED2':'W-WED','BWTHU2':'W-THU','BWFRI2':'W-FRI','BWSAT2':'W-SAT',\
-                           'SEMMON':'SM','MONTH':'M','MONTHLY':'M','BIMNOV':'2M','BIMDEC':'2M','QTROCT':'Q-OCT','QTRNOV':'Q-NOV','QTRDEC':'Q-DEC','QUARTERLY':'Q-DEC',\
-                           'SEMJUL':'6M','SEMAUG':'6M','SEMSEP':'6M','SEMOCT':'6M','SEMNOV':'6M','SEMIANNUAL':'6M','SEMDEC':'6M',\
-                           'ANNJAN':'A-JAN','ANNFEB':'A-FEB','ANNMAR':'A-MAR','ANNAPR':'A-APR','ANNMAY':'A-MAY','ANNJUN':'A-JUN','ANNJUL':'A-JUL',\
-                           'ANNAUG':'A-AUG','ANNSEP':'A-SEP','ANNOCT':'A-OCT','ANNNOV':'A-NOV','ANNUAL':'A-DEC','ANNDEC':'A-DEC'}
+    def _send_shared(self, url:str, max_tries:int=5):
+        # single-flight GET: the first caller sends, callers arriving while it is in flight wait for its response
+        with self._inflight_lock:
+            call = self._inflight.get(url)
+            leader = call is None
+            if leader:
+                call = self._inflight[url] = [threading.Event(),None,None]
+            else:
+                self.coalesced += 1
+        if not leader:
+            call[0].wait()
+            if call[2] is not None:
+                raise call[2]
+            return call[1]
+        try:
+            call[1] = self._send("get",url,max_tries=max_tries)
+        except BaseException as ex:
+            call[2] = ex
+            raise
+        finally:
+            with self._inflight_lock:
+                del self._inflight[url]
+            call[0].set()
+        return call[1]
 
-    def health(self):
-        url = f'{self._base_uri}/health'
-        ret = self.request(url=url,method="get")
+    def _loads(self, url:str, content:bytes):
+        # parsed response body, or the raw bytes when it is not JSON (CSV, XML, Excel basket output)
+        try:
+            path = _SERIES_ARRAYS.get(_endpoint(url)) if self._numpy_arrays else None
+            if path is not None:
+                return json_loads_arrays(content,path)
+            return json_loads(content)
+        except ValueError as e:
+            return content
+
+    def request(self, method:str, url:str, payload={}, max_tries:int=5):
+        if self._coalesce and method == "get":
+            r = self._send_shared(url,max_tries)
+        else:
+            r = self._send(method,url,payload,max_tries)
+        if r is None:
+            return {}
+        return self._parse(url,r.content)
+
+    def _parse(self, url:str, content:bytes):
+        t0 = time.perf_counter()
+        ret = self._loads(url,content)
+        if self._metrics is not None:
+            self._metrics.record_parse(url,time.perf_counter() - t0)
         return ret
-    
-    def get_series_json(self, mnemonic:str, freq:int=None, transformation:int=None, conversion:int=None, start:str=None, end:str=None, vintage:str=None, vintage_version:int=None):
-        url = f'{self._base_uri}/series?m={urllib.parse.quote(mnemonic)}'
+
+    def _get_status(self, url:str, max_tries:int=5, quiet:bool=False):
+        # (status, parsed body or {}) of an uncoalesced GET, for callers that act on the failure status
+        r = self._send("get",url,max_tries=max_tries,quiet=quiet)
+        if r is None:
+            return self._local.status, {}
+        return r.status_code, self._parse(url,r.content)
+
+    def download(self, url:str, saveto:str, chunk_size:int=1024*1024, max_tries:int=5):
+        # stream the response body to disk chunk by chunk; returns the number of bytes written or None
+        r = self._send("get",url,max_tries=max_tries,stream=True)
+        if r is None:
+            return None
+        size = 0
+        tmp = f'{saveto}.part'
+        t0 = time.perf_counter()
+        try:
+            with open(tmp,'wb') as f:
+                for chunk in r.iter_content(chunk_size=chunk_size):
+                    f.write(chunk)
+                    size = size + len(chunk)
+            os.replace(tmp,saveto)
+        finally:
+            if self._metrics is not None:
+                self._metrics.add_bytes(url,r.raw.tell() or size,time.perf_counter() - t0)
+            r.close()
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        return size
+
+class _DataBuffetMixin:
+    # State and the request-free helpers (query strings, chunking, decoding, result shaping) shared by
+    # DataBuffetAPI and AsyncDataBuffetAPI; each client supplies its own network methods.
+    def __init__(self,acc_key:str,enc_key:str,oauth:bool = True,proxies=None,debug:bool=False,cache=None,base_uri:str=None,metadata_cache=None,**kwargs):
+        super().__init__(acc_key,enc_key,oauth,proxies,debug,**kwargs)
+        # base_uri : point the client at another server, e.g. the local mock in dbapi_mock_server.py
+        self._base_uri = 'https://api.economy.com/data/v1' if base_uri is None else base_uri.rstrip('/')
+        self.last_fanout_stats = None
+        # mnemonics the last get_multiseries_json could not fetch: [{'mnemonics':[...],'error':...}]
+        self.last_fanout_errors = []
+        self.last_bulk_stats = None
+        # cache : a SeriesCache (or a path for one) used by get_series*, get_multiseries* and get_series_vintages
+        if isinstance(cache,str):
+            cache = SeriesCache(cache)
+        self._cache = cache
+        # metadata_cache : True, or a MetadataCache, to cache frequencies, file types and basket list/info/contents
+        # (off by default); basket entries are dropped whenever this client changes a basket
+        if metadata_cache is True:
+            metadata_cache = MetadataCache()
+        self._metadata_cache = metadata_cache if metadata_cache else None
+        # a per-client copy, as before: changing one client's table must not affect the module or other clients
+        self._freq_dict = dict(_FREQ_DICT)
+
+    @property
+    def cache(self):
+        return self._cache
+
+    @property
+    def metadata_cache(self):
+        return self._metadata_cache
+
+    def _baskets_changed(self):
+        if self._metadata_cache is not None:
+            self._metadata_cache.invalidate(f'{self._base_uri}/baskets')
+
+    def _series_query(self, freq:int=None, transformation:int=None, conversion:int=None, start:str=None, end:str=None, vintage:str=None, vintage_version:int=None):
+        query = ''
         if freq is not None:
-            url = f'{url}&freq={freq}'
+            query = f'{query}&freq={freq}'
         if transformation is not None:
-            url = f'{url}&trans={transformation}'
+            query = f'{query}&trans={transformation}'
         if conversion is not None:
-            url = f'{url}&conv={conversion}'
+            query = f'{query}&conv={conversion}'
         if start is not None:
-            url = f'{url}&startDate={start.strip()}'
+            query = f'{query}&startDate={start.strip()}'
         if end is not None:
-            url = f'{url}&endDate={end.strip()}'
+            query = f'{query}&endDate={end.strip()}'
         if vintage is not None:
-            url = f'{url}&vintage={vintage.upper().strip()}'
+            query = f'{query}&vintage={vintage.upper().strip()}'
         if vintage_version is not None:
-            url = f'{url}&vintageVersion={vintage_version}'
-        ret = self.request(url=url,method="get")
+            query = f'{query}&vintageVersion={vintage_version}'
+        return query
+
+    def _tail_start(self, js:dict, overlap:int):
+        # first date to fetch: `overlap` periods before the stored lastHistory (or the last stored period)
+        old = js['data']['data']
+        index = _date_index(self._freq_dict[js['data']['freq']], js['data']['startDate'][:10], len(old))
+        last = len(old) - 1
+        if js.get('lastHistory','N/A') != 'N/A':
+            try:
+                last = min(last, index.get_loc(pd.Period(js['lastHistory'],freq=index.freq).to_timestamp(how='end').normalize()))
+            except (KeyError, ValueError):
+                pass
+        return index[max(0,last - overlap)].strftime('%Y-%m-%d')
+
+    def _merge_tail(self, js:dict, tail:dict):
+        # stored series js extended with the fetched tail, or None when the history has to be re-pulled
+        old = js['data']['data']
+        index = _date_index(self._freq_dict[js['data']['freq']], js['data']['startDate'][:10], len(old))
+        new = np.array(tail['data']['data'],dtype=np.float64)
+        try:
+            pos = index.get_loc(pd.Timestamp(tail['data']['startDate'][:10]))
+        except KeyError:
+            pos = -1
+        shared = min(len(new), len(old) - pos) if pos >= 0 else 0
+        # a revised first overlap period means revisions may reach further back: re-pull the whole history
+        if shared == 0 or not np.allclose(new[:1], old[pos:pos+1], equal_nan=True):
+            return None
+        merged = dict(tail)
+        merged['data'] = dict(tail['data'])
+        merged['data']['startDate'] = js['data']['startDate']
+        merged['data']['data'] = np.concatenate([old[:pos],new])
+        merged['data']['periods'] = len(merged['data']['data'])
+        for k in ('startDate','start'):
+            if k in js:
+                merged[k] = js[k]
+        if 'start' in js['data']:
+            merged['data']['start'] = js['data']['start']
+        return merged
+
+    def _multiseries_url(self, mnemonics:list, query:str):
+        return f'{self._base_uri}/multi-series?m={urllib.parse.quote(";".join(mnemonics))}{query}'
+
+    def _chunk_mnemonics(self, mnemonics:list, query:str, chunk_size:int=25, max_url_length:int=2000):
+        # split into lists of at most chunk_size mnemonics whose multi-series URL fits in max_url_length
+        base = len(self._multiseries_url([],query))
+        sep = len(urllib.parse.quote(';'))
+        chunks = []
+        chunk = []
+        length = base
+        for m in mnemonics:
+            size = len(urllib.parse.quote(m)) + (sep if chunk else 0)
+            if chunk and ((len(chunk) >= chunk_size) or (length + size > max_url_length)):
+                chunks.append(chunk)
+                chunk = []
+                length = base
+                size = len(urllib.parse.quote(m))
+            chunk.append(m)
+            length = length + size
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+    def _cached_multiseries(self, mnemonics:list, params:tuple):
+        # (cached items by mnemonic, mnemonics to fetch)
+        cached = {}
+        missing = []
+        for m in mnemonics:
+            js = self._cache.get(SeriesCache.key('multi-series',m,*params))
+            if js is not None:
+                cached[m.upper().strip()] = self._expand_multiseries_item(js)
+            else:
+                missing.append(m)
+        return cached, missing
+
+    def _store_multiseries(self, ret:dict, mnemonics:list, params:tuple, cached:dict):
+        # cache the fetched items and return them merged with the cached ones, in input order
+        if not isinstance(ret,dict) or not ret:
+            if not cached:
+                return {}
+            ret = {'error':None,'data':[]}
+        for js in ret.get('data') or []:
+            if js.get('data') and not js.get('error'):
+                self._cache.put(SeriesCache.key('multi-series',js['mnemonic'],*params),self._compact_multiseries_item(js),immutable=params[6] is not None)
+        fetched = {js['mnemonic'].upper().strip():js for js in ret.get('data') or []}
+        fetched.update(cached)
+        ret['data'] = [fetched.pop(m.upper().strip()) for m in mnemonics if m.upper().strip() in fetched] + list(fetched.values())
         return ret
 
-    def get_multiseries_json(self, mnemonics:list, freq:int=None, transformation:int=None, conversion:int=None, start:str=None, end:str=None, vintage:str=None, vintage_version:int=None):
-        if len(mnemonics) <=25:
-            url = f'{self._base_uri}/multi-series?m={urllib.parse.quote(";".join(mnemonics))}'
-        else:
-            raise Exception('For series lists longer than 25 you must use a basket')
-        if freq is not None:
-            url = f'{url}&freq={freq}'
-        if transformation is not None:
-            url = f'{url}&trans={transformation}'
-        if conversion is not None:
-            url = f'{url}&conv={conversion}'
-        if start is not None:
-            url = f'{url}&startDate={start.strip()}'
-        if end is not None:
-            url = f'{url}&endDate={end.strip()}'
-        if vintage is not None:
-            url = f'{url}&vintage={vintage.upper().strip()}'
-        if vintage_version is not None:
-            url = f'{url}&vintageVersion={vintage_version}'
-        ret = self.request(url=url,method="get")
+    def _item_errors(self, items:list):
+        # failures among the items of a multi-series response: items reporting an error or carrying no data
+        return [{'mnemonics':[js.get('mnemonic')],'error':js.get('error') or 'No data returned'} for js in items
+                if not js.get('data') or js.get('error')]
+
+    def _merge_multiseries(self, responses:list):
+        # one multi-series response from several: the top-level fields of the first, the items of all in order
+        responses = [r for r in responses if r is not None]
+        if not responses:
+            return None
+        ret = dict(responses[0])
+        ret['data'] = [js for r in responses for js in r['data']]
+        return ret
+
+    def _fanout_result(self, chunks:list, results:list, elapsed:float):
+        # the merged response, shaped like a single request's ({} when nothing came back); the mnemonics that
+        # failed go to last_fanout_errors and the counts to last_fanout_stats
+        ret = self._merge_multiseries([r for r, errors in results])
+        errors = [e for r, chunk_errors in results for e in chunk_errors]
+        series = sum(1 for js in (ret or {}).get('data') or [] if js.get('data') and not js.get('error'))
+        stats = {'chunks':len(chunks),'series':series,'failed':sum(len(e['mnemonics']) for e in errors),
+                 'elapsed':elapsed,'series_per_sec':series/elapsed if elapsed > 0 else 0.0}
+        self.last_fanout_stats = stats
+        self.last_fanout_errors = errors
+        if self._debug:
+            print(f'multi-series : {stats["series"]} series in {stats["chunks"]} chunks, {elapsed:.2f}s ({stats["series_per_sec"]:.1f} series/s)')
+        return ret if ret is not None else {}
+
+    def _series_response(self, js):
+        # a /series response served from the cache shaped like a fetched one: the cache's read-only array becomes
+        # the JSON list again (null for NaN), or a writable array with numpy_arrays
+        values = js.get('data',{}).get('data') if isinstance(js,dict) and isinstance(js.get('data'),dict) else None
+        if not isinstance(values,np.ndarray) or values.flags.writeable:
+            return js
+        ret = dict(js)
+        ret['data'] = dict(js['data'])
+        ret['data']['data'] = values.copy() if self._numpy_arrays else [None if v != v else v for v in values.tolist()]
+        return ret
+
+    def _compact_multiseries_item(self, js:dict):
+        # multi-series item with its [{'date','value'}] list replaced by {'startDate','periods','data'} (raw values,
+        # None as NaN) so SeriesCache stores the values as one blob
+        ret = {k:v for k, v in js.items() if k != 'data'}
+        values = np.array(list(map(operator.itemgetter('value'), js['data'])),dtype=np.float64)
+        ret['data'] = {'startDate':js['data'][0]['date'],'periods':len(values),'data':values}
         return ret
-    
+
+    def _expand_multiseries_item(self, js:dict):
+        # inverse of _compact_multiseries_item: cached items have the same shape as fetched ones
+        d = js['data']
+        suffix = d['startDate'][10:]
+        dates = _date_index(self._freq_dict[js['freqCode']],d['startDate'][:10],d['periods']).strftime('%Y-%m-%d')
+        ret = dict(js)
+        ret['data'] = [{'date':f'{t}{suffix}','value':None if v != v else v} for t, v in zip(dates,np.asarray(d['data']).tolist())]
+        return ret
+
+    def _multiseries_values(self, js:dict):
+        return js['data'][0]['date'], _decode_values(list(map(operator.itemgetter('value'), js['data'])))
+
     def _to_pandas(self,js:dict):
-        index = pd.date_range(freq=self._freq_dict[js['data']['freq']], start=js['data']['startDate'][:10], periods=js['data']['periods'])
-        data =  [np.NaN if x == -3.4028234663852886e+38 else x for x in js['data']['data']]
-        ret = pd.Series(index=index,data=data)
+        index = _date_index(self._freq_dict[js['data']['freq']], js['data']['startDate'][:10], js['data']['periods'])
+        ret = pd.Series(index=index,data=_decode_values(js['data']['data']))
         ret.mnemonic=js['mnemonic']
         ret.description=js['description']
         ret.source=js['source']
-        ret.date_created=pd.to_datetime(js['dateCreated'])
-        ret.date_updated=pd.to_datetime(js['dateUpdated'])
-        ret.date_accessed=pd.to_datetime(js['dateExecuted'])
+        ret.date_created=_timestamp(js['dateCreated'])
+        ret.date_updated=_timestamp(js['dateUpdated'])
+        ret.date_accessed=_timestamp(js['dateExecuted'])
         ret.observed=js['observedAttribute']
         ret.geography=js['geoTitle']
         ret.concept=js['concept']
@@ -245,17 +2498,14 @@ class DataBuffetAPI(BaseAPI):
         else:
             ret.last_history = pd.Period(js['lastHistory'], freq=ret.index.freq ).to_timestamp()
         return ret
-        
-    def get_series(self, mnemonic:str, freq:int=None, transformation:int=None, conversion:int=None, start:str=None, end:str=None, vintage:str=None, vintage_version:int=None):
-        js = self.get_series_json(mnemonic,freq,transformation,conversion,start,end,vintage,vintage_version)
-        return self._to_pandas(js)
 
-    def get_multiseries(self, mnemonics:list, freq:int=None, transformation:int=None, conversion:int=None, start:str=None, end:str=None, vintage:str=None, vintage_version:int=None):
-        jsons = self.get_multiseries_json(mnemonics,freq,transformation,conversion,start,end,vintage,vintage_version)
+    def _multiseries_to_pandas(self, jsons:dict):
         ret = {}
-        for js in jsons['data']:
-            index = pd.date_range(freq=self._freq_dict[js['freqCode']], start=js['data'][0]['date'], end=js['data'][-1]['date'])
-            data =  [np.NaN if x['value'] == -3.4028234663852886e+38 else x['value'] for x in js['data']]
+        for js in jsons.get('data') or []:
+            if not js.get('data'):
+                continue
+            first, data = self._multiseries_values(js)
+            index = _date_index(self._freq_dict[js['freqCode']], first, len(data))
             v = js['mnemonic']
             ret[v]=pd.Series(index=index,data=data)
             ret[v].mnemonic=v
@@ -269,45 +2519,40 @@ class DataBuffetAPI(BaseAPI):
                 ret[v].last_history = js['lastHistory']
         return ret
 
-    def get_series_vintages(self, mnemonic:str):
-        url = f'{self._base_uri}/vintages?m={urllib.parse.quote(mnemonic)}'
-        ret = self.request(url=url,method="get")
-        return ret
-    
-    def get_frequencies(self):
-        url = f'{self._base_uri}/frequencies'
-        ret = self.request(url=url,method="get")
-        return ret
-    
-    def get_baskets_file_types(self):
-        url = f'{self._base_uri}/filetypes?type=baskets'
-        ret = self.request(url=url,method="get")
-        return ret
-    
-    def get_baskets_list(self, filetype:int=None):
-        url = f'{self._base_uri}/baskets'
-        if filetype is not None:
-            url = f'{url}?filetype={filetype}'
-        ret = self.request(url=url,method="get")
-        return ret
-    
-    def get_basket_info(self, basket_id:str):
-        url = f'{self._base_uri}/baskets/{basket_id}'
-        ret = self.request(url=url,method="get")
-        return ret
-    
-    def get_basket_contents(self, basket_id:str):
-        url = f'{self._base_uri}/baskets/{basket_id}/contents'
-        ret = self.request(url=url,method="get")
-        return ret
-    
-    def get_basket_output_file(self, basket_id:str, saveto:str=None):
-        url = f'{self._base_uri}/baskets/{basket_id}/output-file'
-        basket_data = self.request(url=url,method="get")
+    def _series_arrays(self, js:dict):
+        # (mnemonic, pandas freq, start date, float64 values, metadata) for a /series or basket output item
+        meta = {'description':js.get('description'),'source':js.get('source'),'observed':js.get('observedAttribute'),
+                'geography':js.get('geoTitle'),'concept':js.get('concept'),'geo_code':js.get('geoCode'),
+                'last_history':None if js.get('lastHistory','N/A') == 'N/A' else js['lastHistory'],
+                'date_created':_timestamp(js.get('dateCreated')),'date_updated':_timestamp(js.get('dateUpdated')),
+                'date_accessed':_timestamp(js.get('dateExecuted'))}
+        d = js['data']
+        return js['mnemonic'], self._freq_dict[d['freq']], d['startDate'][:10], _decode_values(d['data']), meta
+
+    def _multiseries_arrays(self, js:dict):
+        # same as _series_arrays for a /multi-series item
+        meta = {'description':js.get('description'),'source':js.get('source'),'observed':js.get('observedAttribute'),
+                'geography':js.get('geoTitle'),'last_history':None if js.get('lastHistory','N/A') == 'N/A' else js['lastHistory']}
+        start, values = self._multiseries_values(js)
+        return js['mnemonic'], self._freq_dict[js['freqCode']], start, values, meta
+
+    def _to_frames(self, records:list):
+        return _to_frames(records)
+
+    def iter_basket_output(self, path:str, raw:bool=False):
+        # generator over a saved JSON basket output file, yielding one pandas Series (or raw dict) per series
+        for js in _iter_json_array(path,'series'):
+            yield js if raw else self._to_pandas(js)
+
+    def _basket_output(self, basket_data, saveto:str=None, as_frame:bool=False, as_records:bool=False, dtype:str='float64', workers:int=1):
         if isinstance(basket_data,dict):
             if saveto is not None:
                 with open(saveto,'w') as f:
                     f.write(json.dumps(basket_data))
+            if as_records:
+                return SeriesBatch.from_records((self._series_arrays(js) for js in basket_data['series']),dtype)
+            if as_frame:
+                return self._to_frames([self._series_arrays(js) for js in basket_data['series']])
             ret = {}
             for js in basket_data['series']:
                 v = js['mnemonic']
@@ -317,8 +2562,12 @@ class DataBuffetAPI(BaseAPI):
             if saveto is not None:
                 with open(saveto,'wb') as f:
                     f.write(basket_data)    
+            if as_records:
+                return parse_basket_output(basket_data,dtype,workers)
+            if as_frame:
+                return parse_basket_output(basket_data,'float64',workers).to_frames()
             return basket_data
-    
+
     def _basket_option_payload(self, title:str=None, filetype=None, decimals:int=None, start:str=None, end:str=None, date_option=None, frequency=None, showLastHistory:bool=None):
         ret = {}
         ret['options'] = {}
@@ -355,17 +2604,327 @@ class DataBuffetAPI(BaseAPI):
             ret['options']['showLastHistory'] = showLastHistory
         return ret
 
+    def _basket_holds(self, contents, mnemonics:list):
+        # True if the basket contents are exactly mnemonics
+        if isinstance(contents,dict):
+            contents = contents.get('series') or contents.get('contents') or []
+        found = set()
+        for item in contents if isinstance(contents,list) else []:
+            if isinstance(item,dict):
+                item = item.get('mnemonic') or item.get('expression') or ''
+            found.add(str(item).upper().strip())
+        return found == set(m.upper().strip() for m in mnemonics)
+
+    def _bulk_path(self, mnemonics:list, params:tuple, basket_threshold:int):
+        if len(mnemonics) == 1:
+            return 'series'
+        if (len(mnemonics) > basket_threshold) and all(p is None for p in params[:3] + params[5:]):
+            return 'basket'
+        return 'multi-series'
+
+    def _bulk_series(self, js:dict, mnemonic:str, as_frame:bool=False, as_records:bool=False, dtype:str='float64'):
+        if not isinstance(js,dict) or not isinstance(js.get('data'),dict):
+            raise Exception(f'Error - could not fetch {mnemonic}')
+        if as_records:
+            return SeriesBatch.from_records([self._series_arrays(js)],dtype)
+        return self._to_frames([self._series_arrays(js)]) if as_frame else {js['mnemonic']:self._to_pandas(js)}
+
+    def _bulk_title(self, mnemonics:list, start:str=None, end:str=None, reuse_basket:bool=True):
+        # reused baskets are named after a hash of their contents, temporary ones are unique
+        digest = hashlib.sha1('\n'.join(sorted(m.upper() for m in mnemonics) + [str(start),str(end)]).encode('utf-8')).hexdigest()
+        if reuse_basket:
+            return f'API_BULK_{digest[:20]}'
+        return f'API_BULK_TMP_{digest[:8]}_{datetime.datetime.now().strftime("%Y%m%d%H%M%S%f")}'
+
+class DataBuffetAPI(_DataBuffetMixin, BaseAPI):
+    def _metadata(self, url:str):
+        # GET through the metadata cache; failed requests ({}) are not cached
+        if self._metadata_cache is None:
+            return self.request(url=url,method="get")
+        found, ret = self._metadata_cache.get(url)
+        if not found:
+            ret = self.request(url=url,method="get")
+            if ret != {}:
+                self._metadata_cache.put(url,ret)
+        return ret
+
+    def health(self):
+        url = f'{self._base_uri}/health'
+        ret = self.request(url=url,method="get")
+        return ret
+
+    def get_series_json(self, mnemonic:str, freq:int=None, transformation:int=None, conversion:int=None, start:str=None, end:str=None, vintage:str=None, vintage_version:int=None):
+        return self._series_response(self._series_json(mnemonic,freq,transformation,conversion,start,end,vintage,vintage_version))
+
+    def _series_json(self, mnemonic:str, freq:int=None, transformation:int=None, conversion:int=None, start:str=None, end:str=None, vintage:str=None, vintage_version:int=None):
+        # get_series_json, with cached values left as the cache's read-only array
+        url = f'{self._base_uri}/series?m={urllib.parse.quote(mnemonic)}'
+        url = url + self._series_query(freq,transformation,conversion,start,end,vintage,vintage_version)
+        if self._cache is None:
+            ret = self.request(url=url,method="get")
+            return ret
+        key = SeriesCache.key('series',mnemonic,freq,transformation,conversion,start,end,vintage,vintage_version)
+        js, stale = self._cache.lookup(key)
+        if js is not None and stale and not self._series_changed(js,mnemonic,freq,transformation,conversion,vintage,vintage_version):
+            self._cache.touch(key)
+            stale = False
+        if js is not None and not stale:
+            return js
+        ret = self.request(url=url,method="get")
+        if isinstance(ret,dict) and isinstance(ret.get('data'),dict):
+            self._cache.put(key,ret,immutable=vintage_version is not None)
+        return ret
+
+    def _series_changed(self, js:dict, mnemonic:str, freq:int=None, transformation:int=None, conversion:int=None, vintage:str=None, vintage_version:int=None):
+        # cheap revalidation: request a single observation and compare dateUpdated with the stored copy
+        day = js['data']['startDate'][:10]
+        url = f'{self._base_uri}/series?m={urllib.parse.quote(mnemonic)}'
+        url = url + self._series_query(freq,transformation,conversion,day,day,vintage,vintage_version)
+        probe = self.request(url=url,method="get")
+        if not isinstance(probe,dict) or probe.get('dateUpdated') is None:
+            return True
+        return probe['dateUpdated'] != js.get('dateUpdated')
+
+    def is_stale(self, mnemonic:str, freq:int=None, transformation:int=None, conversion:int=None, start:str=None, end:str=None, vintage:str=None, vintage_version:int=None):
+        # True if the series is not cached or has been updated on the server since it was cached
+        if self._cache is None:
+            return True
+        key = SeriesCache.key('series',mnemonic,freq,transformation,conversion,start,end,vintage,vintage_version)
+        js, stale = self._cache.lookup(key)
+        if js is None:
+            return True
+        if not stale:
+            return False
+        if self._series_changed(js,mnemonic,freq,transformation,conversion,vintage,vintage_version):
+            return True
+        self._cache.touch(key)
+        return False
+
+    def refresh(self, store, mnemonics:list, freq:int=None, transformation:int=None, conversion:int=None, overlap:int=4, max_workers:int=4):
+        # Bring full-history series in `store` (a SeriesCache, default the client's cache) up to date by fetching
+        # only the tail: from `overlap` periods before the stored lastHistory onward. The tail is merged into the
+        # stored values unless revisions reach back past the overlap, in which case the series is re-pulled.
+        store = store if store is not None else self._cache
+        if store is None:
+            raise Exception('refresh needs a SeriesCache')
+        t0 = time.perf_counter()
+        results = {'unchanged':[],'merged':[],'reloaded':[],'failed':[],'periods_fetched':0,'periods_stored':0}
+        lock = threading.Lock()
+        def one(m):
+            try:
+                outcome, fetched, stored = self._refresh_series(store,m,freq,transformation,conversion,overlap)
+            except Exception as ex:
+                # reported through results['failed']
+                if self._debug:
+                    print(f'Error - refresh of {m} failed : {ex}')
+                outcome, fetched, stored = 'failed', 0, 0
+            with lock:
+                results[outcome].append(m)
+                results['periods_fetched'] += fetched
+                results['periods_stored'] += stored
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1,max_workers)) as pool:
+            list(pool.map(one,mnemonics))
+        results['elapsed'] = time.perf_counter() - t0
+        return results
+
+    def _refresh_series(self, store, mnemonic:str, freq:int=None, transformation:int=None, conversion:int=None, overlap:int=4):
+        # returns (outcome, periods fetched, periods stored)
+        key = SeriesCache.key('series',mnemonic,freq,transformation,conversion)
+        url = f'{self._base_uri}/series?m={urllib.parse.quote(mnemonic)}'
+        js, stale = store.lookup(key)
+        if js is None:
+            return self._reload_series(store,key,url+self._series_query(freq,transformation,conversion))
+        stored = len(js['data']['data'])
+        tail = self.request(url=url+self._series_query(freq,transformation,conversion,self._tail_start(js,overlap)),method="get")
+        if not isinstance(tail,dict) or not isinstance(tail.get('data'),dict):
+            return 'failed', 0, stored
+        fetched = len(tail['data']['data'])
+        if tail.get('dateUpdated') is not None and tail.get('dateUpdated') == js.get('dateUpdated'):
+            store.touch(key)
+            return 'unchanged', fetched, stored
+        merged = self._merge_tail(js,tail)
+        if merged is None:
+            return self._reload_series(store,key,url+self._series_query(freq,transformation,conversion),fetched)
+        store.put(key,merged)
+        return 'merged', fetched, len(merged['data']['data'])
+
+    def _reload_series(self, store, key:str, url:str, fetched:int=0):
+        js = self.request(url=url,method="get")
+        if not isinstance(js,dict) or not isinstance(js.get('data'),dict):
+            return 'failed', fetched, 0
+        store.put(key,js)
+        return 'reloaded', fetched + len(js['data']['data']), len(js['data']['data'])
+
+    def _fetch_multiseries_chunk(self, chunk:list, query:str, isolate_errors:bool=True):
+        # returns (response or None, errors); a chunk the server rejects is bisected so one bad mnemonic only loses
+        # itself. Server errors and network failures have already been retried and are not bisected.
+        status = 0
+        try:
+            status, js = self._get_status(self._multiseries_url(chunk,query),quiet=isolate_errors)
+            if isinstance(js,dict) and isinstance(js.get('data'),list):
+                return js, self._item_errors(js['data'])
+            error = js.get('error') if isinstance(js,dict) and js.get('error') else ('No data returned' if status == 200 else f'Status {status}')
+        except Exception as ex:
+            error = str(ex)
+        if isolate_errors and len(chunk) > 1 and (status == 200 or _client_error(status)):
+            half = len(chunk) // 2
+            js_a, errors_a = self._fetch_multiseries_chunk(chunk[:half],query,isolate_errors)
+            js_b, errors_b = self._fetch_multiseries_chunk(chunk[half:],query,isolate_errors)
+            return self._merge_multiseries([js_a,js_b]), errors_a + errors_b
+        return None, [{'mnemonics':chunk,'error':error}]
+
+    def get_multiseries_json(self, mnemonics:list, freq:int=None, transformation:int=None, conversion:int=None, start:str=None, end:str=None, vintage:str=None, vintage_version:int=None,
+                             max_workers:int=4, chunk_size:int=25, max_url_length:int=2000, isolate_errors:bool=True):
+        if self._cache is None:
+            return self._get_multiseries_json(mnemonics,freq,transformation,conversion,start,end,vintage,vintage_version,
+                                              max_workers,chunk_size,max_url_length,isolate_errors)
+        # serve fresh entries locally and fetch only the rest (multi-series items carry no dateUpdated, so TTL only)
+        params = (freq,transformation,conversion,start,end,vintage,vintage_version)
+        cached, missing = self._cached_multiseries(mnemonics,params)
+        if missing:
+            ret = self._get_multiseries_json(missing,freq,transformation,conversion,start,end,vintage,vintage_version,
+                                             max_workers,chunk_size,max_url_length,isolate_errors)
+        else:
+            ret = {'error':None,'data':[]}
+        return self._store_multiseries(ret,mnemonics,params,cached)
+
+    def _get_multiseries_json(self, mnemonics:list, freq:int=None, transformation:int=None, conversion:int=None, start:str=None, end:str=None, vintage:str=None, vintage_version:int=None,
+                              max_workers:int=4, chunk_size:int=25, max_url_length:int=2000, isolate_errors:bool=True):
+        query = self._series_query(freq,transformation,conversion,start,end,vintage,vintage_version)
+        chunks = self._chunk_mnemonics(list(mnemonics),query,min(chunk_size,25),max_url_length)
+        # fetch the chunks concurrently (paced by the shared rate limiter) and merge
+        t0 = time.perf_counter()
+        if len(chunks) == 1:
+            results = [self._fetch_multiseries_chunk(chunks[0],query,isolate_errors)]
+        else:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max(1,max_workers)) as pool:
+                results = list(pool.map(lambda c: self._fetch_multiseries_chunk(c,query,isolate_errors), chunks))
+        return self._fanout_result(chunks,results,time.perf_counter() - t0)
+
+    def get_series(self, mnemonic:str, freq:int=None, transformation:int=None, conversion:int=None, start:str=None, end:str=None, vintage:str=None, vintage_version:int=None,
+                   as_record:bool=False):
+        # as_record=True returns a SeriesRecord (values array, no index) instead of a pd.Series
+        js = self._series_json(mnemonic,freq,transformation,conversion,start,end,vintage,vintage_version)
+        if as_record:
+            mnemonic, freq, start, values, meta = self._series_arrays(js)
+            return SeriesRecord(mnemonic,freq,start,values,**meta)
+        return self._to_pandas(js)
+
+    def get_multiseries(self, mnemonics:list, freq:int=None, transformation:int=None, conversion:int=None, start:str=None, end:str=None, vintage:str=None, vintage_version:int=None,
+                        max_workers:int=4, chunk_size:int=25, max_url_length:int=2000, isolate_errors:bool=True, as_frame:bool=False,
+                        as_records:bool=False, dtype:str='float64'):
+        # as_frame=True returns (frames, meta): one DataFrame per pandas frequency and a metadata DataFrame keyed by mnemonic
+        # as_records=True returns a SeriesBatch with all values in one `dtype` buffer ('float32' halves its size)
+        jsons = self.get_multiseries_json(mnemonics,freq,transformation,conversion,start,end,vintage,vintage_version,
+                                          max_workers,chunk_size,max_url_length,isolate_errors)
+        if as_records:
+            return SeriesBatch.from_records((self._multiseries_arrays(js) for js in jsons.get('data') or [] if js.get('data')),dtype)
+        if as_frame:
+            return self._to_frames([self._multiseries_arrays(js) for js in jsons.get('data') or [] if js.get('data')])
+        return self._multiseries_to_pandas(jsons)
+
+    def get_series_vintages(self, mnemonic:str):
+        url = f'{self._base_uri}/vintages?m={urllib.parse.quote(mnemonic)}'
+        if self._cache is not None:
+            key = SeriesCache.key('vintages',mnemonic)
+            ret = self._cache.get(key)
+            if ret is not None:
+                return ret
+        ret = self.request(url=url,method="get")
+        if self._cache is not None and isinstance(ret,list):
+            self._cache.put(key,ret)
+        return ret
+
+    def load_vintages(self, store, mnemonics:list, vintages:list=None, max_workers:int=4):
+        # Fetch vintage histories into a VintageCube (or a directory path for one) concurrently, paced by the
+        # client's rate limiter. vintages : labels ('202003') or (label, version) pairs to load; by default all
+        # listed by /vintages. (mnemonic, vintage, version) rows already in the store are skipped, so calling
+        # this again after a release only fetches the new vintages. Rows are written as fetches complete.
+        store = VintageCube(store) if isinstance(store,str) else store
+        t0 = time.perf_counter()
+        wanted = None if vintages is None else [v if isinstance(v,(tuple,list)) else (v,None) for v in vintages]
+        def listing(mnemonic):
+            if wanted is not None and all(n is not None for _, n in wanted):
+                return wanted
+            listed = self.get_series_vintages(mnemonic)
+            listed = [(v['vintage'],v.get('version')) for v in listed] if isinstance(listed,list) else []
+            if wanted is None:
+                return listed
+            return [(v, n) for v, n in listed if (v,None) in wanted or (v,n) in wanted]
+        def fetch(task):
+            mnemonic, vintage, version = task
+            js = self._series_json(mnemonic,vintage=vintage,vintage_version=version)
+            if not isinstance(js,dict) or not isinstance(js.get('data'),dict):
+                raise Exception(js.get('error') if isinstance(js,dict) and js.get('error') else 'No data returned')
+            return task, self._series_arrays(js)
+        fetched = 0
+        skipped = 0
+        failed = []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1,max_workers)) as pool:
+            tasks = []
+            for mnemonic, listed in zip(mnemonics,pool.map(listing,mnemonics)):
+                new = [(mnemonic,v,n) for v, n in listed if not store.has(mnemonic,v,n)]
+                skipped += len(listed) - len(new)
+                tasks.extend(new)
+            futures = {pool.submit(fetch,task):task for task in tasks}
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    (mnemonic, vintage, version), (_, freq, start, values, _) = future.result()
+                    store.add(mnemonic,vintage,version,freq,start,values)
+                    fetched += 1
+                except Exception as ex:
+                    failed.append({'mnemonic':futures[future][0],'vintage':futures[future][1],'version':futures[future][2],'error':str(ex)})
+        return {'fetched':fetched,'skipped':skipped,'failed':failed,'elapsed':time.perf_counter() - t0}
+
+    def get_frequencies(self):
+        url = f'{self._base_uri}/frequencies'
+        return self._metadata(url)
+
+    def get_baskets_file_types(self):
+        url = f'{self._base_uri}/filetypes?type=baskets'
+        return self._metadata(url)
+
+    def get_baskets_list(self, filetype:int=None):
+        url = f'{self._base_uri}/baskets'
+        if filetype is not None:
+            url = f'{url}?filetype={filetype}'
+        return self._metadata(url)
+
+    def get_basket_info(self, basket_id:str):
+        url = f'{self._base_uri}/baskets/{basket_id}'
+        return self._metadata(url)
+
+    def get_basket_contents(self, basket_id:str):
+        url = f'{self._base_uri}/baskets/{basket_id}/contents'
+        return self._metadata(url)
+
+    def get_basket_output_file(self, basket_id:str, saveto:str=None, as_frame:bool=False, stream:bool=False, as_records:bool=False, dtype:str='float64', workers:int=1):
+        # stream=True writes the raw response body to saveto as it arrives and returns the path;
+        # read JSON output back one series at a time with iter_basket_output(saveto), other types with parse_basket_output(saveto);
+        # CSV/Text/XML/Excel output is parsed when as_frame or as_records is set, in `workers` processes for large files
+        url = f'{self._base_uri}/baskets/{basket_id}/output-file'
+        if stream:
+            if saveto is None:
+                raise Exception('saveto is required when stream=True')
+            if self.download(url,saveto) is None:
+                raise Exception(f'Error - could not download output file of basket {basket_id}')
+            return saveto
+        basket_data = self.request(url=url,method="get")
+        return self._basket_output(basket_data,saveto,as_frame,as_records,dtype,workers)
+
     def create_basket(self, title:str, filetype=None, decimals:int=None, start:str=None, end:str=None, date_option=None, frequency=None, showLastHistory:bool=None):
         url = f'{self._base_uri}/baskets'
         pl = self._basket_option_payload(title,filetype)
         ret = self.request(url=url,method="post",payload=pl)
+        self._baskets_changed()
         out = self.edit_basket_settings(basket_id=ret['basketId'],decimals=decimals,start=start,end=end,date_option=date_option,frequency=frequency,showLastHistory=showLastHistory)
         return ret
-    
+
     def edit_basket_settings(self, basket_id:str, title:str=None, filetype=None, decimals:int=None, start:str=None, end:str=None, date_option=None, frequency=None, showLastHistory:bool=None):
         url = f'{self._base_uri}/baskets/{basket_id}'
         pl = self._basket_option_payload(title,filetype,decimals,start,end,date_option,frequency,showLastHistory)
         ret = self.request(url=url,method="post",payload=pl)
+        self._baskets_changed()
         return ret
 
     def add_series_to_basket(self, basket_id:str, mnemonics:list):
@@ -374,18 +2933,87 @@ class DataBuffetAPI(BaseAPI):
         for mnemonic in mnemonics:
             pl.append({'mnemonic':mnemonic})
         ret = self.request(url=url,method="post",payload=pl)
+        self._baskets_changed()
+        return ret
+
+    def delete_basket(self, basket_ids):
+        # basket_ids : one basket id or a list of them; returns the list of deleted ids
+        if isinstance(basket_ids,str):
+            basket_ids = [basket_ids]
+        url = f'{self._base_uri}/baskets'
+        ret = self.request(url=url,method="delete",payload=list(basket_ids))
+        self._baskets_changed()
+        return ret
+
+    def _find_bulk_basket(self, title:str, mnemonics:list):
+        # an existing basket named `title` whose contents still match mnemonics, or None
+        baskets = self.get_baskets_list()
+        if not isinstance(baskets,list):
+            return None
+        for basket in baskets:
+            if isinstance(basket,dict) and basket.get('name') == title:
+                if self._basket_holds(self.get_basket_contents(basket['basketId']),mnemonics):
+                    return basket['basketId']
+        return None
+
+    def fetch_bulk(self, mnemonics:list, freq:int=None, transformation:int=None, conversion:int=None, start:str=None, end:str=None, vintage:str=None, vintage_version:int=None,
+                   as_frame:bool=False, basket_threshold:int=250, reuse_basket:bool=True, max_workers:int=4, sleep:float=2, timeout:float=None,
+                   as_records:bool=False, dtype:str='float64'):
+        # Fetch any number of series with the fewest requests: /series for one, chunked /multi-series up to
+        # basket_threshold (a basket costs ~7 requests plus status polls, about as many as 250 series in chunks
+        # of 25), a basket beyond that. With reuse_basket the basket is named after a hash of its contents and
+        # kept for the next run; otherwise a temporary basket is deleted afterwards.
+        # Baskets take no freq/trans/conv/vintage parameters here, so those requests always use /multi-series.
+        t0 = time.perf_counter()
+        mnemonics = list(dict.fromkeys(m.strip() for m in mnemonics))
+        params = (freq,transformation,conversion,start,end,vintage,vintage_version)
+        path = self._bulk_path(mnemonics,params,basket_threshold)
+        if path == 'series':
+            ret = self._bulk_series(self._series_json(mnemonics[0],*params),mnemonics[0],as_frame,as_records,dtype)
+        elif path == 'multi-series':
+            ret = self.get_multiseries(mnemonics,*params,max_workers=max_workers,as_frame=as_frame,as_records=as_records,dtype=dtype)
+        else:
+            ret = self._fetch_basket(mnemonics,start,end,as_frame,reuse_basket,sleep,timeout,as_records,dtype)
+        self.last_bulk_stats = {'path':path,'series':len(mnemonics),'elapsed':time.perf_counter() - t0}
         return ret
-    
+
+    def _fetch_basket(self, mnemonics:list, start:str=None, end:str=None, as_frame:bool=False, reuse_basket:bool=True, sleep:float=2, timeout:float=None,
+                      as_records:bool=False, dtype:str='float64'):
+        title = self._bulk_title(mnemonics,start,end,reuse_basket)
+        basket_id = self._find_bulk_basket(title,mnemonics) if reuse_basket else None
+        created = basket_id is None
+        if created:
+            basket = self.create_basket(title,filetype=DBFileType.JSON,start=start,end=end)
+            if not isinstance(basket,dict) or 'basketId' not in basket:
+                raise Exception('Error - could not create basket')
+            basket_id = basket['basketId']
+        filled = not created
+        try:
+            if created and not self.add_series_to_basket(basket_id,mnemonics):
+                raise Exception(f'Error - could not add series to basket {basket_id}')
+            order = self.run_basket(basket_id)
+            if not isinstance(order,dict) or 'orderId' not in order:
+                raise Exception(f'Error - could not run basket {basket_id}')
+            filled = True
+            self.wait_for_order(order,sleep=sleep,timeout=timeout)
+            return self.get_basket_output_file(basket_id,as_frame=as_frame,as_records=as_records,dtype=dtype)
+        finally:
+            # a basket created here that never ran may be half-filled: it would not match its title's contents
+            # on the next run, so it is deleted rather than left behind
+            if not reuse_basket or not filled:
+                self.delete_basket([basket_id])
+
     def get_orders(self):
         url = f'{self._base_uri}/orders'
         ret = self.request(url=url,method="get")
         return ret
-    
+
     def run_basket(self, basket_id:str):
         url = f'{self._base_uri}/orders?id={basket_id}&type=baskets&action=run'
         ret = self.request(url=url,method="post")
+        self._baskets_changed()
         return ret
-    
+
     def get_order_status(self, order):
         if type(order) is dict:
             order_id = order['orderId']
@@ -394,15 +3022,1035 @@ class DataBuffetAPI(BaseAPI):
         url = f'{self._base_uri}/orders/{order_id}'
         ret = self.request(url=url,method="get")
         return ret
-    
-    def wait_for_order(self, order, sleep:int=5):
+
+    def wait_for_order(self, order, sleep:int=5, timeout:float=None):
+        # for many orders at once use OrderScheduler, which polls them all with one request per tick
+        deadline = None if timeout is None else time.monotonic() + timeout
         status = self.get_order_status(order)
         while status['dateFinished'] is None:
+            if deadline is not None and time.monotonic() + sleep > deadline:
+                raise TimeoutError(f'Order not finished after {timeout} seconds')
             time.sleep(sleep)
             status = self.get_order_status(order)
         return status
-    
+
     def search(self, query:str, rows:int=30, start:int=0):
         url = f'{self._base_uri}/search?q={urllib.parse.quote(query)}&start={start}&rows={rows}'
         ret = self.request(url=url,method="get")
-        return ret
\ No newline at end of file
+        return ret
+
+    def search_iter(self, query:str, rows:int=100, max_workers:int=4, limit:int=None, index=None, max_age:float=None):
+        # generator over all results of a search, one dict per unique mnemonic in API order. Pages after the first
+        # are fetched max_workers at a time (paced by the rate limiter) while earlier ones are being consumed.
+        # With index (a SearchIndex or its path) results are stored locally and a completed query younger than
+        # max_age is answered from the index.
+        if isinstance(index,str):
+            index = SearchIndex(index)
+        if index is not None:
+            stored = index.query(query,max_age)
+            if stored is not None:
+                yield from stored[:limit]
+                return
+        seen = set()
+        def unique(page, start):
+            if not isinstance(page,dict):
+                raise Exception(f'Error - search for {query} failed at start={start}')
+            ret = []
+            for r in page.get('results') or []:
+                if r.get('mnemonic') is not None and r['mnemonic'] not in seen:
+                    seen.add(r['mnemonic'])
+                    ret.append(r)
+            if index is not None and ret:
+                index.add(ret)
+            return ret, len(page.get('results') or [])
+        first = self.search(query,rows,0)
+        results, n = unique(first,0)
+        total = first.get('numFound')
+        mnemonics = [r['mnemonic'] for r in results]
+        yield from results[:limit]
+        if limit is not None and len(mnemonics) >= limit:
+            return
+        end = total if limit is None or total is None else min(total,limit)
+        if total is None:
+            # no hit count: page serially until a short page
+            start = rows
+            while n == rows and (limit is None or len(mnemonics) < limit):
+                results, n = unique(self.search(query,rows,start),start)
+                mnemonics += [r['mnemonic'] for r in results]
+                yield from results[:None if limit is None else limit - len(mnemonics) + len(results)]
+                if limit is not None and len(mnemonics) >= limit:
+                    return
+                start += rows
+        else:
+            starts = iter(range(rows,end,rows))
+            pool = concurrent.futures.ThreadPoolExecutor(max_workers=max(1,max_workers))
+            try:
+                pending = [(s,pool.submit(self.search,query,rows,s)) for _, s in zip(range(2*max(1,max_workers)),starts)]
+                while pending:
+                    start, future = pending.pop(0)
+                    following = next(starts,None)
+                    if following is not None:
+                        pending.append((following,pool.submit(self.search,query,rows,following)))
+                    results, n = unique(future.result(),start)
+                    mnemonics += [r['mnemonic'] for r in results]
+                    yield from results[:None if limit is None else limit - len(mnemonics) + len(results)]
+                    if limit is not None and len(mnemonics) >= limit:
+                        return
+            finally:
+                pool.shutdown(wait=False,cancel_futures=True)
+        if index is not None and (limit is None or len(mnemonics) < limit):
+            index.save_query(query,mnemonics,total)
+
+    def search_all(self, query:str, rows:int=100, max_workers:int=4, limit:int=None, index=None, max_age:float=None):
+        return list(self.search_iter(query,rows,max_workers,limit,index,max_age))
+
+class OrderScheduler:
+    # Tracks many basket orders at once. Each tick issues one GET /orders listing for all pending orders
+    # (falling back to GET /orders/{id} for orders missing from it). The tick interval adapts to observed
+    # run times. Completions resolve concurrent.futures.Future objects, and with download=True the output
+    # file of each basket is fetched as soon as its order finishes.
+    def __init__(self, api:DataBuffetAPI, min_interval:float=1.0, max_interval:float=30.0, timeout:float=None,
+                 download:bool=False, download_workers:int=4):
+        self._api = api
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.timeout = timeout
+        self.download = download
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._thread = None
+        self._downloads = concurrent.futures.ThreadPoolExecutor(max_workers=max(1,download_workers))
+        self._run_time = None
+        self.polls = 0
+        self.status_requests = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(wait=exc_type is None)
+
+    def run(self, basket_id:str, **kwargs):
+        # run_basket + submit; kwargs as for submit
+        order = self._api.run_basket(basket_id)
+        if not isinstance(order,dict) or 'orderId' not in order:
+            future = concurrent.futures.Future()
+            future.set_exception(Exception(f'Error - could not run basket {basket_id}'))
+            return future
+        return self.submit(order,basket_id=basket_id,**kwargs)
+
+    def submit(self, order, basket_id:str=None, callback=None, timeout:float=None, download:bool=None, saveto:str=None, as_frame:bool=False):
+        # Future resolving to the final order status, or to the basket output when downloading
+        # (a saveto path streams the output file to disk and resolves to that path)
+        if self._closed:
+            raise Exception('OrderScheduler is closed')
+        order_id = order['orderId'] if type(order) is dict else order
+        timeout = self.timeout if timeout is None else timeout
+        future = concurrent.futures.Future()
+        if callback is not None:
+            future.add_done_callback(callback)
+        now = time.monotonic()
+        entry = {'future':future,'basket_id':basket_id,'submitted':now,'deadline':None if timeout is None else now + timeout,
+                 'download':self.download if download is None else download,'saveto':saveto,'as_frame':as_frame}
+        with self._lock:
+            idle = not self._pending
+            self._pending[order_id] = entry
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop,name='dbapi-order-scheduler',daemon=True)
+                self._thread.start()
+        # an idle poller starts ticking; a busy one picks the order up on its next tick
+        if idle:
+            self._wakeup.set()
+        return future
+
+    def wait(self, futures=None, timeout:float=None):
+        if futures is None:
+            with self._lock:
+                futures = [e['future'] for e in self._pending.values()]
+        return concurrent.futures.wait(futures,timeout=timeout)
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def close(self, wait:bool=True):
+        if wait:
+            self.wait()
+        self._closed = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._downloads.shutdown(wait=wait)
+        with self._lock:
+            for entry in self._pending.values():
+                entry['future'].cancel()
+            self._pending.clear()
+
+    def _interval(self):
+        # sleep until the earliest expected completion, backing off for orders running longer than expected
+        now = time.monotonic()
+        delays = []
+        with self._lock:
+            for entry in self._pending.values():
+                age = now - entry['submitted']
+                if self._run_time is not None and age < self._run_time:
+                    delays.append(self._run_time - age)
+                else:
+                    delays.append(0.25 * age)
+                if entry['deadline'] is not None:
+                    delays.append(entry['deadline'] - now)
+        return min(self.max_interval, max(self.min_interval, min(delays) if delays else self.max_interval))
+
+    def _loop(self):
+        while not self._closed:
+            if not self.pending():
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            self._wakeup.clear()
+            if self._wakeup.wait(self._interval()) and self._closed:
+                break
+            try:
+                self._poll()
+            except Exception as ex:
+                # retried on the next tick; orders still fail at their deadline
+                if self._api._debug:
+                    print(f'Error - order status poll failed : {ex}')
+
+    def _poll(self):
+        with self._lock:
+            pending = dict(self._pending)
+        if not pending:
+            return
+        listing = self._api.get_orders()
+        self.polls += 1
+        self.status_requests += 1
+        by_id = {o.get('orderId'):o for o in listing if isinstance(o,dict)} if isinstance(listing,list) else {}
+        now = time.monotonic()
+        for order_id, entry in pending.items():
+            status = by_id.get(order_id)
+            if status is None:
+                status = self._api.get_order_status(order_id)
+                self.status_requests += 1
+            if isinstance(status,dict) and status.get('dateFinished') is not None:
+                self._finish(order_id,entry,status,now)
+            elif entry['deadline'] is not None and now >= entry['deadline']:
+                with self._lock:
+                    self._pending.pop(order_id,None)
+                entry['future'].set_exception(TimeoutError(f'Order {order_id} not finished after {now - entry["submitted"]:.0f} seconds'))
+
+    def _finish(self, order_id:str, entry:dict, status:dict, now:float):
+        with self._lock:
+            self._pending.pop(order_id,None)
+            run_time = now - entry['submitted']
+            self._run_time = run_time if self._run_time is None else 0.7 * self._run_time + 0.3 * run_time
+        if not entry['download']:
+            entry['future'].set_result(status)
+            return
+        basket_id = entry['basket_id'] or status.get('basketId')
+        def fetch():
+            try:
+                if entry['saveto'] is not None:
+                    out = self._api.get_basket_output_file(basket_id,entry['saveto'],stream=True)
+                else:
+                    out = self._api.get_basket_output_file(basket_id,as_frame=entry['as_frame'])
+                entry['future'].set_result(out)
+            except Exception as ex:
+                entry['future'].set_exception(ex)
+        self._downloads.submit(fetch)
+
+    def stats(self):
+        with self._lock:
+            return {'pending':len(self._pending),'polls':self.polls,'status_requests':self.status_requests,
+                    'expected_run_time':self._run_time}
+
+class AsyncDataBuffetAPI(_DataBuffetMixin, BaseAPI):
+    # asyncio version of DataBuffetAPI (requires aiohttp); every public method is a coroutine and the client
+    # is used with "async with". All tasks share one connection pool, one concurrency semaphore and the
+    # client's RateLimiter. SeriesCache reads and writes run in the default executor.
+    def __init__(self,acc_key:str,enc_key:str,oauth:bool = True,proxies=None,debug:bool=False,max_concurrency:int=16,**kwargs):
+        super().__init__(acc_key,enc_key,oauth,proxies,debug,**kwargs)
+        self._max_concurrency = max_concurrency
+        self._semaphore = None
+        self._token_lock = None
+        self._http = None
+        self._inflight_tasks = {}
+
+    def _client(self):
+        if self._http is None or self._http.closed:
+            try:
+                import aiohttp
+            except ImportError:
+                raise Exception('AsyncDataBuffetAPI requires aiohttp (pip install aiohttp)')
+            connector = aiohttp.TCPConnector(limit=self._pool_connections*self._pool_maxsize,limit_per_host=self._pool_maxsize,
+                                             force_close=not self._keep_alive)
+            headers = {'Accept-Encoding':'gzip, deflate' if self._gzip else 'identity'}
+            self._http = aiohttp.ClientSession(connector=connector,headers=headers)
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
+            self._token_lock = asyncio.Lock()
+        return self._http
+
+    def _proxy(self, url:str):
+        return self._proxies.get(urllib.parse.urlsplit(url).scheme)
+
+    async def close(self):
+        if self._http is not None:
+            await self._http.close()
+            self._http = None
+        super().close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    def __enter__(self):
+        raise TypeError('use "async with" with AsyncDataBuffetAPI')
+
+    async def _blocking(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(None,fn,*args)
+
+    async def get_oauth_token(self):
+        return (await self._request_oauth_token())[0]
+
+    async def _request_oauth_token(self):
+        url = f'{self._base_uri}/oauth2/token'
+        head = {'Content-Type':'application/x-www-form-urlencoded'}
+        data = f'client_id={self._acc_key}&client_secret={self._enc_key}&grant_type=client_credentials'
+        if self._rate_limiter is not None:
+            await self._rate_limiter.acquire_async()
+        if self._metrics is not None:
+            info = self._metrics.start("post",url)
+        t0 = time.perf_counter()
+        async with self._client().post(url,headers=head,data=data,proxy=self._proxy(url)) as r:
+            status = r.status
+            response = await r.text()
+            if self._metrics is not None:
+                self._metrics.end(info,status,time.perf_counter() - t0,_header_bytes(r.headers) + len(response))
+        if status == 200:
+            jobj = json.loads(response)
+            return f'{jobj["token_type"]} {jobj["access_token"]}', jobj.get('expires_in',3600)
+        else:
+            raise Exception(f'Error - Status : {status}, Msg: {response}')
+
+    async def _get_token(self):
+        token = self._tokens.current()
+        if token is None:
+            token = await self._refresh_token(None)
+        return token
+
+    async def _refresh_token(self, stale:str):
+        # single-flight: tasks that saw the same stale token wait for one refresh
+        async with self._token_lock:
+            token = self._tokens.current()
+            if token is None or token == stale:
+                token, expires_in = await self._request_oauth_token()
+                self._tokens.set(token,expires_in)
+        return token
+
+    async def _send(self, method:str, url:str, payload={}, max_tries:int=5, saveto:str=None, chunk_size:int=1024*1024, quiet:bool=False):
+        # retry loop shared by request() and download(); returns (ok, body bytes, status) or, with saveto, (ok, bytes written, status)
+        method = method.lower().strip()
+        if method not in ('get','post','put','delete'):
+            print(f'Error - method {method} not recognized')
+            return False, None, 0
+        status = 0
+        tries = 0
+        attempts = 0
+        throttled = 0
+        ok = False
+        content = None
+        client = self._client()
+        while (not ok) and (tries < max_tries+1):
+            if self._oauth:
+                head = {'Authorization':await self._get_token()}
+            else:
+                head = self.get_hmac_header()
+            head['Content-Type'] = 'application/json'
+            head['Accept'] = 'application/json'
+            kwargs = {}
+            if method != "get":
+                if type(payload) is list or type(payload) is dict:
+                    kwargs['json'] = payload
+                else:
+                    kwargs['data'] = payload
+            async with self._semaphore:
+                if self._rate_limiter is not None:
+                    await self._rate_limiter.acquire_async()
+                attempts = attempts + 1
+                if self._metrics is not None:
+                    self._metrics.check_quota()
+                    info = self._metrics.start(method,url,attempts)
+                t0 = time.perf_counter()
+                async with client.request(method,url,headers=head,proxy=self._proxy(url),**kwargs) as r:
+                    status = r.status
+                    ok = (status == 200) or ((status == 304) and (method == "put"))
+                    retry_after = _retry_after(r)
+                    if ok and saveto is not None:
+                        # a streamed body is counted as download time, not request latency
+                        if self._metrics is not None:
+                            self._metrics.end(info,status,time.perf_counter() - t0,_header_bytes(r.headers))
+                        t1 = time.perf_counter()
+                        content = await self._save_stream(r,saveto,chunk_size)
+                        if self._metrics is not None:
+                            self._metrics.add_bytes(url,content,time.perf_counter() - t1)
+                    else:
+                        content = await r.read()
+                        if self._metrics is not None:
+                            self._metrics.end(info,status,time.perf_counter() - t0,_header_bytes(r.headers) + len(content))
+            tries = tries + 1
+            if ok:
+                if self._rate_limiter is not None:
+                    await self._rate_limiter.success_async()
+            elif status == 429:
+                throttled = throttled + 1
+                if throttled <= self._max_throttled:
+                    tries = tries - 1
+                if self._rate_limiter is not None:
+                    delay = await self._rate_limiter.throttle_async(retry_after)
+                else:
+                    delay = 10 if retry_after is None else retry_after
+                    await asyncio.sleep(delay)
+                if self._debug:
+                    print(f'Too many requests, retry in {delay:.1f} seconds...')
+            elif self._oauth and (status == 401):
+                await self._refresh_token(head['Authorization'])
+            else:
+                if self._debug or not quiet:
+                    print(f'Error - Status : {status}, Msg : {content[:1000]}')
+                    print(f'   URL: {url}')
+                if _client_error(status):
+                    tries = max_tries + 1
+            if self._debug:
+                print(f'{status} : {url}')
+        return ok, content, status
+
+    async def _save_stream(self, r, saveto:str, chunk_size:int):
+        size = 0
+        tmp = f'{saveto}.part'
+        try:
+            with open(tmp,'wb') as f:
+                async for chunk in r.content.iter_chunked(chunk_size):
+                    f.write(chunk)
+                    size = size + len(chunk)
+            os.replace(tmp,saveto)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        return size
+
+    async def _send_shared(self, url:str, max_tries:int=5):
+        # single-flight GET for tasks of one event loop
+        inflight = self._inflight_tasks
+        task = inflight.get(url)
+        if task is not None:
+            self.coalesced += 1
+            return await asyncio.shield(task)
+        task = asyncio.ensure_future(self._send("get",url,max_tries=max_tries))
+        inflight[url] = task
+        try:
+            return await asyncio.shield(task)
+        finally:
+            if inflight.get(url) is task:
+                del inflight[url]
+
+    async def request(self, method:str, url:str, payload={}, max_tries:int=5):
+        if self._coalesce and method == "get":
+            ok, content, status = await self._send_shared(url,max_tries)
+        else:
+            ok, content, status = await self._send(method,url,payload,max_tries)
+        if not ok:
+            return {}
+        return self._parse(url,content)
+
+    async def _get_status(self, url:str, max_tries:int=5, quiet:bool=False):
+        ok, content, status = await self._send("get",url,max_tries=max_tries,quiet=quiet)
+        return status, self._parse(url,content) if ok else {}
+
+    async def download(self, url:str, saveto:str, chunk_size:int=1024*1024, max_tries:int=5):
+        ok, size, status = await self._send("get",url,max_tries=max_tries,saveto=saveto,chunk_size=chunk_size)
+        return size if ok else None
+
+    async def health(self):
+        url = f'{self._base_uri}/health'
+        return await self.request(url=url,method="get")
+
+    async def get_series_json(self, mnemonic:str, freq:int=None, transformation:int=None, conversion:int=None, start:str=None, end:str=None, vintage:str=None, vintage_version:int=None):
+        return self._series_response(await self._series_json(mnemonic,freq,transformation,conversion,start,end,vintage,vintage_version))
+
+    async def _series_json(self, mnemonic:str, freq:int=None, transformation:int=None, conversion:int=None, start:str=None, end:str=None, vintage:str=None, vintage_version:int=None):
+        url = f'{self._base_uri}/series?m={urllib.parse.quote(mnemonic)}'
+        url = url + self._series_query(freq,transformation,conversion,start,end,vintage,vintage_version)
+        if self._cache is None:
+            return await self.request(url=url,method="get")
+        key = SeriesCache.key('series',mnemonic,freq,transformation,conversion,start,end,vintage,vintage_version)
+        js, stale = await self._blocking(self._cache.lookup,key)
+        if js is not None and stale and not await self._series_changed(js,mnemonic,freq,transformation,conversion,vintage,vintage_version):
+            await self._blocking(self._cache.touch,key)
+            stale = False
+        if js is not None and not stale:
+            return js
+        ret = await self.request(url=url,method="get")
+        if isinstance(ret,dict) and isinstance(ret.get('data'),dict):
+            await self._blocking(self._cache.put,key,ret,vintage_version is not None)
+        return ret
+
+    async def _series_changed(self, js:dict, mnemonic:str, freq:int=None, transformation:int=None, conversion:int=None, vintage:str=None, vintage_version:int=None):
+        day = js['data']['startDate'][:10]
+        url = f'{self._base_uri}/series?m={urllib.parse.quote(mnemonic)}'
+        url = url + self._series_query(freq,transformation,conversion,day,day,vintage,vintage_version)
+        probe = await self.request(url=url,method="get")
+        if not isinstance(probe,dict) or probe.get('dateUpdated') is None:
+            return True
+        return probe['dateUpdated'] != js.get('dateUpdated')
+
+    async def is_stale(self, mnemonic:str, freq:int=None, transformation:int=None, conversion:int=None, start:str=None, end:str=None, vintage:str=None, vintage_version:int=None):
+        if self._cache is None:
+            return True
+        key = SeriesCache.key('series',mnemonic,freq,transformation,conversion,start,end,vintage,vintage_version)
+        js, stale = await self._blocking(self._cache.lookup,key)
+        if js is None:
+            return True
+        if not stale:
+            return False
+        if await self._series_changed(js,mnemonic,freq,transformation,conversion,vintage,vintage_version):
+            return True
+        await self._blocking(self._cache.touch,key)
+        return False
+
+    async def refresh(self, store, mnemonics:list, freq:int=None, transformation:int=None, conversion:int=None, overlap:int=4):
+        # see DataBuffetAPI.refresh; concurrency is bounded by max_concurrency
+        store = store if store is not None else self._cache
+        if store is None:
+            raise Exception('refresh needs a SeriesCache')
+        t0 = time.perf_counter()
+        results = {'unchanged':[],'merged':[],'reloaded':[],'failed':[],'periods_fetched':0,'periods_stored':0}
+        async def one(m):
+            try:
+                outcome, fetched, stored = await self._refresh_series(store,m,freq,transformation,conversion,overlap)
+            except asyncio.CancelledError:
+                raise
+            except Exception as ex:
+                # reported through results['failed']
+                if self._debug:
+                    print(f'Error - refresh of {m} failed : {ex}')
+                outcome, fetched, stored = 'failed', 0, 0
+            results[outcome].append(m)
+            results['periods_fetched'] += fetched
+            results['periods_stored'] += stored
+        await asyncio.gather(*[one(m) for m in mnemonics])
+        results['elapsed'] = time.perf_counter() - t0
+        return results
+
+    async def _refresh_series(self, store, mnemonic:str, freq:int=None, transformation:int=None, conversion:int=None, overlap:int=4):
+        key = SeriesCache.key('series',mnemonic,freq,transformation,conversion)
+        url = f'{self._base_uri}/series?m={urllib.parse.quote(mnemonic)}'
+        js, stale = await self._blocking(store.lookup,key)
+        if js is None:
+            return await self._reload_series(store,key,url+self._series_query(freq,transformation,conversion))
+        stored = len(js['data']['data'])
+        tail = await self.request(url=url+self._series_query(freq,transformation,conversion,self._tail_start(js,overlap)),method="get")
+        if not isinstance(tail,dict) or not isinstance(tail.get('data'),dict):
+            return 'failed', 0, stored
+        fetched = len(tail['data']['data'])
+        if tail.get('dateUpdated') is not None and tail.get('dateUpdated') == js.get('dateUpdated'):
+            await self._blocking(store.touch,key)
+            return 'unchanged', fetched, stored
+        merged = self._merge_tail(js,tail)
+        if merged is None:
+            return await self._reload_series(store,key,url+self._series_query(freq,transformation,conversion),fetched)
+        await self._blocking(store.put,key,merged)
+        return 'merged', fetched, len(merged['data']['data'])
+
+    async def _reload_series(self, store, key:str, url:str, fetched:int=0):
+        js = await self.request(url=url,method="get")
+        if not isinstance(js,dict) or not isinstance(js.get('data'),dict):
+            return 'failed', fetched, 0
+        await self._blocking(store.put,key,js)
+        return 'reloaded', fetched + len(js['data']['data']), len(js['data']['data'])
+
+    async def get_series(self, mnemonic:str, freq:int=None, transformation:int=None, conversion:int=None, start:str=None, end:str=None, vintage:str=None, vintage_version:int=None,
+                         as_record:bool=False):
+        js = await self._series_json(mnemonic,freq,transformation,conversion,start,end,vintage,vintage_version)
+        if as_record:
+            mnemonic, freq, start, values, meta = self._series_arrays(js)
+            return SeriesRecord(mnemonic,freq,start,values,**meta)
+        return self._to_pandas(js)
+
+    async def _fetch_multiseries_chunk(self, chunk:list, query:str, isolate_errors:bool=True):
+        status = 0
+        try:
+            status, js = await self._get_status(self._multiseries_url(chunk,query),quiet=isolate_errors)
+            if isinstance(js,dict) and isinstance(js.get('data'),list):
+                return js, self._item_errors(js['data'])
+            error = js.get('error') if isinstance(js,dict) and js.get('error') else ('No data returned' if status == 200 else f'Status {status}')
+        except asyncio.CancelledError:
+            raise
+        except Exception as ex:
+            error = str(ex)
+        if isolate_errors and len(chunk) > 1 and (status == 200 or _client_error(status)):
+            half = len(chunk) // 2
+            (js_a, errors_a), (js_b, errors_b) = await asyncio.gather(self._fetch_multiseries_chunk(chunk[:half],query,isolate_errors),
+                                                                      self._fetch_multiseries_chunk(chunk[half:],query,isolate_errors))
+            return self._merge_multiseries([js_a,js_b]), errors_a + errors_b
+        return None, [{'mnemonics':chunk,'error':error}]
+
+    async def get_multiseries_json(self, mnemonics:list, freq:int=None, transformation:int=None, conversion:int=None, start:str=None, end:str=None, vintage:str=None, vintage_version:int=None,
+                                   chunk_size:int=25, max_url_length:int=2000, isolate_errors:bool=True):
+        if self._cache is None:
+            return await self._get_multiseries_json(mnemonics,freq,transformation,conversion,start,end,vintage,vintage_version,
+                                                    chunk_size,max_url_length,isolate_errors)
+        params = (freq,transformation,conversion,start,end,vintage,vintage_version)
+        cached, missing = await self._blocking(self._cached_multiseries,mnemonics,params)
+        if missing:
+            ret = await self._get_multiseries_json(missing,freq,transformation,conversion,start,end,vintage,vintage_version,
+                                                   chunk_size,max_url_length,isolate_errors)
+        else:
+            ret = {'error':None,'data':[]}
+        return await self._blocking(self._store_multiseries,ret,mnemonics,params,cached)
+
+    async def _get_multiseries_json(self, mnemonics:list, freq:int=None, transformation:int=None, conversion:int=None, start:str=None, end:str=None, vintage:str=None, vintage_version:int=None,
+                                    chunk_size:int=25, max_url_length:int=2000, isolate_errors:bool=True):
+        query = self._series_query(freq,transformation,conversion,start,end,vintage,vintage_version)
+        chunks = self._chunk_mnemonics(list(mnemonics),query,min(chunk_size,25),max_url_length)
+        t0 = time.perf_counter()
+        results = await asyncio.gather(*[self._fetch_multiseries_chunk(c,query,isolate_errors) for c in chunks])
+        return self._fanout_result(chunks,results,time.perf_counter() - t0)
+
+    async def get_multiseries(self, mnemonics:list, freq:int=None, transformation:int=None, conversion:int=None, start:str=None, end:str=None, vintage:str=None, vintage_version:int=None,
+                              chunk_size:int=25, max_url_length:int=2000, isolate_errors:bool=True, as_frame:bool=False,
+                              as_records:bool=False, dtype:str='float64'):
+        jsons = await self.get_multiseries_json(mnemonics,freq,transformation,conversion,start,end,vintage,vintage_version,
+                                                chunk_size,max_url_length,isolate_errors)
+        if as_records:
+            return SeriesBatch.from_records((self._multiseries_arrays(js) for js in jsons.get('data') or [] if js.get('data')),dtype)
+        if as_frame:
+            return self._to_frames([self._multiseries_arrays(js) for js in jsons.get('data') or [] if js.get('data')])
+        return self._multiseries_to_pandas(jsons)
+
+    async def get_series_vintages(self, mnemonic:str):
+        url = f'{self._base_uri}/vintages?m={urllib.parse.quote(mnemonic)}'
+        if self._cache is not None:
+            key = SeriesCache.key('vintages',mnemonic)
+            ret = await self._blocking(self._cache.get,key)
+            if ret is not None:
+                return ret
+        ret = await self.request(url=url,method="get")
+        if self._cache is not None and isinstance(ret,list):
+            await self._blocking(self._cache.put,key,ret)
+        return ret
+
+    async def load_vintages(self, store, mnemonics:list, vintages:list=None):
+        # see DataBuffetAPI.load_vintages; concurrency is bounded by max_concurrency
+        store = VintageCube(store) if isinstance(store,str) else store
+        t0 = time.perf_counter()
+        wanted = None if vintages is None else [v if isinstance(v,(tuple,list)) else (v,None) for v in vintages]
+        async def listing(mnemonic):
+            if wanted is not None and all(n is not None for _, n in wanted):
+                return wanted
+            listed = await self.get_series_vintages(mnemonic)
+            listed = [(v['vintage'],v.get('version')) for v in listed] if isinstance(listed,list) else []
+            if wanted is None:
+                return listed
+            return [(v, n) for v, n in listed if (v,None) in wanted or (v,n) in wanted]
+        fetched = 0
+        skipped = 0
+        failed = []
+        async def fetch(mnemonic, vintage, version):
+            nonlocal fetched
+            try:
+                js = await self._series_json(mnemonic,vintage=vintage,vintage_version=version)
+                if not isinstance(js,dict) or not isinstance(js.get('data'),dict):
+                    raise Exception(js.get('error') if isinstance(js,dict) and js.get('error') else 'No data returned')
+                _, freq, start, values, _ = self._series_arrays(js)
+                store.add(mnemonic,vintage,version,freq,start,values)
+                fetched += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as ex:
+                failed.append({'mnemonic':mnemonic,'vintage':vintage,'version':version,'error':str(ex)})
+        tasks = []
+        for mnemonic, listed in zip(mnemonics,await asyncio.gather(*[listing(m) for m in mnemonics])):
+            new = [(mnemonic,v,n) for v, n in listed if not store.has(mnemonic,v,n)]
+            skipped += len(listed) - len(new)
+            tasks.extend(new)
+        await asyncio.gather(*[fetch(*task) for task in tasks])
+        return {'fetched':fetched,'skipped':skipped,'failed':failed,'elapsed':time.perf_counter() - t0}
+
+    async def _metadata(self, url:str):
+        if self._metadata_cache is None:
+            return await self.request(url=url,method="get")
+        found, ret = self._metadata_cache.get(url)
+        if not found:
+            ret = await self.request(url=url,method="get")
+            if ret != {}:
+                self._metadata_cache.put(url,ret)
+        return ret
+
+    async def get_frequencies(self):
+        url = f'{self._base_uri}/frequencies'
+        return await self._metadata(url)
+
+    async def get_baskets_file_types(self):
+        url = f'{self._base_uri}/filetypes?type=baskets'
+        return await self._metadata(url)
+
+    async def get_baskets_list(self, filetype:int=None):
+        url = f'{self._base_uri}/baskets'
+        if filetype is not None:
+            url = f'{url}?filetype={filetype}'
+        return await self._metadata(url)
+
+    async def get_basket_info(self, basket_id:str):
+        url = f'{self._base_uri}/baskets/{basket_id}'
+        return await self._metadata(url)
+
+    async def get_basket_contents(self, basket_id:str):
+        url = f'{self._base_uri}/baskets/{basket_id}/contents'
+        return await self._metadata(url)
+
+    async def get_basket_output_file(self, basket_id:str, saveto:str=None, as_frame:bool=False, stream:bool=False, as_records:bool=False, dtype:str='float64', workers:int=1):
+        url = f'{self._base_uri}/baskets/{basket_id}/output-file'
+        if stream:
+            if saveto is None:
+                raise Exception('saveto is required when stream=True')
+            if await self.download(url,saveto) is None:
+                raise Exception(f'Error - could not download output file of basket {basket_id}')
+            return saveto
+        basket_data = await self.request(url=url,method="get")
+        return self._basket_output(basket_data,saveto,as_frame,as_records,dtype,workers)
+
+    async def create_basket(self, title:str, filetype=None, decimals:int=None, start:str=None, end:str=None, date_option=None, frequency=None, showLastHistory:bool=None):
+        url = f'{self._base_uri}/baskets'
+        pl = self._basket_option_payload(title,filetype)
+        ret = await self.request(url=url,method="post",payload=pl)
+        self._baskets_changed()
+        await self.edit_basket_settings(basket_id=ret['basketId'],decimals=decimals,start=start,end=end,date_option=date_option,frequency=frequency,showLastHistory=showLastHistory)
+        return ret
+
+    async def edit_basket_settings(self, basket_id:str, title:str=None, filetype=None, decimals:int=None, start:str=None, end:str=None, date_option=None, frequency=None, showLastHistory:bool=None):
+        url = f'{self._base_uri}/baskets/{basket_id}'
+        pl = self._basket_option_payload(title,filetype,decimals,start,end,date_option,frequency,showLastHistory)
+        ret = await self.request(url=url,method="post",payload=pl)
+        self._baskets_changed()
+        return ret
+
+    async def add_series_to_basket(self, basket_id:str, mnemonics:list):
+        url = f'{self._base_uri}/baskets/{basket_id}/Series'
+        pl = [{'mnemonic':mnemonic} for mnemonic in mnemonics]
+        ret = await self.request(url=url,method="post",payload=pl)
+        self._baskets_changed()
+        return ret
+
+    async def delete_basket(self, basket_ids):
+        if isinstance(basket_ids,str):
+            basket_ids = [basket_ids]
+        url = f'{self._base_uri}/baskets'
+        ret = await self.request(url=url,method="delete",payload=list(basket_ids))
+        self._baskets_changed()
+        return ret
+
+    async def _find_bulk_basket(self, title:str, mnemonics:list):
+        baskets = await self.get_baskets_list()
+        if not isinstance(baskets,list):
+            return None
+        for basket in baskets:
+            if isinstance(basket,dict) and basket.get('name') == title:
+                if self._basket_holds(await self.get_basket_contents(basket['basketId']),mnemonics):
+                    return basket['basketId']
+        return None
+
+    async def fetch_bulk(self, mnemonics:list, freq:int=None, transformation:int=None, conversion:int=None, start:str=None, end:str=None, vintage:str=None, vintage_version:int=None,
+                         as_frame:bool=False, basket_threshold:int=250, reuse_basket:bool=True, sleep:float=2, timeout:float=None,
+                         as_records:bool=False, dtype:str='float64'):
+        # see DataBuffetAPI.fetch_bulk; concurrency is bounded by max_concurrency
+        t0 = time.perf_counter()
+        mnemonics = list(dict.fromkeys(m.strip() for m in mnemonics))
+        params = (freq,transformation,conversion,start,end,vintage,vintage_version)
+        path = self._bulk_path(mnemonics,params,basket_threshold)
+        if path == 'series':
+            ret = self._bulk_series(await self._series_json(mnemonics[0],*params),mnemonics[0],as_frame,as_records,dtype)
+        elif path == 'multi-series':
+            ret = await self.get_multiseries(mnemonics,*params,as_frame=as_frame,as_records=as_records,dtype=dtype)
+        else:
+            ret = await self._fetch_basket(mnemonics,start,end,as_frame,reuse_basket,sleep,timeout,as_records,dtype)
+        self.last_bulk_stats = {'path':path,'series':len(mnemonics),'elapsed':time.perf_counter() - t0}
+        return ret
+
+    async def _fetch_basket(self, mnemonics:list, start:str=None, end:str=None, as_frame:bool=False, reuse_basket:bool=True, sleep:float=2, timeout:float=None,
+                            as_records:bool=False, dtype:str='float64'):
+        title = self._bulk_title(mnemonics,start,end,reuse_basket)
+        basket_id = await self._find_bulk_basket(title,mnemonics) if reuse_basket else None
+        created = basket_id is None
+        if created:
+            basket = await self.create_basket(title,filetype=DBFileType.JSON,start=start,end=end)
+            if not isinstance(basket,dict) or 'basketId' not in basket:
+                raise Exception('Error - could not create basket')
+            basket_id = basket['basketId']
+        filled = not created
+        try:
+            if created and not await self.add_series_to_basket(basket_id,mnemonics):
+                raise Exception(f'Error - could not add series to basket {basket_id}')
+            order = await self.run_basket(basket_id)
+            if not isinstance(order,dict) or 'orderId' not in order:
+                raise Exception(f'Error - could not run basket {basket_id}')
+            filled = True
+            await self.wait_for_order(order,sleep=sleep,timeout=timeout)
+            return await self.get_basket_output_file(basket_id,as_frame=as_frame,as_records=as_records,dtype=dtype)
+        finally:
+            # a basket created here that never ran may be half-filled: it would not match its title's contents
+            # on the next run, so it is deleted rather than left behind
+            if not reuse_basket or not filled:
+                await self.delete_basket([basket_id])
+
+    async def get_orders(self):
+        url = f'{self._base_uri}/orders'
+        return await self.request(url=url,method="get")
+
+    async def run_basket(self, basket_id:str):
+        url = f'{self._base_uri}/orders?id={basket_id}&type=baskets&action=run'
+        ret = await self.request(url=url,method="post")
+        self._baskets_changed()
+        return ret
+
+    async def get_order_status(self, order):
+        if type(order) is dict:
+            order_id = order['orderId']
+        else:
+            order_id = order
+        url = f'{self._base_uri}/orders/{order_id}'
+        return await self.request(url=url,method="get")
+
+    async def wait_for_order(self, order, sleep:float=5, timeout:float=None):
+        # polling holds no lock or connection between checks, so cancelling the task is always safe
+        deadline = None if timeout is None else time.monotonic() + timeout
+        status = await self.get_order_status(order)
+        while status['dateFinished'] is None:
+            if deadline is not None and time.monotonic() + sleep > deadline:
+                raise TimeoutError(f'Order not finished after {timeout} seconds')
+            await asyncio.sleep(sleep)
+            status = await self.get_order_status(order)
+        return status
+
+    async def search(self, query:str, rows:int=30, start:int=0):
+        url = f'{self._base_uri}/search?q={urllib.parse.quote(query)}&start={start}&rows={rows}'
+        return await self.request(url=url,method="get")
+
+    async def search_iter(self, query:str, rows:int=100, max_workers:int=4, limit:int=None, index=None, max_age:float=None):
+        # async generator, same behaviour as DataBuffetAPI.search_iter
+        if isinstance(index,str):
+            index = SearchIndex(index)
+        if index is not None:
+            stored = index.query(query,max_age)
+            if stored is not None:
+                for r in stored[:limit]:
+                    yield r
+                return
+        seen = set()
+        def unique(page, start):
+            if not isinstance(page,dict):
+                raise Exception(f'Error - search for {query} failed at start={start}')
+            ret = []
+            for r in page.get('results') or []:
+                if r.get('mnemonic') is not None and r['mnemonic'] not in seen:
+                    seen.add(r['mnemonic'])
+                    ret.append(r)
+            if index is not None and ret:
+                index.add(ret)
+            return ret, len(page.get('results') or [])
+        first = await self.search(query,rows,0)
+        results, n = unique(first,0)
+        total = first.get('numFound')
+        mnemonics = [r['mnemonic'] for r in results]
+        for r in results[:limit]:
+            yield r
+        if limit is not None and len(mnemonics) >= limit:
+            return
+        end = total if limit is None or total is None else min(total,limit)
+        if total is None:
+            start = rows
+            while n == rows and (limit is None or len(mnemonics) < limit):
+                results, n = unique(await self.search(query,rows,start),start)
+                mnemonics += [r['mnemonic'] for r in results]
+                for r in results[:None if limit is None else limit - len(mnemonics) + len(results)]:
+                    yield r
+                if limit is not None and len(mnemonics) >= limit:
+                    return
+                start += rows
+        else:
+            starts = iter(range(rows,end,rows))
+            pending = [(s,asyncio.ensure_future(self.search(query,rows,s))) for _, s in zip(range(2*max(1,max_workers)),starts)]
+            try:
+                while pending:
+                    start, task = pending.pop(0)
+                    following = next(starts,None)
+                    if following is not None:
+                        pending.append((following,asyncio.ensure_future(self.search(query,rows,following))))
+                    results, n = unique(await task,start)
+                    mnemonics += [r['mnemonic'] for r in results]
+                    for r in results[:None if limit is None else limit - len(mnemonics) + len(results)]:
+                        yield r
+                    if limit is not None and len(mnemonics) >= limit:
+                        return
+            finally:
+                for _, task in pending:
+                    task.cancel()
+        if index is not None and (limit is None or len(mnemonics) < limit):
+            index.save_query(query,mnemonics,total)
+
+    async def search_all(self, query:str, rows:int=100, max_workers:int=4, limit:int=None, index=None, max_age:float=None):
+        return [r async for r in self.search_iter(query,rows,max_workers,limit,index,max_age)]
+
+# Command line bulk download: python -m dbapi fetch mnemonics.txt -o out --format parquet --workers 8
+# Credentials come from DBAPI_ACCESS_KEY / DBAPI_ENCRYPTION_KEY (and DBAPI_BASE_URI), else from a config file
+# (--config, default ~/.dbapi.ini) with access_key / encryption_key / base_uri in a [dbapi] section. Every
+# finished multi-series chunk is saved under <out>.parts and appended to <out>.manifest.jsonl, so an
+# interrupted run started again only fetches the chunks still missing.
+
+def _credentials(config:str=None):
+    acc_key = os.environ.get('DBAPI_ACCESS_KEY')
+    enc_key = os.environ.get('DBAPI_ENCRYPTION_KEY')
+    base_uri = os.environ.get('DBAPI_BASE_URI')
+    path = os.path.expanduser(config or '~/.dbapi.ini')
+    if os.path.exists(path) and (acc_key is None or enc_key is None or base_uri is None):
+        import configparser
+        parser = configparser.ConfigParser()
+        parser.read(path)
+        section = parser['dbapi'] if parser.has_section('dbapi') else {}
+        acc_key = acc_key or section.get('access_key')
+        enc_key = enc_key or section.get('encryption_key')
+        base_uri = base_uri or section.get('base_uri')
+    elif config is not None and not os.path.exists(path):
+        raise Exception(f'Error - config file {path} not found')
+    if not acc_key or not enc_key:
+        raise Exception('Error - set DBAPI_ACCESS_KEY and DBAPI_ENCRYPTION_KEY or put access_key / encryption_key in the [dbapi] section of ~/.dbapi.ini')
+    return acc_key, enc_key, base_uri
+
+def _read_mnemonics(path:str):
+    # one or more mnemonics per line (comma, semicolon or whitespace separated); '#' starts a comment
+    with open(path,'r') as f:
+        names = [m for line in f for m in re.split(r'[,;\s]+',line.split('#')[0]) if m]
+    return list(dict.fromkeys(names))
+
+def _read_manifest(path:str):
+    # completed chunks by id; a line cut short by an interruption is ignored
+    done = {}
+    if os.path.exists(path):
+        with open(path,'r') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                done[entry['chunk']] = entry
+    return done
+
+def fetch_to(api, mnemonics:list, output:str, format:str='parquet', workers:int=4, chunk_size:int=25, freq:int=None, transformation:int=None,
+             conversion:int=None, start:str=None, end:str=None, retry_failed:bool=False, progress:bool=True):
+    # Resumable bulk download of mnemonics into output (format: parquet, arrow, csv or json); returns a summary dict
+    if format not in ('parquet','arrow','csv','json'):
+        raise Exception(f'Error - unknown output format {format}')
+    t0 = time.perf_counter()
+    bytes0 = api.metrics.snapshot()['totals']['bytes'] if api.metrics is not None else 0
+    query = api._series_query(freq,transformation,conversion,start,end)
+    chunks = api._chunk_mnemonics(list(mnemonics),query,min(chunk_size,25))
+    ids = [hashlib.sha1((';'.join(c) + query).encode('utf-8')).hexdigest()[:16] for c in chunks]
+    parts = f'{output}.parts'
+    manifest = f'{output}.manifest.jsonl'
+    os.makedirs(parts,exist_ok=True)
+    done = _read_manifest(manifest)
+    pending = [(i,c) for i, c in zip(ids,chunks) if i not in done or not os.path.exists(os.path.join(parts,f'{i}.json'))
+               or (retry_failed and done[i]['failed'])]
+    lock = threading.Lock()
+    finished = []
+    def one(item):
+        chunk_id, chunk = item
+        js, errors = api._fetch_multiseries_chunk(chunk,query)
+        data = js['data'] if js is not None else []
+        part = os.path.join(parts,f'{chunk_id}.json')
+        with open(f'{part}.part','w') as f:
+            json.dump({'data':data,'errors':errors},f)
+        os.replace(f'{part}.part',part)
+        failed = [m for e in errors for m in e['mnemonics']]
+        series = sum(1 for item in data if item.get('data') and not item.get('error'))
+        entry = {'chunk':chunk_id,'series':series,'failed':failed,'time':time.time()}
+        with lock:
+            with open(manifest,'a') as f:
+                f.write(json.dumps(entry) + '\n')
+            done[chunk_id] = entry
+            finished.append(chunk_id)
+            if progress:
+                print(f'\r{len(chunks) - len(pending) + len(finished)}/{len(chunks)} chunks',end='',flush=True)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1,workers)) as pool:
+        list(pool.map(one,pending))
+    if progress and pending:
+        print()
+    fetch_time = time.perf_counter() - t0
+    # assemble the output from every part, in input order
+    items = []
+    for chunk_id in ids:
+        with open(os.path.join(parts,f'{chunk_id}.json'),'r') as f:
+            items.extend(js for js in json.load(f)['data'] if js.get('data') and not js.get('error'))
+    if format == 'json':
+        with open(f'{output}.part','w') as f:
+            json.dump({'series':items},f)
+        os.replace(f'{output}.part',output)
+    else:
+        batch = SeriesBatch.from_records(api._multiseries_arrays(js) for js in items)
+        if format == 'csv':
+            frames, meta = batch.to_frames()
+            os.makedirs(output,exist_ok=True)
+            for f, frame in frames.items():
+                frame.to_csv(os.path.join(output,f'values-{f}.csv'),index_label='date')
+            meta.to_csv(os.path.join(output,'meta.csv'))
+        else:
+            write_columnar(batch,output,format)
+    elapsed = time.perf_counter() - t0
+    nbytes = (api.metrics.snapshot()['totals']['bytes'] if api.metrics is not None else 0) - bytes0
+    failed = sorted({m for i in ids for m in done[i]['failed']})
+    return {'chunks':len(chunks),'resumed':len(chunks) - len(pending),'fetched':len(finished),'series':len(items),'failed':failed,
+            'bytes':nbytes,'fetch_time':fetch_time,'elapsed':elapsed,'series_per_sec':len(items)/elapsed if elapsed > 0 else 0.0,
+            'mb_per_sec':nbytes/1e6/fetch_time if fetch_time > 0 else 0.0,'output':output}
+
+def main(argv:list=None):
+    import argparse
+    parser = argparse.ArgumentParser(prog='python -m dbapi',description='Data Buffet API command line')
+    commands = parser.add_subparsers(dest='command',required=True)
+    fetch = commands.add_parser('fetch',help='bulk download series listed in a file (resumable)')
+    fetch.add_argument('mnemonics',help='file with the mnemonics to download')
+    fetch.add_argument('-o','--output',required=True,help='output file (json) or directory (parquet, arrow, csv)')
+    fetch.add_argument('--format',choices=['parquet','arrow','csv','json'],default='parquet')
+    fetch.add_argument('--workers',type=int,default=4,help='concurrent requests (paced by the rate limiter)')
+    fetch.add_argument('--chunk-size',type=int,default=25,help='mnemonics per multi-series request (max 25)')
+    fetch.add_argument('--freq',type=int,default=None)
+    fetch.add_argument('--transformation',type=int,default=None)
+    fetch.add_argument('--conversion',type=int,default=None)
+    fetch.add_argument('--start',default=None,help='start date, YYYY-MM-DD')
+    fetch.add_argument('--end',default=None,help='end date, YYYY-MM-DD')
+    fetch.add_argument('--config',default=None,help='credentials file (default ~/.dbapi.ini)')
+    fetch.add_argument('--base-uri',default=None,help='API base URI, e.g. a dbapi_mock_server.py instance')
+    fetch.add_argument('--retry-failed',action='store_true',help='fetch again the chunks where some series failed')
+    fetch.add_argument('--quiet',action='store_true')
+    args = parser.parse_args(argv)
+    try:
+        acc_key, enc_key, base_uri = _credentials(args.config)
+        mnemonics = _read_mnemonics(args.mnemonics)
+        api = DataBuffetAPI(acc_key,enc_key,base_uri=args.base_uri or base_uri)
+        summary = fetch_to(api,mnemonics,args.output,args.format,args.workers,args.chunk_size,args.freq,args.transformation,
+                           args.conversion,args.start,args.end,args.retry_failed,not args.quiet)
+    except Exception as ex:
+        print(ex)
+        return 1
+    print(f'{summary["series"]} series in {summary["chunks"]} chunks ({summary["resumed"]} already done, {summary["fetched"]} fetched) -> {summary["output"]}')
+    print(f'{summary["bytes"]/1e6:.1f} MB in {summary["fetch_time"]:.1f}s ({summary["mb_per_sec"]:.2f} MB/s), '
+          f'{summary["elapsed"]:.1f}s total ({summary["series_per_sec"]:.1f} series/s)')
+    if summary['failed']:
+        print(f'{len(summary["failed"])} series failed: {", ".join(summary["failed"][:10])}{" ..." if len(summary["failed"]) > 10 else ""}')
+    return 2 if summary['failed'] else 0
+
+if __name__ == '__main__':
+    import sys
+    sys.exit(main())
@@ -0,0 +1,306 @@
+#####
+# Data Buffet API
+# Code sample: Python
+# Description: Offline benchmarks for dbapi.py (no API key or network needed); the client benchmarks run
+#              against the local mock server in dbapi_mock_server.py
+
+import os
+import sys
+import json
+import time
+import subprocess
+import argparse
+import threading
+import concurrent.futures
+try:
+    import dbapi
+    import dbapi_mock_server
+except Exception as ex:
+    print(ex)
+    print('Make sure dbapi.py is downloaded to the same directory as this program, and run again')
+    print('Get it here: https://github.com/moodysanalytics/databuffet-api-codesamples/blob/master/Python/dbapi.py')
+    sys.exit()
+import pandas as pd
+import numpy as np
+
+def synthetic_series_json(mnemonic:str, periods:int, freq:str='DAILY', start:str='1970-01-01', missing:float=0.05, seed:int=0):
+    rng = np.random.default_rng(seed)
+    values = rng.normal(100, 10, periods)
+    values[rng.random(periods) < missing] = dbapi.MISSING_VALUE
+    return {'data':{'freq':freq,'startDate':f'{start}T00:00:00Z','periods':periods,'data':values.tolist()},
+            'mnemonic':mnemonic,'concept':mnemonic.split('.')[0],'geoCode':'IUSA','geoTitle':'United States',
+            'description':f'Synthetic series {mnemonic}','source':'dbapi_benchmark','observedAttribute':'AVERAGED',
+            'lastHistory':'N/A','dateCreated':'2020-01-01T00:00:00Z','dateUpdated':'2020-01-01T00:00:00Z','dateExecuted':'2020-01-01T00:00:00Z'}
+
+def synthetic_multiseries_json(mnemonics:list, periods:int, freq:str='DAILY', start:str='1970-01-01'):
+    index = pd.date_range(freq=dbapi._FREQ_DICT[freq], start=start, periods=periods).strftime('%Y-%m-%d')
+    data = []
+    for i, m in enumerate(mnemonics):
+        js = synthetic_series_json(m,periods,freq,start,seed=i)
+        data.append({'mnemonic':m,'freqCode':freq,'description':js['description'],'source':js['source'],
+                     'observedAttribute':'AVERAGED','geoTitle':'United States','lastHistory':'N/A','error':None,
+                     'data':[{'date':d,'value':v} for d, v in zip(index, js['data']['data'])]})
+    return {'error':None,'data':data}
+
+# Decoders as they were before vectorization, kept as the baseline for comparison
+def legacy_to_pandas(api, js:dict):
+    index = pd.date_range(freq=api._freq_dict[js['data']['freq']], start=js['data']['startDate'][:10], periods=js['data']['periods'])
+    data = [np.nan if x == -3.4028234663852886e+38 else x for x in js['data']['data']]
+    ret = pd.Series(index=index,data=data)
+    ret.mnemonic=js['mnemonic']
+    ret.description=js['description']
+    ret.source=js['source']
+    ret.date_created=pd.to_datetime(js['dateCreated'])
+    ret.date_updated=pd.to_datetime(js['dateUpdated'])
+    ret.date_accessed=pd.to_datetime(js['dateExecuted'])
+    ret.observed=js['observedAttribute']
+    ret.geography=js['geoTitle']
+    ret.concept=js['concept']
+    ret.geo_code=js['geoCode']
+    ret.last_history = None if js['lastHistory'] == 'N/A' else pd.Period(js['lastHistory'], freq=ret.index.freq).to_timestamp()
+    return ret
+
+def legacy_multiseries(api, jsons:dict):
+    ret = {}
+    for js in jsons['data']:
+        index = pd.date_range(freq=api._freq_dict[js['freqCode']], start=js['data'][0]['date'], end=js['data'][-1]['date'])
+        data = [np.nan if x['value'] == -3.4028234663852886e+38 else x['value'] for x in js['data']]
+        v = js['mnemonic']
+        ret[v] = pd.Series(index=index,data=data)
+        ret[v].mnemonic=v
+        ret[v].description=js['description']
+        ret[v].source=js['source']
+        ret[v].observed=js['observedAttribute']
+        ret[v].geography=js['geoTitle']
+        ret[v].last_history = None if js['lastHistory'] == 'N/A' else js['lastHistory']
+    return ret
+
+def timed(fn, repeat:int=3):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def report(name:str, legacy:float, current:float, count:int):
+    if legacy is None:
+        print(f'{name:<28} current {current:8.3f}s   ({count/current:,.0f} series/s)')
+    else:
+        print(f'{name:<28} legacy {legacy:8.3f}s   current {current:8.3f}s   speedup {legacy/current:6.1f}x   ({count/current:,.0f} series/s)')
+
+def bench_decode(n_series:int=200, periods:int=365*50, freq:str='DAILY', legacy:bool=True, pool:int=200):
+    # at most `pool` distinct payloads are generated and cycled, so 10k x 50-year daily series fit in memory
+    api = dbapi.DataBuffetAPI('','')
+    unique = [synthetic_series_json(f'S{i}.IUSA',periods,freq,seed=i) for i in range(min(n_series,pool))]
+    payloads = [unique[i % len(unique)] for i in range(n_series)]
+    repeat = 3 if n_series <= 1000 else 1
+    base = timed(lambda: [legacy_to_pandas(api, js) for js in payloads],repeat) if legacy else None
+    current = timed(lambda: [api._to_pandas(js) for js in payloads],repeat)
+    report('_to_pandas', base, current, n_series)
+
+def bench_multiseries_decode(n_series:int=100, periods:int=365*20, freq:str='DAILY', legacy:bool=True):
+    api = dbapi.DataBuffetAPI('','')
+    jsons = synthetic_multiseries_json([f'S{i}.IUSA' for i in range(n_series)],periods,freq)
+    base = timed(lambda: legacy_multiseries(api, jsons)) if legacy else None
+    current = timed(lambda: api._multiseries_to_pandas(jsons))
+    report('get_multiseries decoding', base, current, n_series)
+
+HEAVY_MODULES = ('pandas','numpy','requests','asyncio','sqlite3')
+
+def bench_import(repeat:int=5, budget_ms:float=None):
+    # `import dbapi` in fresh interpreters: best cumulative time from -X importtime, and which heavy
+    # dependencies got loaded eagerly. Returns False on a regression (heavy import or budget exceeded).
+    here = os.path.dirname(os.path.abspath(__file__))
+    code = f'import sys, dbapi; print(",".join(m for m in {HEAVY_MODULES!r} if m in sys.modules))'
+    best = None
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable,'-X','importtime','-c',code],cwd=here,capture_output=True,text=True)
+        line = [l for l in out.stderr.splitlines() if l.rstrip().endswith('| dbapi')][-1]
+        elapsed = int(line.split('|')[1]) / 1000
+        best = elapsed if best is None else min(best,elapsed)
+        loaded = out.stdout.strip()
+    ok = not loaded and (budget_ms is None or best <= budget_ms)
+    print(f'{"import dbapi":<28} {best:8.1f}ms   eager heavy imports: {loaded or "none"}{"" if ok else "   REGRESSION"}')
+    return ok
+
+def bench_records_memory(n_series:int=1000, periods:int=365*20, freq:str='DAILY'):
+    # memory held by a decoded multi-series pull: dict of pd.Series vs SeriesBatch (float64 / float32)
+    import tracemalloc
+    api = dbapi.DataBuffetAPI('','')
+    jsons = synthetic_multiseries_json([f'R{i}.IUSA' for i in range(n_series)],periods,freq)
+    builders = [('dict of pd.Series', lambda: api._multiseries_to_pandas(jsons)),
+                ('SeriesBatch float64', lambda: dbapi.SeriesBatch.from_records(api._multiseries_arrays(js) for js in jsons['data'])),
+                ('SeriesBatch float32', lambda: dbapi.SeriesBatch.from_records((api._multiseries_arrays(js) for js in jsons['data']),'float32'))]
+    for name, build in builders:
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        out = build()
+        elapsed = time.perf_counter() - t0
+        held = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print(f'{name:<28} {elapsed:8.3f}s   {held/1024**2:8.1f} MB held for {n_series} series')
+        del out
+
+def bench_json(n_series:int=200, periods:int=365*20, freq:str='DAILY'):
+    # basket output JSON body to float64 arrays: str decode + stdlib json (the old path), the JSON backend on
+    # bytes, and json_loads_arrays; time and peak traced memory
+    import tracemalloc
+    body = json.dumps({'series':[synthetic_series_json(f'J{i}.IUSA',periods,freq,seed=i) for i in range(n_series)]}).encode('utf-8')
+    arrays = lambda js: [dbapi._decode_values(s['data']['data']) for s in js['series']]
+    decoders = [('stdlib json on str', lambda: arrays(json.loads(body.decode('utf-8')))),
+                (f'{dbapi.json_backend()} on bytes', lambda: arrays(dbapi.json_loads(body))),
+                ('json_loads_arrays', lambda: arrays(dbapi.json_loads_arrays(body,dbapi._SERIES_ARRAYS['baskets/{id}/output-file'])))]
+    print(f'{len(body)/1024**2:.1f} MB basket output JSON ({n_series} series x {periods} periods)')
+    for name, decode in decoders:
+        # timed untraced, then run again under tracemalloc for the peak
+        t0 = time.perf_counter()
+        decode()
+        elapsed = time.perf_counter() - t0
+        tracemalloc.start()
+        decode()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f'{name:<28} {elapsed:8.3f}s   {peak/1024**2:8.1f} MB peak')
+
+class LatencyRecorder:
+    # collects per-request latencies through the client's ClientMetrics end hook
+    def __init__(self, api):
+        self.latencies = []
+        self._lock = threading.Lock()
+        api.metrics.on_request_end(self._record)
+
+    def _record(self, info:dict):
+        with self._lock:
+            self.latencies.append(info['latency'])
+
+    def reset(self):
+        with self._lock:
+            self.latencies = []
+
+    def p95(self):
+        return float(np.percentile(self.latencies,95) * 1000) if self.latencies else 0.0
+
+    def percentiles(self):
+        if not self.latencies:
+            return 'no requests'
+        p50, p95, p99 = np.percentile(self.latencies,[50,95,99]) * 1000
+        return f'{len(self.latencies)} requests, latency p50 {p50:.1f}ms p95 {p95:.1f}ms p99 {p99:.1f}ms'
+
+def report_run(name:str, elapsed:float, count:int, recorder:LatencyRecorder, api, bytes_before:int=0):
+    received = api.metrics.snapshot()['totals']['bytes'] - bytes_before
+    print(f'{name:<28} {elapsed:8.3f}s   {count/elapsed:10,.0f} series/s   {received/elapsed/1024**2:7.1f} MB/s   {recorder.percentiles()}')
+    return {'name':name,'series_per_sec':count/elapsed,'p95_ms':recorder.p95()}
+
+def check_budgets(results:list, min_throughput:float=None, max_p95_ms:float=None):
+    # False if any client benchmark ran below min_throughput series/s or above max_p95_ms request latency
+    ok = True
+    for r in results:
+        if min_throughput is not None and r['series_per_sec'] < min_throughput:
+            print(f'REGRESSION {r["name"]}: {r["series_per_sec"]:,.0f} series/s < {min_throughput:,.0f}')
+            ok = False
+        if max_p95_ms is not None and r['p95_ms'] > max_p95_ms:
+            print(f'REGRESSION {r["name"]}: p95 latency {r["p95_ms"]:.1f}ms > {max_p95_ms:.1f}ms')
+            ok = False
+    return ok
+
+def bench_get_series(mock, n_series:int=200, max_workers:int=8):
+    api = mock.client(metrics=True)
+    mnemonics = [f'GS{i}.IUSA' for i in range(n_series)]
+    api.get_series(mnemonics[0])
+    recorder = LatencyRecorder(api)
+    t0 = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as pool:
+        out = list(pool.map(api.get_series,mnemonics))
+    ret = [report_run(f'get_series x{max_workers} threads', time.perf_counter() - t0, len(out), recorder, api)]
+    api.close()
+    return ret
+
+def bench_get_multiseries(mock, n_series:int=1000, max_workers:int=4):
+    api = mock.client(metrics=True)
+    api.get_series('WARMUP.IUSA')
+    recorder = LatencyRecorder(api)
+    t0 = time.perf_counter()
+    out = api.get_multiseries([f'MS{i}.IUSA' for i in range(n_series)],max_workers=max_workers)
+    ret = [report_run(f'get_multiseries x{max_workers} workers', time.perf_counter() - t0, len(out), recorder, api)]
+    recorder.reset()
+    received = api.metrics.snapshot()['totals']['bytes']
+    t0 = time.perf_counter()
+    frames, meta = api.get_multiseries([f'MF{i}.IUSA' for i in range(n_series)],max_workers=max_workers,as_frame=True)
+    ret.append(report_run('get_multiseries as_frame', time.perf_counter() - t0, len(meta), recorder, api, received))
+    api.close()
+    return ret
+
+def bench_basket_pipeline(mock, n_series:int=1000):
+    # create basket, add series, run, poll, download and decode, then delete
+    api = mock.client(metrics=True)
+    recorder = LatencyRecorder(api)
+    t0 = time.perf_counter()
+    frames, meta = api.fetch_bulk([f'BK{i}.IUSA' for i in range(n_series)],basket_threshold=0,reuse_basket=False,sleep=0.1,as_frame=True)
+    ret = [report_run('basket pipeline', time.perf_counter() - t0, len(meta), recorder, api)]
+    api.close()
+    return ret
+
+def bench_throttled(mock, n_series:int=100, rate_429:float=0.1, max_workers:int=8):
+    # get_series while the server answers a share of requests with 429 (Retry-After: 0)
+    mock.rate_429, mock.retry_after = rate_429, 0
+    try:
+        api = mock.client(metrics=True,rate_limiter=dbapi.RateLimiter(rate=100000,per=1,burst=100,backoff=0.01,max_backoff=0.05,jitter=0.0))
+        recorder = LatencyRecorder(api)
+        t0 = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as pool:
+            out = list(pool.map(api.get_series,[f'TH{i}.IUSA' for i in range(n_series)]))
+        ret = [report_run(f'get_series {rate_429:.0%} 429s', time.perf_counter() - t0, len(out), recorder, api)]
+        api.close()
+        return ret
+    finally:
+        mock.rate_429 = 0.0
+
+class ExternalServer:
+    # a mock server started separately (python dbapi_mock_server.py ...), so it does not compete with the
+    # client for this process's GIL; its latency and fault settings come from its own command line
+    def __init__(self, base_uri:str):
+        self.base_uri = base_uri.rstrip('/')
+
+    client = dbapi_mock_server.MockDataBuffet.client
+
+def run_client_benchmarks(mock, args, throttled:bool=True):
+    # returns report_run results; the throttled run is excluded from the budgets since its 429s are injected
+    ret = bench_get_series(mock, args.series, args.workers)
+    ret += bench_get_multiseries(mock, args.series)
+    ret += bench_basket_pipeline(mock, args.series)
+    if throttled:
+        bench_throttled(mock, max(1,args.series//2), max_workers=args.workers)
+    return ret
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Offline benchmarks for dbapi.py')
+    parser.add_argument('--series', type=int, default=200, help='number of series per benchmark (full scale: --series 10000 --skip-legacy)')
+    parser.add_argument('--periods', type=int, default=365*50, help='observations per series')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds the mock server adds to every request')
+    parser.add_argument('--workers', type=int, default=8, help='client threads for the get_series benchmark')
+    parser.add_argument('--decode-only', action='store_true', help='only run the in-process decoding benchmarks')
+    parser.add_argument('--skip-legacy', action='store_true', help='do not time the pre-vectorization decoders (slow at 10k series)')
+    parser.add_argument('--import-budget', type=float, default=None, help='fail (exit 1) if import dbapi takes longer, in ms')
+    parser.add_argument('--min-throughput', type=float, default=None, help='fail (exit 1) if a client benchmark fetches fewer series/s')
+    parser.add_argument('--max-p95', type=float, default=None, help='fail (exit 1) if a client benchmark has a higher p95 request latency, in ms')
+    parser.add_argument('--server', default=None, help='base URI of a separately started mock server, e.g. http://127.0.0.1:8080/data/v1')
+    parser.add_argument('--json-backend', default='json', help='JSON backend for dbapi: json, orjson, ujson or fastest')
+    args = parser.parse_args()
+    dbapi.set_json_backend(args.json_backend)
+    if not bench_import(budget_ms=args.import_budget):
+        sys.exit(1)
+    bench_decode(args.series, args.periods, legacy=not args.skip_legacy)
+    bench_multiseries_decode(max(1,min(args.series//2,1000)), max(1,args.periods//2), legacy=not args.skip_legacy)
+    bench_records_memory(max(1,min(args.series,1000)), max(1,args.periods//2))
+    bench_json(max(1,min(args.series,500)), max(1,args.periods//2))
+    if args.decode_only:
+        results = []
+    elif args.server is not None:
+        results = run_client_benchmarks(ExternalServer(args.server), args, throttled=False)
+    else:
+        with dbapi_mock_server.MockDataBuffet(periods=args.periods,latency=args.latency,order_time=0.2) as mock:
+            results = run_client_benchmarks(mock, args)
+    if not check_budgets(results, args.min_throughput, args.max_p95):
+        sys.exit(1)
@@ -0,0 +1,447 @@
+#####
+# Data Buffet API
+# Code sample: Python
+# Description: Local stand-in for the Data Buffet API serving synthetic data, for offline benchmarks and tests
+#
+# Usage: python dbapi_mock_server.py --port 8080 --periods 18250 --latency 0.05
+#        api = dbapi.DataBuffetAPI('any','any',base_uri='http://127.0.0.1:8080/data/v1')
+
+import sys
+import json
+import gzip
+import time
+import uuid
+import zlib
+import random
+import socket
+import argparse
+import datetime
+import threading
+import http.server
+import urllib.parse
+import functools
+try:
+    import dbapi
+except Exception as ex:
+    print(ex)
+    print('Make sure dbapi.py is downloaded to the same directory as this program, and run again')
+    print('Get it here: https://github.com/moodysanalytics/databuffet-api-codesamples/blob/master/Python/dbapi.py')
+    sys.exit()
+import pandas as pd
+import numpy as np
+
+class MockDataBuffet:
+    # Serves /oauth2/token, /series, /multi-series, /baskets*, /orders*, /search, /vintages (and /frequencies,
+    # /filetypes, /health) under /data/v1 from a background thread. Every mnemonic is a deterministic random
+    # walk of `periods` observations at `freq`; mnemonics in `unknown` fail, per item in a multi-series
+    # response or, with reject_unknown, by rejecting the whole multi-series request with 400. Faults are injectable:
+    # latency (+ uniform jitter) per request, random 429/401 responses at rate_429/rate_401, or exact ones
+    # queued with inject(). Baskets run as orders that finish order_time seconds after they are submitted.
+    def __init__(self, host:str='127.0.0.1', port:int=0, freq:str='DAILY', periods:int=365*50, start:str='1970-01-01',
+                 latency:float=0.0, jitter:float=0.0, rate_429:float=0.0, rate_401:float=0.0, retry_after:int=1,
+                 order_time:float=0.5, token_ttl:int=3600, compress:bool=True, unknown=(), seed:int=0,
+                 reject_unknown:bool=False):
+        self.freq = freq
+        self.periods = periods
+        self.start_date = start
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_429 = rate_429
+        self.rate_401 = rate_401
+        self.retry_after = retry_after
+        self.order_time = order_time
+        self.token_ttl = token_ttl
+        self.compress = compress
+        self.unknown = set(m.upper() for m in unknown)
+        self.reject_unknown = reject_unknown
+        self.seed = seed
+        self.requests = {}
+        # TCP connections accepted, to check that clients reuse pooled keep-alive connections
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._faults = []
+        self._tokens = {}
+        self._revisions = {}
+        self._baskets = {}
+        self._orders = {}
+        self._updated = '2020-01-01T00:00:00Z'
+        self._index = pd.date_range(freq=dbapi._FREQ_DICT[freq],start=start,periods=periods)
+        self._dates = self._index.strftime('%Y-%m-%d').tolist()
+        self._server = http.server.ThreadingHTTPServer((host,port),_Handler)
+        self._server.daemon_threads = True
+        self._server.mock = self
+        self._thread = None
+
+    @property
+    def base_uri(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/data/v1'
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._server.serve_forever,daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread = None
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def client(self, cls=None, **kwargs):
+        # a client of class cls (default dbapi.DataBuffetAPI) pointed at this server, unthrottled unless asked
+        cls = dbapi.DataBuffetAPI if cls is None else cls
+        kwargs.setdefault('proxies',{})
+        kwargs.setdefault('rate_limiter',False)
+        return cls('mock-access-key','mock-encryption-key',base_uri=self.base_uri,**kwargs)
+
+    def inject(self, status:int, count:int=1, endpoint:str=None):
+        # the next `count` requests (other than token requests) are answered with `status`; with endpoint
+        # (e.g. 'baskets/{id}/series', as counted in `requests`) only requests to that endpoint
+        with self._lock:
+            self._faults.extend([(status,endpoint)]*count)
+
+    def revise(self, mnemonic:str):
+        # new values and dateUpdated for a mnemonic, as after a data release
+        with self._lock:
+            self._revisions[mnemonic.upper()] = self._revisions.get(mnemonic.upper(),0) + 1
+            self._updated = datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+    def _fault(self, endpoint:str):
+        with self._lock:
+            for i, (status, target) in enumerate(self._faults):
+                if target is None or target == endpoint:
+                    del self._faults[i]
+                    return status
+            if self.rate_429 and self._random.random() < self.rate_429:
+                return 429
+            if self.rate_401 and self._random.random() < self.rate_401:
+                return 401
+        return None
+
+    def _values(self, mnemonic:str):
+        revision = self._revisions.get(mnemonic,0)
+        return _walk(mnemonic,self.periods,self.seed + revision)
+
+    def _vintage_values(self, mnemonic:str, vintage:str, version:str):
+        # a vintage is the current series plus vintage-specific noise, ending two years after the vintage date
+        end = pd.Timestamp(f'{vintage[:4]}-{vintage[4:6] or "12"}-01') + pd.DateOffset(years=2)
+        periods = int(self._index.searchsorted(end))
+        rng = np.random.default_rng((zlib.crc32(f'{mnemonic}|{vintage}|{version}'.encode('utf-8')),self.seed))
+        values = np.array(self._values(mnemonic)[:periods])
+        missing = values == dbapi.MISSING_VALUE
+        values = values + rng.normal(0,0.5,periods)
+        values[missing] = dbapi.MISSING_VALUE
+        return values.round(4).tolist()
+
+    def _window(self, query:dict):
+        # observation range [i0, i1) for the startDate/endDate query parameters
+        i0, i1 = 0, self.periods
+        if query.get('startDate'):
+            i0 = int(self._index.searchsorted(pd.Timestamp(query['startDate'][:10])))
+        if query.get('endDate'):
+            i1 = int(self._index.searchsorted(pd.Timestamp(query['endDate'][:10]),side='right'))
+        return i0, max(i0,i1)
+
+    def _meta(self, mnemonic:str):
+        return {'mnemonic':mnemonic,'description':f'Synthetic series {mnemonic}','source':'dbapi_mock_server',
+                'observedAttribute':'AVERAGED','geoTitle':'United States','lastHistory':'N/A'}
+
+    def series(self, mnemonic:str, query:dict):
+        m = mnemonic.upper()
+        if m in self.unknown:
+            return None
+        i0, i1 = self._window(query)
+        if query.get('vintage'):
+            values = self._vintage_values(m,query['vintage'],query.get('vintageVersion','1'))
+            i1 = min(i1,len(values))
+        else:
+            values = self._values(m)
+        ret = self._meta(mnemonic)
+        ret.update({'data':{'freq':self.freq,'startDate':f'{self._dates[min(i0,self.periods-1)]}T00:00:00Z','periods':max(0,i1 - i0),
+                            'data':values[i0:i1]},
+                    'concept':mnemonic.split('.')[0],'geoCode':mnemonic.split('.')[-1],'dateCreated':'2020-01-01T00:00:00Z',
+                    'dateUpdated':self._updated if m in self._revisions else '2020-01-01T00:00:00Z',
+                    'dateExecuted':datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')})
+        return ret
+
+    def multiseries_item(self, mnemonic:str, query:dict):
+        # pre-encoded JSON; the per-observation {date,value} list is the costly part to build, so it is cached
+        m = mnemonic.upper()
+        if m in self.unknown:
+            return json.dumps({'mnemonic':mnemonic,'error':f'Series {mnemonic} not found','data':None})
+        i0, i1 = self._window(query)
+        return self._encoded_item(mnemonic,i0,i1,self._revisions.get(m,0))
+
+    @functools.lru_cache(maxsize=1024)
+    def _encoded_item(self, mnemonic:str, i0:int, i1:int, revision:int):
+        ret = self._meta(mnemonic)
+        ret.update({'freqCode':self.freq,'error':None,
+                    'data':[{'date':d,'value':v} for d, v in zip(self._dates[i0:i1],self._values(mnemonic.upper())[i0:i1])]})
+        return json.dumps(ret)
+
+    def search(self, query:dict):
+        q = query.get('q','').upper()
+        start, rows = int(query.get('start',0)), int(query.get('rows',30))
+        total = 1000
+        results = [{'mnemonic':f'{q or "SERIES"}{i}.IUSA','description':f'Synthetic series {q} {i}','geoTitle':'United States',
+                    'frequency':self.freq,'source':'dbapi_mock_server'} for i in range(start,min(total,start + rows))]
+        return {'numFound':total,'start':start,'rows':rows,'results':results}
+
+    def vintages(self, mnemonic:str):
+        months = pd.period_range(end=pd.Timestamp.utcnow().strftime('%Y-%m'),periods=24,freq='M')[::-1]
+        return [{'vintage':p.strftime('%Y%m'),'version':1,'dbName':f'MOCK_{p.strftime("%Y%m")}.db',
+                 'datePublishedUtc':p.to_timestamp().strftime('%Y-%m-%dT%H:%M:%S'),'note':None} for p in months]
+
+    def order_status(self, order:dict):
+        ret = dict(order)
+        finished = time.time() >= order['_due']
+        ret.pop('_due')
+        ret['dateFinished'] = ret['dateStarted'] if finished else None
+        ret['queueStatus'] = 2 if finished else 1
+        ret['processing'] = not finished
+        return ret
+
+    def basket_output(self, basket:dict):
+        query = {'startDate':basket.get('dateStart'),'endDate':basket.get('dateEnd')}
+        return {'series':[self.series(m,query) for m in basket['series'] if m.upper() not in self.unknown]}
+
+@functools.lru_cache(maxsize=4096)
+def _walk(mnemonic:str, periods:int, seed:int):
+    rng = np.random.default_rng((zlib.crc32(mnemonic.encode('utf-8')),seed))
+    values = 100 + np.cumsum(rng.normal(0,1,periods))
+    values[rng.random(periods) < 0.02] = dbapi.MISSING_VALUE
+    return values.round(4).tolist()
+
+def _now():
+    return datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.server.mock._lock:
+            self.server.mock.connections += 1
+        # headers and body are separate writes; with Nagle's algorithm the body waits for the client's delayed ACK
+        self.connection.setsockopt(socket.IPPROTO_TCP,socket.TCP_NODELAY,1)
+
+    def do_GET(self):
+        self._dispatch('get')
+
+    def do_POST(self):
+        self._dispatch('post')
+
+    def do_PUT(self):
+        self._dispatch('put')
+
+    def do_DELETE(self):
+        self._dispatch('delete')
+
+    def _reply(self, status:int, body, content_type:str='application/json', headers:dict=None):
+        if not isinstance(body,bytes):
+            body = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type',content_type)
+        for k, v in (headers or {}).items():
+            self.send_header(k,v)
+        if self.server.mock.compress and len(body) > 1024 and 'gzip' in self.headers.get('Accept-Encoding',''):
+            body = gzip.compress(body,compresslevel=1)
+            self.send_header('Content-Encoding','gzip')
+        self.send_header('Content-Length',str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return None
+        raw = self.rfile.read(length)
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return urllib.parse.parse_qs(raw.decode('utf-8'))
+
+    def _authorized(self):
+        mock = self.server.mock
+        auth = self.headers.get('Authorization','')
+        if auth.lower().startswith('bearer '):
+            with mock._lock:
+                expires = mock._tokens.get(auth[7:])
+            return expires is not None and expires > time.time()
+        return bool(self.headers.get('AccessKeyId') and self.headers.get('Signature'))
+
+    def _dispatch(self, method:str):
+        mock = self.server.mock
+        body = self._body()
+        url = urllib.parse.urlsplit(self.path)
+        path = url.path.rstrip('/')
+        if path.startswith('/data/v1'):
+            path = path[len('/data/v1'):]
+        parts = [p for p in path.split('/') if p]
+        query = {k:v[-1] for k, v in urllib.parse.parse_qs(url.query).items()}
+        endpoint = dbapi._GUID.sub('{id}','/'.join(parts)).lower() or '/'
+        with mock._lock:
+            mock.requests[endpoint] = mock.requests.get(endpoint,0) + 1
+        delay = mock.latency + (random.uniform(0,mock.jitter) if mock.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+        if parts[:2] == ['oauth2','token'] and method == 'post':
+            token = uuid.uuid4().hex
+            with mock._lock:
+                mock._tokens[token] = time.time() + mock.token_ttl
+            return self._reply(200,{'access_token':token,'token_type':'bearer','expires_in':mock.token_ttl})
+        fault = mock._fault(endpoint)
+        if fault == 429:
+            return self._reply(429,{'message':'Rate limit exceeded'},headers={'Retry-After':str(mock.retry_after)})
+        if fault is not None:
+            return self._reply(fault,{'message':f'Injected status {fault}'})
+        if not self._authorized():
+            return self._reply(401,{'message':'Authorization has been denied for this request.'})
+        try:
+            status, ret = self._route(method,parts,query,body)
+        except Exception as ex:
+            status, ret = 500, {'message':str(ex)}
+        if isinstance(ret,tuple):
+            return self._reply(status,ret[0],content_type=ret[1])
+        return self._reply(status,ret)
+
+    def _route(self, method:str, parts:list, query:dict, body):
+        mock = self.server.mock
+        head = parts[0].lower() if parts else ''
+        if head == 'health':
+            return 200, {'status':'ok'}
+        if head == 'series' and method == 'get':
+            ret = mock.series(query.get('m',''),query)
+            return (200, ret) if ret is not None else (400, {'message':f'Series {query.get("m")} not found'})
+        if head == 'multi-series' and method == 'get':
+            mnemonics = [m for m in query.get('m','').split(';') if m]
+            if len(mnemonics) > 25:
+                return 400, {'message':'At most 25 series per request'}
+            if mock.reject_unknown and any(m.upper() in mock.unknown for m in mnemonics):
+                return 400, {'message':'One or more series not found'}
+            return 200, f'{{"error":null,"data":[{",".join(mock.multiseries_item(m,query) for m in mnemonics)}]}}'.encode('utf-8')
+        if head == 'search' and method == 'get':
+            return 200, mock.search(query)
+        if head == 'vintages' and method == 'get':
+            return 200, mock.vintages(query.get('m',''))
+        if head == 'frequencies':
+            return 200, [{'freqCode':k,'freqName':k} for k in ('DAILY','MONTHLY','QTRDEC','ANNDEC')]
+        if head == 'filetypes':
+            return 200, [{'fileTypeId':t.value,'name':t.name} for t in dbapi.DBFileType]
+        if head == 'baskets':
+            return self._baskets(method,parts[1:],query,body)
+        if head == 'orders':
+            return self._orders(method,parts[1:],query)
+        return 404, {'message':f'No route for {method.upper()} /{"/".join(parts)}'}
+
+    def _baskets(self, method:str, parts:list, query:dict, body):
+        mock = self.server.mock
+        with mock._lock:
+            if not parts:
+                if method == 'get':
+                    return 200, [{k:v for k, v in b.items() if k != 'series'} for b in mock._baskets.values()]
+                if method == 'post':
+                    basket_id = str(uuid.uuid4()).upper()
+                    body = body or {}
+                    mock._baskets[basket_id] = {'basketId':basket_id,'name':body.get('title'),'fileTypeId':body.get('fileTypeId',30),
+                                                'dateStart':body.get('dateStart'),'dateEnd':body.get('dateEnd'),
+                                                'dateCreated':_now(),'dateUpdated':_now(),'dateExecuted':None,'series':[]}
+                    return 200, {'basketId':basket_id,'basketName':body.get('title')}
+                if method == 'delete':
+                    ids = [i for i in body or [] if mock._baskets.pop(i,None) is not None]
+                    return 200, ids
+            basket = mock._baskets.get(parts[0].upper()) if parts else None
+            if basket is None:
+                return 404, {'message':'Basket not found'}
+            if len(parts) == 1 and method == 'get':
+                return 200, {k:v for k, v in basket.items() if k != 'series'}
+            if len(parts) == 1 and method == 'post':
+                for k, v in (body or {}).items():
+                    if k in ('dateStart','dateEnd','fileTypeId'):
+                        basket[k] = v
+                    if k == 'title':
+                        basket['name'] = v
+                basket['dateUpdated'] = _now()
+                return 200, {'basketId':basket['basketId']}
+            sub = parts[1].lower() if len(parts) > 1 else ''
+            if sub == 'series' and method == 'post':
+                basket['series'].extend(item['mnemonic'] for item in body or [])
+                return 200, {'basketId':basket['basketId'],'series':len(basket['series'])}
+            if sub == 'contents' and method == 'get':
+                return 200, [{'mnemonic':m} for m in basket['series']]
+            if sub == 'output-file' and method == 'get':
+                if basket['dateExecuted'] is None:
+                    return 400, {'message':'Basket has not been executed'}
+                basket = dict(basket)
+        if sub == 'output-file':
+            return 200, mock.basket_output(basket)
+        return 404, {'message':'No such basket endpoint'}
+
+    def _orders(self, method:str, parts:list, query:dict):
+        mock = self.server.mock
+        with mock._lock:
+            if parts:
+                order = mock._orders.get(parts[0].upper())
+                if order is None:
+                    return 404, {'message':'Order not found'}
+                if method == 'delete':
+                    mock._orders.pop(parts[0].upper())
+                    return 200, {'orderId':order['orderId']}
+                return 200, mock.order_status(order)
+            if method == 'get' and query.get('id'):
+                basket = mock._baskets.get(query['id'].upper())
+                if basket is None or basket['dateExecuted'] is None:
+                    return 404, {'message':'No output for basket'}
+                basket = dict(basket)
+            elif method == 'get':
+                return 200, [mock.order_status(o) for o in mock._orders.values()]
+            elif method == 'post' and query.get('action') == 'run':
+                basket = mock._baskets.get(query.get('id','').upper())
+                if basket is None:
+                    return 404, {'message':'Basket not found'}
+                order_id = str(uuid.uuid4()).upper()
+                now = _now()
+                basket['dateExecuted'] = now
+                mock._orders[order_id] = {'orderId':order_id,'dateOrdered':now,'dateStarted':now,'dateFinished':None,'failedAttempts':0,
+                                          'processing':True,'queueStatus':0,'basketId':basket['basketId'],'orderType':1,
+                                          'enteredQueue':now,'updatedQueue':now,'_due':time.time() + mock.order_time}
+                ret = mock.order_status(mock._orders[order_id])
+                ret['basketId'] = None
+                return 200, ret
+            else:
+                return 404, {'message':'No such order endpoint'}
+        return 200, mock.basket_output(basket)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local mock of the Data Buffet API serving synthetic data')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--freq', default='DAILY', help='frequency of every served series (a key of dbapi._FREQ_DICT)')
+    parser.add_argument('--periods', type=int, default=365*50, help='observations per series')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every request')
+    parser.add_argument('--jitter', type=float, default=0.0, help='random extra seconds (uniform) added to every request')
+    parser.add_argument('--rate-429', type=float, default=0.0, help='fraction of requests answered with 429')
+    parser.add_argument('--rate-401', type=float, default=0.0, help='fraction of requests answered with 401')
+    parser.add_argument('--order-time', type=float, default=0.5, help='seconds a basket order takes to finish')
+    args = parser.parse_args()
+    mock = MockDataBuffet(args.host,args.port,args.freq,args.periods,latency=args.latency,jitter=args.jitter,
+                          rate_429=args.rate_429,rate_401=args.rate_401,order_time=args.order_time)
+    print(f'Serving mock Data Buffet API at {mock.base_uri} (Ctrl+C to stop)')
+    try:
+        mock._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        mock._server.server_close()
@@ -0,0 +1,321 @@
+#####
+# Data Buffet API
+# Code sample: Python
+# Description: Validate the local transformation / frequency-conversion engine (dbapi.derive) against server output
+#
+# Usage: python dbapi_validate_transforms.py                          (prompts for keys, fetches from the API)
+#        python dbapi_validate_transforms.py --save fixtures.json     (also keeps the responses as a fixture set)
+#        python dbapi_validate_transforms.py --fixtures fixtures.json (offline, from a saved fixture set)
+#        python dbapi_validate_transforms.py --fixtures fixtures/transforms.json
+#                                           (offline consistency check against the committed reference fixture set,
+#                                            which is generated by this script, not recorded from the API; rebuild it
+#                                            with --reference fixtures/transforms.json)
+
+import sys
+import json
+import argparse
+try:
+    import dbapi
+except Exception as ex:
+    print(ex)
+    print('Make sure dbapi.py is downloaded to the same directory as this program, and run again')
+    print('Get it here: https://github.com/moodysanalytics/databuffet-api-codesamples/blob/master/Python/dbapi.py')
+    sys.exit()
+import datetime
+import calendar
+import pandas as pd
+
+# monthly employment, quarterly GDP, monthly CPI, monthly interest rate
+DEFAULT_MNEMONICS = ['FET.IUSA','FGDP$.IUSA','FCPIU.IUSA','FRFED.IUSA']
+
+def prompt(prompt_text:str):
+    ret = None
+    while ret is None:
+        ret = input(f'{prompt_text} : ').strip()
+    return ret
+
+def cases_for(freq:str):
+    # (freq code, transformation, conversion) requests to compare for a series of pandas frequency `freq`
+    ret = [(None,t.value,None) for t in dbapi.TransformationType if t.value != 0]
+    ppy = dbapi._periods_per_year(freq)
+    if ppy > 4:
+        ret += [(172,None,None),(204,None,None),(198,None,None),(172,dbapi.TransformationType.YearOverYearPctChange.value,None)]
+    elif ppy == 4:
+        ret += [(204,None,None),(198,None,None)] + [(128,None,c.value) for c in dbapi.ConversionType]
+        # same frequency on another anchor
+        ret += [(171,None,None),(170,None,dbapi.ConversionType.Constant.value),(171,dbapi.TransformationType.YearOverYearPctChange.value,None)]
+    return ret
+
+def fetch_fixtures(api, mnemonics:list):
+    fixtures = {'native':{},'cases':[]}
+    for m in mnemonics:
+        js = api.get_series_json(m)
+        if not isinstance(js,dict) or not isinstance(js.get('data'),dict):
+            print(f'{m:<16} could not be fetched, skipped')
+            continue
+        fixtures['native'][m] = js
+        for freq, trans, conv in cases_for(dbapi._FREQ_DICT[js['data']['freq']]):
+            out = api.get_series_json(m,freq=freq,transformation=trans,conversion=conv)
+            if isinstance(out,dict) and isinstance(out.get('data'),dict):
+                fixtures['cases'].append({'mnemonic':m,'freq':freq,'transformation':trans,'conversion':conv,'series':out})
+    return fixtures
+
+def validate(fixtures:dict, rtol:float=1e-3, atol:float=1e-6):
+    api = dbapi.DataBuffetAPI('','')
+    failed = 0
+    for case in fixtures['cases']:
+        native = fixtures['native'][case['mnemonic']]
+        local = dbapi.derive(api._to_pandas(native),case['freq'],case['transformation'],case['conversion'],native.get('observedAttribute'))
+        server = api._to_pandas(case['series'])
+        both = pd.concat([local.rename('local'),server.rename('server')],axis=1,join='inner')
+        # ND (missing) observations have to match too, not just the values both sides have
+        nd = int((both['local'].isna() != both['server'].isna()).sum())
+        both = both.dropna()
+        diff = (both['local'] - both['server']).abs()
+        ok = len(both) > 0 and nd == 0 and bool((diff <= atol + rtol * both['server'].abs()).all())
+        failed += not ok
+        label = f'freq={case["freq"]} trans={case["transformation"]} conv={case["conversion"]}'
+        print(f'{case["mnemonic"]:<16} {label:<32} {"ok  " if ok else "FAIL"}   {len(both):5d} points   {nd:3d} ND mismatches   '
+              f'max abs diff {diff.max() if len(diff) else float("nan"):.6g}')
+    if fixtures.get('source') == 'reference':
+        # the reference set is generated by reference_fixtures(), not recorded from the API
+        print(f'{len(fixtures["cases"]) - failed} of {len(fixtures["cases"])} cases agree with the self-generated reference '
+              f'(a consistency check, not validation against the server)')
+    else:
+        print(f'{len(fixtures["cases"]) - failed} of {len(fixtures["cases"])} cases match the server')
+    return failed == 0
+
+# Reference fixture set for offline runs: synthetic native series (with interior, leading and trailing NDs) and
+# the expected output of every case, computed by a plain-Python restatement of the rules below. It is
+# self-generated: agreeing with it only shows that dbapi's vectorized engine implements the same rules as this
+# restatement (a regression check without API access), not that either matches the server. Only a set
+# recorded from the API with --save validates the engine.
+#   transformations : ND when the observation or the one it is compared with is ND (or the result is not finite)
+#   to a lower frequency : aggregate complete periods by observedAttribute; a period with an ND is ND
+#   to another anchor (QTRDEC -> QTRNOV) : convert to monthly as below, then aggregate onto the target periods
+#   to a higher frequency : Constant repeats (sums are split evenly), Discrete puts the value in the period's
+#       first (BEGIN/START) or last slot, Linear/Cubic (natural spline, linear beyond the end knots, linear with
+#       fewer than 3 knots) interpolate through knots in the middle (first/last slot for BEGIN/END) of each
+#       period; interior ND knots are filled linearly first, and slots of ND periods stay ND
+
+REFERENCE_SERIES = [('REFM.AVG','MONTHLY','AVERAGED',120,[0,1,40,41,119]),('REFM.SUM','MONTHLY','SUMMED',96,[30]),
+                    ('REFQ.AVG','QTRDEC','AVERAGED',40,[15,39]),('REFQ.END','QTRDEC','END OF PERIOD',32,[0,10]),
+                    ('REFQ.SUM','QTRDEC','TOTAL',24,[])]
+_MONTHS = {'M':1,'Q':3,'A':12}
+_MONTH_NAMES = ['JAN','FEB','MAR','APR','MAY','JUN','JUL','AUG','SEP','OCT','NOV','DEC']
+
+def _month_end(year:int, month:int):
+    return datetime.date(year,month,calendar.monthrange(year,month)[1])
+
+def _add_months(d, n:int):
+    m = d.year * 12 + d.month - 1 + n
+    return _month_end(m // 12,m % 12 + 1)
+
+def _code(freq:str):
+    return freq[0] if freq[0] in 'MQA' else None
+
+def _end_month(freq:str):
+    # month (1-12) the periods of a pandas frequency end in, e.g. 11 for Q-NOV
+    return _MONTH_NAMES.index(freq.split('-')[1]) + 1 if '-' in freq else 12
+
+def _name(freq:str, end:int=12):
+    return 'MONTHLY' if freq == 'M' else f'{"QTR" if freq == "Q" else "ANN"}{_MONTH_NAMES[end - 1]}'
+
+def _series_json(mnemonic:str, freq:str, start, values:list, observed:str, end:int=12):
+    missing = dbapi.MISSING_VALUE
+    return {'mnemonic':mnemonic,'description':f'Reference series {mnemonic}','source':'dbapi_validate_transforms reference',
+            'observedAttribute':observed,'geoTitle':'None','concept':mnemonic.split('.')[0],'geoCode':mnemonic.split('.')[-1],
+            'lastHistory':'N/A','dateCreated':'2020-01-01T00:00:00Z','dateUpdated':'2020-01-01T00:00:00Z','dateExecuted':'2020-01-01T00:00:00Z',
+            'data':{'freq':_name(freq,end),'startDate':f'{start.isoformat()}T00:00:00Z','periods':len(values),
+                    'data':[missing if v is None else round(v,10) for v in values]}}
+
+def _how(observed:str):
+    observed = observed.upper()
+    for key, how in (('SUM','sum'),('TOTAL','sum'),('END','last'),('BEGIN','first'),('START','first')):
+        if key in observed:
+            return how
+    return 'mean'
+
+def _ref_transform(values:list, freq:str, code:int):
+    ppy = 12 // _MONTHS[freq]
+    lag = ppy if code in (1,8) else 1
+    out = []
+    for i, x in enumerate(values):
+        prev = values[i - lag] if i >= lag else None
+        if x is None or prev is None:
+            out.append(None)
+            continue
+        try:
+            if code in (1,4):
+                v = (x / prev - 1) * 100
+            elif code in (2,8):
+                v = x - prev
+            else:
+                v = ((x / prev) ** ppy - 1) * 100
+        except (ZeroDivisionError, OverflowError):
+            v = None
+        out.append(v if isinstance(v,float) and abs(v) != float('inf') and v == v else None)
+    return out
+
+def _ref_aggregate(start, values:list, src:str, to:str, how:str, end:int=12):
+    # returns (first target period end, values); target periods end in month `end`
+    per = _MONTHS[to] // _MONTHS[src]
+    ends = [_add_months(start,i * _MONTHS[src]) for i in range(len(values))]
+    groups = {}
+    for d, v in zip(ends,values):
+        # months since year 0, rounded up to the end of the target period
+        key = -((end - 1 - (d.year * 12 + d.month - 1)) // _MONTHS[to])
+        groups.setdefault(key,[]).append(v)
+    out = []
+    for key in sorted(groups):
+        g = groups[key]
+        if len(g) < per or any(v is None for v in g):
+            out.append(None)
+        elif how == 'sum':
+            out.append(sum(g))
+        elif how == 'last':
+            out.append(g[-1])
+        elif how == 'first':
+            out.append(g[0])
+        else:
+            out.append(sum(g) / len(g))
+    first = min(groups) * _MONTHS[to] + end - 1
+    return _month_end(first // 12,first % 12 + 1), out
+
+def _solve(a:list, b:list):
+    # Gaussian elimination with partial pivoting
+    n = len(b)
+    a = [row[:] + [b[i]] for i, row in enumerate(a)]
+    for k in range(n):
+        p = max(range(k,n),key=lambda i: abs(a[i][k]))
+        a[k], a[p] = a[p], a[k]
+        for i in range(k + 1,n):
+            f = a[i][k] / a[k][k]
+            for j in range(k,n + 1):
+                a[i][j] -= f * a[k][j]
+    x = [0.0] * n
+    for i in range(n - 1,-1,-1):
+        x[i] = (a[i][n] - sum(a[i][j] * x[j] for j in range(i + 1,n))) / a[i][i]
+    return x
+
+def _ref_linear(xk:list, yk:list, t:float):
+    if len(xk) == 1:
+        return yk[0]
+    s = min(max(1,sum(1 for x in xk if x < t)),len(xk) - 1)
+    w = (t - xk[s-1]) / (xk[s] - xk[s-1])
+    return yk[s-1] * (1 - w) + yk[s] * w
+
+def _ref_cubic(xk:list, yk:list, ts:list):
+    n = len(xk)
+    h = [xk[i+1] - xk[i] for i in range(n - 1)]
+    d = [(yk[i+1] - yk[i]) / h[i] for i in range(n - 1)]
+    # second derivatives, natural end conditions
+    a = [[0.0] * n for _ in range(n)]
+    b = [0.0] * n
+    a[0][0] = a[n-1][n-1] = 1.0
+    for i in range(1,n - 1):
+        a[i][i-1], a[i][i], a[i][i+1] = h[i-1], 2 * (h[i-1] + h[i]), h[i]
+        b[i] = 6 * (d[i] - d[i-1])
+    m = _solve(a,b)
+    out = []
+    for t in ts:
+        if t < xk[0]:
+            out.append(yk[0] + (t - xk[0]) * (d[0] - h[0] * (2 * m[0] + m[1]) / 6))
+        elif t > xk[-1]:
+            out.append(yk[-1] + (t - xk[-1]) * (d[-1] + h[-1] * (m[-2] + 2 * m[-1]) / 6))
+        else:
+            i = min(max(0,sum(1 for x in xk if x < t) - 1),n - 2)
+            u, v = xk[i+1] - t, t - xk[i]
+            out.append(m[i] * u**3 / (6 * h[i]) + m[i+1] * v**3 / (6 * h[i]) + (yk[i] / h[i] - m[i] * h[i] / 6) * u
+                       + (yk[i+1] / h[i] - m[i+1] * h[i] / 6) * v)
+    return out
+
+def _ref_disaggregate(start, values:list, src:str, to:str, how:str, conv:int):
+    per = _MONTHS[src] // _MONTHS[to]
+    if how == 'sum':
+        values = [None if v is None else v / per for v in values]
+    n = len(values) * per
+    first_target = _add_months(start,-_MONTHS[src] + _MONTHS[to])
+    out = [None] * n
+    if conv == 0:
+        out = [values[i // per] for i in range(n)]
+    elif conv == 3:
+        for p, v in enumerate(values):
+            out[p * per + (0 if how == 'first' else per - 1)] = v
+    else:
+        valid = [p for p, v in enumerate(values) if v is not None]
+        if valid:
+            p0, p1 = valid[0], valid[-1]
+            offset = 0 if how == 'first' else per - 1 if how == 'last' else (per - 1) / 2
+            xk = [p * per + offset for p in range(p0,p1 + 1)]
+            yk = values[p0:p1 + 1]
+            # fill interior ND knots linearly
+            for i, y in enumerate(yk):
+                if y is None:
+                    lo = max(j for j in range(i) if yk[j] is not None)
+                    hi = min(j for j in range(i + 1,len(yk)) if values[p0 + j] is not None)
+                    yk[i] = yk[lo] + (values[p0 + hi] - yk[lo]) * (i - lo) / (hi - lo)
+            ts = list(range(p0 * per,(p1 + 1) * per))
+            if conv == 1 or len(xk) < 3:
+                est = [_ref_linear(xk,yk,t) for t in ts]
+            else:
+                est = _ref_cubic(xk,yk,ts)
+            for t, v in zip(ts,est):
+                out[t] = v
+        out = [None if values[i // per] is None else v for i, v in enumerate(out)]
+    return first_target, out
+
+def reference_fixtures():
+    fixtures = {'source':'reference','native':{},'cases':[]}
+    for mnemonic, name, observed, periods, nd in REFERENCE_SERIES:
+        freq = dbapi._FREQ_DICT[name][0]
+        start = _month_end(2000,_MONTHS[freq])
+        # a smooth trend with a cycle, strictly positive so that growth rates are defined
+        values = [100 + 0.3 * i + 5 * ((i % 7) - 3) ** 2 / 9 + (i % 3) for i in range(periods)]
+        values = [None if i in nd else v for i, v in enumerate(values)]
+        native = _series_json(mnemonic,freq,start,values,observed)
+        fixtures['native'][mnemonic] = native
+        for freq_code, trans, conv in cases_for(dbapi._FREQ_DICT[name]):
+            target = dbapi._FREQ_DICT[name] if freq_code is None else dbapi._FREQ_CODES[freq_code]
+            to, end = _code(target), _end_month(target)
+            if to == freq and end == 12:
+                first, out = start, values
+            elif to == freq:
+                first, out = _ref_disaggregate(start,values,freq,'M',_how(observed),2 if conv is None else conv)
+                first, out = _ref_aggregate(first,out,'M',to,_how(observed),end)
+            elif _MONTHS[to] > _MONTHS[freq]:
+                first, out = _ref_aggregate(start,values,freq,to,_how(observed),end)
+            else:
+                first, out = _ref_disaggregate(start,values,freq,to,_how(observed),2 if conv is None else conv)
+            if trans is not None:
+                out = _ref_transform(out,to,trans)
+            fixtures['cases'].append({'mnemonic':mnemonic,'freq':freq_code,'transformation':trans,'conversion':conv,
+                                      'series':_series_json(mnemonic,to,first,out,observed,end)})
+    return fixtures
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare dbapi.derive with server-side transformations and conversions')
+    parser.add_argument('mnemonics', nargs='*', default=DEFAULT_MNEMONICS)
+    parser.add_argument('--fixtures', default=None, help='compare offline with a saved fixture set (a set written by --reference '
+                        'only checks consistency with this script\'s own restatement of the rules, not the server)')
+    parser.add_argument('--save', default=None, help='save the fetched responses as a fixture set')
+    parser.add_argument('--reference', default=None, help='write the self-generated reference fixture set to this file and '
+                        'check consistency with it (not validation against the server)')
+    parser.add_argument('--rtol', type=float, default=1e-3, help='relative tolerance')
+    args = parser.parse_args()
+    if args.reference is not None:
+        fixtures = reference_fixtures()
+        with open(args.reference,'w') as f:
+            json.dump(fixtures,f,separators=(',',':'))
+    elif args.fixtures is not None:
+        with open(args.fixtures,'r') as f:
+            fixtures = json.load(f)
+    else:
+        print('\nGet your API heys here: https://economy.com/myeconomy/api-key-info\n')
+        access_key = prompt('Please enter your access key')
+        encryption_key = prompt('Please enter your encryption key')
+        fixtures = fetch_fixtures(dbapi.DataBuffetAPI(access_key,encryption_key),args.mnemonics)
+        if args.save is not None:
+            with open(args.save,'w') as f:
+                json.dump(fixtures,f)
+    sys.exit(0 if validate(fixtures,args.rtol) else 1)
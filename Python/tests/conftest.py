@@ -0,0 +1,19 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import dbapi_mock_server
+
+@pytest.fixture
+def mock_server():
+    # mock_server(**kwargs) starts a MockDataBuffet (short monthly series by default) that is stopped after the test
+    servers = []
+    def start(**kwargs):
+        kwargs.setdefault('freq','MONTHLY')
+        kwargs.setdefault('periods',120)
+        servers.append(dbapi_mock_server.MockDataBuffet(**kwargs).start())
+        return servers[-1]
+    yield start
+    for server in servers:
+        server.stop()
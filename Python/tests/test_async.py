@@ -0,0 +1,76 @@
+import asyncio
+import numpy as np
+import pytest
+import dbapi
+
+def _run(mock, coro, **kwargs):
+    # run coro(api) against an AsyncDataBuffetAPI pointed at mock
+    async def main():
+        async with mock.client(dbapi.AsyncDataBuffetAPI,**kwargs) as api:
+            return await coro(api)
+    return asyncio.run(main())
+
+def test_plain_with_is_rejected(mock_server):
+    with pytest.raises(TypeError):
+        with mock_server().client(dbapi.AsyncDataBuffetAPI):
+            pass
+
+def test_series_and_multiseries_match_sync_client(mock_server):
+    mock = mock_server(unknown=['BAD.X'],reject_unknown=True)
+    mnemonics = [f'G{i}.X' for i in range(30)] + ['BAD.X']
+    async def coro(api):
+        series = await api.get_series('A.X')
+        return series, (await api.get_multiseries_json(mnemonics),api.last_fanout_errors,api.last_fanout_stats)
+    series, (js, errors, stats) = _run(mock,coro)
+    assert series.equals(mock.client().get_series('A.X'))
+    assert [j['mnemonic'] for j in js['data']] == mnemonics[:-1] and js['error'] is None
+    assert errors[0]['mnemonics'] == ['BAD.X'] and stats['chunks'] == 2
+
+def test_cache_and_revalidation(mock_server, tmp_path):
+    mock = mock_server()
+    async def coro(api):
+        fresh = await api.get_multiseries_json(['A.X','B.X'])
+        hit = await api.get_multiseries_json(['A.X','B.X'])
+        assert hit['data'] == fresh['data']
+        series = await api.get_series_json('A.X')
+        assert np.array_equal((await api.get_series_json('A.X'))['data']['data'],series['data']['data'])
+        api.cache.ttl = 0
+        unchanged = await api.is_stale('A.X')
+        mock.revise('A.X')
+        return unchanged, await api.is_stale('A.X'), await api.is_stale('C.X')
+    assert _run(mock,coro,cache=str(tmp_path/'cache.db')) == (False,True,True)
+    # one fetch, then a one-observation probe per revalidation
+    assert mock.requests['multi-series'] == 1 and mock.requests['series'] == 3
+
+def test_refresh(mock_server, tmp_path):
+    mock = mock_server()
+    async def coro(api):
+        await api.get_series_json('A.X')
+        await api.get_series_json('B.X')
+        mock.revise('B.X')
+        return await api.refresh(None,['A.X','B.X','C.X'])
+    ret = _run(mock,coro,cache=str(tmp_path/'cache.db'))
+    assert ret['unchanged'] == ['A.X'] and sorted(ret['reloaded']) == ['B.X','C.X'] and ret['failed'] == []
+
+def test_fetch_bulk_paths(mock_server, tmp_path):
+    mock = mock_server(order_time=0.1)
+    many = [f'K{i}.X' for i in range(12)]
+    async def coro(api):
+        paths = []
+        for mnemonics in (['A.X'],['A.X','B.X'],many,many):
+            ret = await api.fetch_bulk(mnemonics,basket_threshold=10,sleep=0.1)
+            assert list(ret) == mnemonics
+            paths.append(api.last_bulk_stats['path'])
+        return paths
+    # a limiter with a lock file shares its state through the file, which must not block the event loop
+    limiter = dbapi.RateLimiter(rate=1000,burst=100,lock_file=str(tmp_path/'limiter'))
+    assert _run(mock,coro,rate_limiter=limiter) == ['series','multi-series','basket','basket']
+    # the second basket fetch reuses the first basket
+    assert mock.requests['baskets/{id}/series'] == 1
+
+def test_vintages_and_search(mock_server):
+    mock = mock_server()
+    async def coro(api):
+        return await api.get_series_vintages('A.X'), await api.search_all('x',rows=10,limit=25)
+    vintages, results = _run(mock,coro)
+    assert len(vintages) == 24 and len(results) == 25
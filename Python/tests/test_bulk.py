@@ -0,0 +1,55 @@
+import asyncio
+import pytest
+import dbapi
+
+MANY = [f'K{i}.X' for i in range(12)]
+
+def test_paths(mock_server):
+    mock = mock_server(order_time=0.05)
+    api = mock.client()
+    assert list(api.fetch_bulk(['A.X'])) == ['A.X'] and api.last_bulk_stats['path'] == 'series'
+    assert list(api.fetch_bulk(['A.X','B.X'],basket_threshold=10)) == ['A.X','B.X'] and api.last_bulk_stats['path'] == 'multi-series'
+    assert sorted(api.fetch_bulk(MANY,basket_threshold=10,sleep=0.05)) == sorted(MANY) and api.last_bulk_stats['path'] == 'basket'
+    # parameters a basket cannot take keep the request on /multi-series
+    api.fetch_bulk(MANY,transformation=1,basket_threshold=10)
+    assert api.last_bulk_stats['path'] == 'multi-series'
+
+def test_basket_is_reused(mock_server):
+    mock = mock_server(order_time=0.05)
+    api = mock.client()
+    first = api.fetch_bulk(MANY,basket_threshold=10,sleep=0.05)
+    second = mock.client().fetch_bulk(list(reversed(MANY)),basket_threshold=10,sleep=0.05)
+    assert len(mock._baskets) == 1 and mock.requests['baskets/{id}/series'] == 1
+    assert all(first[m].equals(second[m]) for m in MANY)
+    # different contents get their own basket
+    api.fetch_bulk(MANY[:11],basket_threshold=10,sleep=0.05)
+    assert len(mock._baskets) == 2
+
+def test_temporary_basket_is_deleted(mock_server):
+    mock = mock_server(order_time=0.05)
+    ret = mock.client().fetch_bulk(MANY,basket_threshold=10,reuse_basket=False,sleep=0.05)
+    assert len(ret) == 12 and mock._baskets == {}
+
+@pytest.mark.parametrize('endpoint',['baskets/{id}/series','orders'])
+def test_basket_that_never_ran_is_deleted(mock_server, endpoint):
+    mock = mock_server(order_time=0.05)
+    api = mock.client()
+    mock.inject(400,endpoint=endpoint)
+    with pytest.raises(Exception):
+        api.fetch_bulk(MANY,basket_threshold=10,sleep=0.05)
+    assert mock._baskets == {}
+    # the retry starts clean and leaves a single reusable basket
+    assert len(api.fetch_bulk(MANY,basket_threshold=10,sleep=0.05)) == 12
+    assert len(mock._baskets) == 1
+
+def test_async_basket_that_never_ran_is_deleted(mock_server):
+    mock = mock_server(order_time=0.05)
+    mock.inject(400,endpoint='baskets/{id}/series')
+    async def main():
+        async with mock.client(dbapi.AsyncDataBuffetAPI) as api:
+            with pytest.raises(Exception):
+                await api.fetch_bulk(MANY,basket_threshold=10,sleep=0.05)
+            assert mock._baskets == {}
+            return await api.fetch_bulk(MANY,basket_threshold=10,sleep=0.05)
+    assert len(asyncio.run(main())) == 12
+    assert len(mock._baskets) == 1
@@ -0,0 +1,95 @@
+import json
+import time
+import numpy as np
+import dbapi
+
+def test_multiseries_cache_round_trip(mock_server, tmp_path):
+    mock = mock_server()
+    api = mock.client(cache=str(tmp_path/'cache.db'))
+    fresh = api.get_multiseries_json(['A.X','B.X'])
+    hit = api.get_multiseries_json(['A.X','B.X'])
+    assert mock.requests['multi-series'] == 1
+    # cached items come back in the response shape: a [{'date','value'}] list per series
+    assert hit['data'] == fresh['data']
+    assert isinstance(hit['data'][0]['data'],list) and set(hit['data'][0]['data'][0]) == {'date','value'}
+
+def test_multiseries_partial_hit_keeps_input_order(mock_server, tmp_path):
+    mock = mock_server()
+    api = mock.client(cache=str(tmp_path/'cache.db'))
+    api.get_multiseries_json(['B.X'])
+    js = api.get_multiseries_json(['A.X','B.X','C.X'])
+    assert [j['mnemonic'] for j in js['data']] == ['A.X','B.X','C.X']
+    assert mock.requests['multi-series'] == 2
+    assert {m:len(s) for m, s in api.get_multiseries(['A.X','B.X','C.X']).items()} == {'A.X':120,'B.X':120,'C.X':120}
+
+def test_series_cache_round_trip(mock_server, tmp_path):
+    mock = mock_server()
+    api = mock.client(cache=str(tmp_path/'cache.db'))
+    fresh = api.get_series_json('A.X')
+    hit = api.get_series_json('A.X')
+    assert mock.requests['series'] == 1
+    assert hit == fresh
+    assert api.cache.stats()['hits'] == 1
+
+def test_only_pinned_vintage_version_is_immutable(mock_server, tmp_path):
+    mock = mock_server()
+    api = mock.client(cache=str(tmp_path/'cache.db'))
+    api.get_series_json('A.X',vintage='202001')
+    api.get_series_json('A.X',vintage='202001',vintage_version=1)
+    api.get_multiseries_json(['A.X'],vintage='202001')
+    api.get_multiseries_json(['A.X'],vintage='202001',vintage_version=1)
+    rows = dict(api.cache._con().execute('SELECT key, immutable FROM series').fetchall())
+    assert rows == {dbapi.SeriesCache.key('series','A.X',vintage='202001'):0,
+                    dbapi.SeriesCache.key('series','A.X',vintage='202001',vintage_version=1):1,
+                    dbapi.SeriesCache.key('multi-series','A.X',vintage='202001'):0,
+                    dbapi.SeriesCache.key('multi-series','A.X',vintage='202001',vintage_version=1):1}
+
+def test_stale_entry_is_revalidated(mock_server, tmp_path):
+    mock = mock_server()
+    api = mock.client(cache=dbapi.SeriesCache(str(tmp_path/'cache.db'),ttl=0))
+    api.get_series_json('A.X')
+    assert not api.is_stale('A.X')
+    mock.revise('A.X')
+    assert api.is_stale('A.X')
+    assert api.is_stale('B.X')
+
+def test_lookup_touches_access_time_at_most_once_per_interval(tmp_path):
+    cache = dbapi.SeriesCache(str(tmp_path/'cache.db'),touch_interval=60)
+    cache.put('series|A.X',{'data':{'freq':'MONTHLY','startDate':'2000-01-31','data':[1.0,2.0]}})
+    accessed = lambda: cache._con().execute('SELECT accessed FROM series').fetchone()[0]
+    before = accessed()
+    time.sleep(0.01)
+    cache.lookup('series|A.X')
+    assert accessed() == before
+    cache.touch_interval = 0
+    cache.lookup('series|A.X')
+    assert accessed() > before
+
+def test_eviction_keeps_total_under_max_bytes(tmp_path):
+    cache = dbapi.SeriesCache(str(tmp_path/'cache.db'),max_bytes=5000)
+    for i in range(50):
+        cache.put(f'series|M{i}.X',{'data':{'freq':'MONTHLY','startDate':'2000-01-31','data':list(range(50))}})
+    stats = cache.stats()
+    assert 0 < stats['bytes'] <= 5000
+    assert stats['evictions'] == 50 - stats['entries']
+    assert cache.get('series|M49.X') is not None and cache.get('series|M0.X') is None
+    assert cache._total == stats['bytes']
+
+def test_series_hit_and_miss_return_the_same_types(mock_server, tmp_path):
+    mock = mock_server()
+    api = mock.client(cache=str(tmp_path/'cache.db'))
+    miss = api.get_series_json('A.X')
+    hit = api.get_series_json('A.X')
+    assert mock.requests['series'] == 1
+    assert type(hit['data']['data']) is type(miss['data']['data']) is list
+    assert hit == miss
+    json.dumps(hit)
+    hit['data']['data'][0] = 1.0
+    assert api.get_series_json('A.X') == miss
+    # with numpy_arrays both come back as writable float64 arrays
+    api = mock.client(cache=str(tmp_path/'arrays.db'),numpy_arrays=True)
+    miss = api.get_series_json('A.X')
+    hit = api.get_series_json('A.X')
+    assert isinstance(hit['data']['data'],np.ndarray) and hit['data']['data'].flags.writeable
+    assert np.array_equal(hit['data']['data'],miss['data']['data'],equal_nan=True)
+    hit['data']['data'][0] = 1.0
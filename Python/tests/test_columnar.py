@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import dbapi
+
+pa = pytest.importorskip('pyarrow')
+
+MNEMONICS = [f'C{i}.IUSA' for i in range(4)]
+RECORDS = [('M1.X','M','2000-01-31',np.array([1.0,np.nan,3.0]),{'description':'monthly'}),
+           ('M2.X','M','2000-03-31',np.array([4.0,5.0]),{'description':'later start'}),
+           ('Q1.X','Q-DEC','2000-03-31',np.array([6.0,7.0]),{'description':'quarterly'})]
+
+@pytest.mark.parametrize('format',['parquet','arrow'])
+def test_round_trip(mock_server, tmp_path, format):
+    mock = mock_server()
+    batch = mock.client().get_multiseries(MNEMONICS,as_records=True)
+    path = batch.to_columnar(str(tmp_path/'out'),format=format)
+    frames, meta = dbapi.read_columnar(path)
+    expected, expected_meta = batch.to_frames()
+    pd.testing.assert_frame_equal(frames['M'],expected['M'])
+    assert list(meta.index) == MNEMONICS and list(meta['description']) == list(expected_meta['description'])
+
+@pytest.mark.parametrize('format',['parquet','arrow'])
+def test_columns_and_frequencies_are_selected(tmp_path, format):
+    path = dbapi.write_columnar(dbapi.SeriesBatch.from_records(RECORDS),str(tmp_path/'out'),format)
+    frames, meta = dbapi.read_columnar(path,mnemonics=['M2.X','X.Y','Q1.X'])
+    assert list(frames['M'].columns) == ['M2.X'] and list(frames['Q-DEC'].columns) == ['Q1.X']
+    assert list(meta.index) == ['M2.X','Q1.X']
+    frames, meta = dbapi.read_columnar(path,freqs=['Q-DEC'])
+    assert list(frames) == ['Q-DEC'] and list(meta.index) == ['Q1.X']
+    tables, _ = dbapi.read_columnar(path,mnemonics=['M1.X'],as_arrow=True)
+    assert isinstance(tables['M'],pa.Table) and tables['M'].column_names == ['date','M1.X']
+
+def test_records_keep_their_own_start(tmp_path):
+    path = dbapi.write_columnar(dbapi.SeriesBatch.from_records(RECORDS),str(tmp_path/'out'))
+    batch = dbapi.read_columnar(path,as_records=True)
+    assert batch.mnemonics == ['M1.X','M2.X','Q1.X']
+    assert batch.starts == ['2000-01-31','2000-03-31','2000-03-31'] and batch.freqs == ['M','M','Q-DEC']
+    assert np.array_equal(batch.values('M1.X'),[1.0,np.nan,3.0],equal_nan=True)
+    assert list(batch.values('M2.X')) == [4.0,5.0] and batch['Q1.X'].description == 'quarterly'
+
+def test_float32_and_series_dicts(mock_server, tmp_path):
+    mock = mock_server()
+    series = mock.client().get_multiseries(MNEMONICS)
+    path = dbapi.write_columnar(series,str(tmp_path/'out'),'arrow',dtype='float32')
+    frames, meta = dbapi.read_columnar(path)
+    assert frames['M'].dtypes.unique().tolist() == [np.float32]
+    np.testing.assert_allclose(frames['M']['C1.IUSA'],series['C1.IUSA'],rtol=1e-6)
+    with pytest.raises(Exception):
+        dbapi.write_columnar(series,str(tmp_path/'bad'),'csv')
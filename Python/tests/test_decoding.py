@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+import dbapi
+
+def test_decode_values_masks_missing():
+    values = dbapi._decode_values([1,None,dbapi.MISSING_VALUE,2.5])
+    assert values.dtype == np.float64
+    assert np.array_equal(values,[1.0,np.nan,np.nan,2.5],equal_nan=True)
+
+def test_series_matches_the_response(mock_server):
+    mock = mock_server()
+    api = mock.client()
+    js = api.get_series_json('A.X')
+    series = api.get_series('A.X')
+    expected = [np.nan if v == dbapi.MISSING_VALUE else v for v in js['data']['data']]
+    assert np.array_equal(series.to_numpy(),expected,equal_nan=True)
+    assert series.index[0] == pd.Timestamp('1970-01-31') and len(series.index) == 120 and series.index.freqstr == 'M'
+    assert series.mnemonic == 'A.X' and series.date_updated == pd.Timestamp(js['dateUpdated'])
+
+def test_series_of_the_same_shape_share_an_index(mock_server):
+    api = mock_server().client()
+    a, b = api.get_series('A.X'), api.get_series('B.X')
+    assert a.index is b.index
+    assert not a.equals(b)
+
+def test_multiseries_matches_series(mock_server):
+    mock = mock_server()
+    api = mock.client()
+    multi = api.get_multiseries(['A.X','B.X'])
+    for m in ('A.X','B.X'):
+        assert multi[m].equals(api.get_series(m))
+        assert multi[m].mnemonic == m and multi[m].geography == 'United States'
@@ -0,0 +1,59 @@
+import os
+import json
+import asyncio
+import numpy as np
+import pytest
+import dbapi
+
+def _executed_basket(api, mnemonics:list):
+    basket_id = api.create_basket('stream',filetype=dbapi.DBFileType.JSON)['basketId']
+    api.add_series_to_basket(basket_id,mnemonics)
+    api.wait_for_order(api.run_basket(basket_id),sleep=0.05)
+    return basket_id
+
+def test_stream_to_disk_and_iterate(mock_server, tmp_path):
+    mock = mock_server(order_time=0.05)
+    api = mock.client()
+    mnemonics = [f'S{i}.X' for i in range(5)]
+    basket_id = _executed_basket(api,mnemonics)
+    saveto = str(tmp_path/'output.json')
+    assert api.get_basket_output_file(basket_id,saveto=saveto,stream=True) == saveto
+    assert os.listdir(tmp_path) == ['output.json']
+    series = list(api.iter_basket_output(saveto))
+    assert [s.mnemonic for s in series] == mnemonics
+    assert series[2].equals(api.get_series('S2.X'))
+    assert [js['mnemonic'] for js in api.iter_basket_output(saveto,raw=True)] == mnemonics
+
+def test_failed_download_leaves_no_file(mock_server, tmp_path):
+    api = mock_server().client()
+    basket_id = api.create_basket('never run')['basketId']
+    with pytest.raises(Exception):
+        api.get_basket_output_file(basket_id,saveto=str(tmp_path/'output.json'),stream=True)
+    assert os.listdir(tmp_path) == []
+
+def test_async_stream_to_disk(mock_server, tmp_path):
+    mock = mock_server(order_time=0.05)
+    basket_id = _executed_basket(mock.client(),['A.X','B.X'])
+    saveto = str(tmp_path/'output.json')
+    async def main():
+        async with mock.client(dbapi.AsyncDataBuffetAPI) as api:
+            return await api.get_basket_output_file(basket_id,saveto=saveto,stream=True)
+    assert asyncio.run(main()) == saveto
+    assert [js['mnemonic'] for js in dbapi._iter_json_array(saveto)] == ['A.X','B.X']
+
+@pytest.mark.parametrize('chunk_size',[1,7,64,1024*1024])
+def test_iter_json_array_across_chunk_boundaries(tmp_path, chunk_size):
+    items = [{'mnemonic':f'M{i}','data':{'data':list(range(i*3))},'note':'a "quoted" ] bracket'} for i in range(20)]
+    path = tmp_path/'out.json'
+    path.write_text(json.dumps({'error':None,'series':items,'after':[1,2]},indent=1))
+    assert list(dbapi._iter_json_array(str(path),chunk_size=chunk_size)) == items
+
+def test_iter_json_array_edge_cases(tmp_path):
+    path = tmp_path/'out.json'
+    path.write_text('{"series": [ ]}')
+    assert list(dbapi._iter_json_array(str(path))) == []
+    path.write_text('{"other": [1]}')
+    assert list(dbapi._iter_json_array(str(path))) == []
+    path.write_text('{"series": [{"a": 1}, {"a": 2')
+    with pytest.raises(ValueError):
+        list(dbapi._iter_json_array(str(path),chunk_size=8))
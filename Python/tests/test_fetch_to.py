@@ -0,0 +1,64 @@
+import os
+import json
+import numpy as np
+import pytest
+import dbapi
+
+MNEMONICS = [f'G{i}.X' for i in range(60)]
+
+def _fetch(mock, output, mnemonics=MNEMONICS, **kwargs):
+    kwargs.setdefault('format','json')
+    return dbapi.fetch_to(mock.client(),mnemonics,str(output),progress=False,**kwargs)
+
+def test_second_run_resumes_every_chunk(mock_server, tmp_path):
+    mock = mock_server()
+    first = _fetch(mock,tmp_path/'out.json')
+    assert (first['chunks'],first['resumed'],first['fetched'],first['series'],first['failed']) == (3,0,3,60,[])
+    assert mock.requests['multi-series'] == 3
+    second = _fetch(mock,tmp_path/'out.json')
+    assert (second['resumed'],second['fetched'],second['series']) == (3,0,60)
+    assert mock.requests['multi-series'] == 3
+    with open(tmp_path/'out.json','r') as f:
+        assert [js['mnemonic'] for js in json.load(f)['series']] == MNEMONICS
+
+def test_interrupted_run_fetches_only_missing_chunks(mock_server, tmp_path):
+    mock = mock_server()
+    output = tmp_path/'out.json'
+    _fetch(mock,output)
+    # a chunk whose part file never landed, and a manifest line cut short by the interruption
+    parts = sorted(os.listdir(f'{output}.parts'))
+    os.remove(os.path.join(f'{output}.parts',parts[0]))
+    with open(f'{output}.manifest.jsonl','a') as f:
+        f.write('{"chunk":"trunc')
+    ret = _fetch(mock,output)
+    assert (ret['resumed'],ret['fetched'],ret['series']) == (2,1,60)
+    assert mock.requests['multi-series'] == 4
+
+def test_failed_series_are_fetched_again_only_on_request(mock_server, tmp_path):
+    mock = mock_server(unknown=['BAD.X'])
+    output = tmp_path/'out.json'
+    ret = _fetch(mock,output,MNEMONICS + ['BAD.X'])
+    assert ret['failed'] == ['BAD.X'] and ret['series'] == 60
+    assert _fetch(mock,output,MNEMONICS + ['BAD.X'])['fetched'] == 0
+    mock.unknown.clear()
+    ret = _fetch(mock,output,MNEMONICS + ['BAD.X'],retry_failed=True)
+    assert (ret['fetched'],ret['failed'],ret['series']) == (1,[],61)
+
+def test_parquet_output(mock_server, tmp_path):
+    pytest.importorskip('pyarrow')
+    mock = mock_server()
+    ret = _fetch(mock,tmp_path/'out',format='parquet')
+    frames, meta = dbapi.read_columnar(str(tmp_path/'out'))
+    assert ret['series'] == 60 and list(frames['M'].columns) == MNEMONICS
+    assert np.array_equal(frames['M']['G7.X'].to_numpy(),mock.client().get_series('G7.X').to_numpy(),equal_nan=True)
+
+def test_command_line(mock_server, tmp_path, monkeypatch):
+    mock = mock_server(unknown=['BAD.X'])
+    monkeypatch.setenv('DBAPI_ACCESS_KEY','mock-access-key')
+    monkeypatch.setenv('DBAPI_ENCRYPTION_KEY','mock-encryption-key')
+    (tmp_path/'mnemonics.txt').write_text('# series to fetch\nG1.X, G2.X\nG3.X;BAD.X\n')
+    argv = ['fetch',str(tmp_path/'mnemonics.txt'),'-o',str(tmp_path/'out.json'),'--format','json','--base-uri',mock.base_uri,'--quiet']
+    # exit code 2: some series failed
+    assert dbapi.main(argv) == 2
+    with open(tmp_path/'out.json','r') as f:
+        assert [js['mnemonic'] for js in json.load(f)['series']] == ['G1.X','G2.X','G3.X']
@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+import dbapi
+
+def test_records_are_aligned_per_frequency():
+    frames, meta = dbapi._to_frames([('A','M','2000-01-31',np.array([1.0,2.0,3.0]),{'source':'a'}),
+                                     ('B','M','2000-03-31',np.array([4.0,5.0]),{'source':'b'}),
+                                     ('C','Q-DEC','2000-03-31',np.array([6.0]),{'source':'c'})])
+    assert sorted(frames) == ['M','Q-DEC']
+    assert list(frames['M'].index.strftime('%Y-%m-%d')) == ['2000-01-31','2000-02-29','2000-03-31','2000-04-30']
+    assert np.array_equal(frames['M']['A'],[1,2,3,np.nan],equal_nan=True)
+    assert np.array_equal(frames['M']['B'],[np.nan,np.nan,4,5],equal_nan=True)
+    assert frames['Q-DEC'].shape == (1,1)
+    assert meta.loc['B','start'] == pd.Timestamp('2000-03-31') and meta.loc['B','periods'] == 2 and meta.loc['C','source'] == 'c'
+
+def test_multiseries_as_frame(mock_server):
+    mock = mock_server(unknown=['BAD.X'])
+    api = mock.client()
+    frames, meta = api.get_multiseries(['A.X','B.X','BAD.X'],as_frame=True)
+    assert list(frames) == ['M'] and list(frames['M'].columns) == ['A.X','B.X']
+    assert np.array_equal(frames['M']['A.X'].to_numpy(),api.get_series('A.X').to_numpy(),equal_nan=True)
+    assert list(meta.index) == ['A.X','B.X'] and (meta['periods'] == 120).all()
+
+def test_basket_output_as_frame(mock_server):
+    mock = mock_server(order_time=0.1)
+    api = mock.client()
+    mnemonics = [f'K{i}.X' for i in range(12)]
+    frames, meta = api.fetch_bulk(mnemonics,as_frame=True,basket_threshold=10,sleep=0.1)
+    assert api.last_bulk_stats['path'] == 'basket'
+    assert sorted(frames['M'].columns) == sorted(mnemonics) and frames['M'].shape == (120,12)
+    assert np.array_equal(frames['M']['K3.X'].to_numpy(),api.get_series('K3.X').to_numpy(),equal_nan=True)
@@ -0,0 +1,22 @@
+import os
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _run(code):
+    return subprocess.run([sys.executable,'-c',code],cwd=HERE,capture_output=True,text=True,check=True).stdout.split()
+
+def test_import_does_not_load_pandas_numpy_or_requests():
+    loaded = _run('import sys, dbapi; print(*[m in sys.modules for m in ("pandas","numpy","requests")])')
+    assert loaded == ['False','False','False']
+
+def test_standard_library_modules_are_not_proxied():
+    same = _run('import asyncio, sqlite3, email.utils, urllib.parse, concurrent.futures, dbapi\n'
+                'print(dbapi.asyncio is asyncio, dbapi.sqlite3 is sqlite3, dbapi.email is email, dbapi.urllib is urllib, dbapi.concurrent is concurrent)')
+    assert same == ['True']*5
+
+def test_lazy_module_loads_on_first_use():
+    loaded = _run('import sys, dbapi; before = "pandas" in sys.modules; dbapi.pd.Series\n'
+                  'print(before, "pandas" in sys.modules, dbapi.pd._module is sys.modules["pandas"])')
+    assert loaded == ['False','True','True']
@@ -0,0 +1,73 @@
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+import dbapi
+
+BASKET = dbapi._SERIES_ARRAYS['baskets/{id}/output-file']
+
+@pytest.fixture(params=['json','orjson','ujson'])
+def backend(request):
+    if request.param != 'json':
+        pytest.importorskip(request.param)
+    dbapi.set_json_backend(request.param)
+    yield request.param
+    dbapi.set_json_backend('json')
+
+def test_standard_library_is_the_default():
+    code = 'import sys, dbapi; dbapi.json_loads(b"{}"); print(dbapi.json_backend(), "orjson" in sys.modules, "ujson" in sys.modules)'
+    out = subprocess.run([sys.executable,'-c',code],cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                         capture_output=True,text=True,check=True).stdout.split()
+    assert out == ['json','False','False']
+
+def test_unknown_backend_is_refused():
+    with pytest.raises(Exception):
+        dbapi.set_json_backend('simplejson')
+    assert dbapi.json_backend() == 'json'
+
+def test_series_observations_become_arrays(backend):
+    body = b'{"mnemonic":"A.B","data":{"freq":"MONTHLY","periods":3,"data":[1.5, null ,-2e3]},"meta":{"data":[1,2]}}'
+    js = dbapi.json_loads_arrays(body)
+    assert js['data']['data'].dtype == np.float64
+    assert np.array_equal(js['data']['data'],[1.5,np.nan,-2000.0],equal_nan=True)
+    # numeric "data" lists elsewhere stay lists
+    assert js['meta'] == {'data':[1,2]}
+    assert dbapi.json_backend() == backend
+
+def test_only_the_series_path_is_converted(backend):
+    body = json.dumps({'series':[{'data':{'data':[1,2]}},{'data':{'data':[]}},{'data':{'data':[None,None]}}],
+                       'data':[],'other':[{'data':[None]}]}).encode()
+    js = dbapi.json_loads_arrays(body,BASKET)
+    arrays = [s['data']['data'] for s in js['series']]
+    assert all(isinstance(a,np.ndarray) for a in arrays)
+    assert list(arrays[0]) == [1,2] and len(arrays[1]) == 0 and np.isnan(arrays[2]).all()
+    assert js['data'] == [] and js['other'] == [{'data':[None]}]
+    # with the /series path nothing in a basket output is converted
+    assert dbapi.json_loads_arrays(body) == json.loads(body)
+
+@pytest.mark.filterwarnings('ignore:string or file could not be read:DeprecationWarning')
+def test_invalid_tokens_fail_like_the_plain_decoder(backend):
+    for body in (b'{"data":{"data":[1,nul]}}',b'{"data":{"data":[1,e]}}',b'{"data":[1,2,]}'):
+        with pytest.raises(ValueError):
+            dbapi.json_loads(body)
+        with pytest.raises(ValueError):
+            dbapi.json_loads_arrays(body)
+
+def test_empty_multiseries_items_keep_their_lists(mock_server, backend):
+    mock = mock_server(unknown=['BAD.X'])
+    api = mock.client(numpy_arrays=True)
+    assert list(api.get_multiseries(['A.B','BAD.X'])) == ['A.B']
+    js = dbapi.json_loads_arrays(b'{"data":[{"mnemonic":"A.B","data":[]}]}')
+    assert js == {'data':[{'mnemonic':'A.B','data':[]}]}
+
+def test_numpy_arrays_match_lists(mock_server, backend):
+    mock = mock_server()
+    plain = mock.client().get_series('A.B')
+    series = mock.client(numpy_arrays=True).get_series('A.B')
+    assert series.equals(plain)
+    values = mock.client(numpy_arrays=True).get_series_json('A.B')['data']['data']
+    assert isinstance(values,np.ndarray) and np.array_equal(values,mock.client().get_series_json('A.B')['data']['data'])
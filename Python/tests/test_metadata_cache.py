@@ -0,0 +1,75 @@
+import asyncio
+import time
+
+import dbapi
+
+def test_metadata_cache_is_off_by_default(mock_server):
+    mock = mock_server()
+    api = mock.client()
+    assert api.metadata_cache is None
+    api.get_frequencies()
+    api.get_frequencies()
+    assert mock.requests['frequencies'] == 2
+
+def test_metadata_is_served_from_the_cache(mock_server):
+    mock = mock_server()
+    api = mock.client(metadata_cache=True)
+    first = api.get_frequencies()
+    first.append('changed by the caller')
+    assert api.get_frequencies() == first[:-1]
+    assert mock.requests['frequencies'] == 1
+    assert api.metadata_cache.stats()['hits'] == 1
+
+def test_basket_changes_invalidate_basket_entries(mock_server):
+    mock = mock_server()
+    api = mock.client(metadata_cache=True)
+    api.get_frequencies()
+    assert api.get_baskets_list() == []
+    basket = api.create_basket('cached')
+    assert [b['basketId'] for b in api.get_baskets_list()] == [basket['basketId']]
+    assert api.get_basket_contents(basket['basketId']) == []
+    api.add_series_to_basket(basket['basketId'],['A.B'])
+    assert [s['mnemonic'] for s in api.get_basket_contents(basket['basketId'])] == ['A.B']
+    api.delete_basket(basket['basketId'])
+    assert api.get_baskets_list() == []
+    # entries outside /baskets stay
+    api.get_frequencies()
+    assert mock.requests['frequencies'] == 1
+
+def test_failed_requests_are_not_cached(mock_server):
+    mock = mock_server()
+    api = mock.client(metadata_cache=True)
+    mock.inject(404,endpoint='frequencies')
+    assert api.get_frequencies() == {}
+    assert api.get_frequencies() != {}
+    api.get_frequencies()
+    assert mock.requests['frequencies'] == 2
+
+def test_entries_expire_and_are_evicted():
+    cache = dbapi.MetadataCache(max_entries=2,ttl=0.05)
+    cache.put('a',1)
+    cache.put('b',2)
+    assert cache.get('a') == (True,1)
+    cache.put('c',3)
+    # 'b' was the least recently used
+    assert cache.get('b') == (False,None) and cache.get('a') == (True,1)
+    time.sleep(0.1)
+    assert cache.get('c') == (False,None)
+    cache.put('x/1',1)
+    cache.put('y',2)
+    cache.invalidate('x/')
+    assert cache.get('x/1') == (False,None) and cache.get('y') == (True,2)
+    stats = cache.stats()
+    # 'a' (expired but not yet read) made room for 'y'
+    assert stats['evictions'] == 2 and stats['expired'] == 1 and stats['invalidations'] == 1
+
+def test_async_basket_changes_invalidate_basket_entries(mock_server):
+    mock = mock_server()
+    async def main():
+        async with mock.client(dbapi.AsyncDataBuffetAPI,metadata_cache=True) as api:
+            before = await api.get_baskets_list()
+            await api.create_basket('cached')
+            return before, await api.get_baskets_list(), await api.get_baskets_list()
+    before, after, again = asyncio.run(main())
+    assert before == [] and len(after) == 1 and again == after
+    assert mock.requests['baskets'] == 3
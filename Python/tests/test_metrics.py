@@ -0,0 +1,75 @@
+import datetime
+import json
+import warnings
+
+import pytest
+
+import dbapi
+
+def _month():
+    return datetime.datetime.utcnow().strftime('%Y-%m')
+
+def _write_ledger(path, nbytes):
+    with open(path,'w') as f:
+        json.dump({'month':_month(),'bytes':nbytes},f)
+
+def test_metrics_are_off_by_default(mock_server):
+    mock = mock_server()
+    assert mock.client().metrics is None
+    assert isinstance(mock.client(metrics=True).metrics,dbapi.ClientMetrics)
+
+def test_metrics_count_requests_retries_and_bytes(mock_server):
+    mock = mock_server()
+    api = mock.client(metrics=True)
+    mock.inject(429)
+    api.get_series('A.B')
+    stats = api.metrics.snapshot()['endpoints']['series']
+    assert stats['requests'] == 2 and stats['retries'] == 1 and stats['throttled'] == 1 and stats['errors'] == 1
+    assert stats['bytes'] > 0 and sum(stats['latency_buckets']) == 2
+    text = api.metrics.to_prometheus()
+    assert 'dbapi_requests_total{endpoint="series"} 2' in text
+    assert 'dbapi_throttled_total{endpoint="series"} 1' in text
+
+def test_ledger_writes_are_batched(mock_server, tmp_path):
+    mock = mock_server()
+    path = str(tmp_path/'quota.json')
+    ledger = dbapi.QuotaLedger(path,flush_interval=60)
+    api = mock.client(metrics=dbapi.ClientMetrics(ledger))
+    for i in range(5):
+        api.get_series(f'S{i}.B')
+    received = api.metrics.snapshot()['totals']['bytes']
+    # counted in memory, not yet written
+    assert ledger.used() == received
+    assert dbapi.QuotaLedger(path).used() == 0
+    ledger.flush()
+    assert dbapi.QuotaLedger(path).used() == received
+
+def test_ledger_is_shared_between_clients(mock_server, tmp_path):
+    mock = mock_server()
+    path = str(tmp_path/'quota.json')
+    clients = [mock.client(metrics=dbapi.ClientMetrics(dbapi.QuotaLedger(path,refresh=0,flush_interval=0))) for i in range(2)]
+    for api in clients:
+        api.get_series('A.B')
+    total = sum(api.metrics.snapshot()['totals']['bytes'] for api in clients)
+    assert all(api.metrics.ledger.used() == total for api in clients)
+
+def test_requests_are_refused_over_quota(mock_server, tmp_path):
+    mock = mock_server()
+    path = str(tmp_path/'quota.json')
+    _write_ledger(path,2000)
+    api = mock.client(metrics=dbapi.ClientMetrics(path,quota_bytes=1000))
+    with pytest.raises(dbapi.QuotaExceededError):
+        api.get_series('A.B')
+    assert mock.requests.get('series',0) == 0
+
+def test_quota_warning_is_issued_once(mock_server, tmp_path, capsys):
+    mock = mock_server()
+    path = str(tmp_path/'quota.json')
+    _write_ledger(path,850000)
+    api = mock.client(metrics=dbapi.ClientMetrics(path,quota_bytes=1000000))
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        for i in range(3):
+            api.get_series(f'S{i}.B')
+    assert len(caught) == 1 and 'monthly data quota' in str(caught[0].message)
+    assert capsys.readouterr().out == ''
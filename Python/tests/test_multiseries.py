@@ -0,0 +1,68 @@
+import pytest
+
+GOOD = [f'G{i}.X' for i in range(49)]
+
+def _failed(api):
+    return [m for e in api.last_fanout_errors for m in e['mnemonics']]
+
+@pytest.mark.parametrize('reject_unknown',[True,False])
+def test_bad_mnemonic_only_loses_itself(mock_server, capsys, reject_unknown):
+    mock = mock_server(unknown=['BAD.X'],reject_unknown=reject_unknown)
+    api = mock.client()
+    js = api.get_multiseries_json(GOOD[:20] + ['BAD.X'] + GOOD[20:])
+    assert js['error'] is None
+    assert sorted(j['mnemonic'] for j in js['data'] if not j['error']) == sorted(GOOD)
+    assert _failed(api) == ['BAD.X']
+    assert (api.last_fanout_stats['chunks'],api.last_fanout_stats['series'],api.last_fanout_stats['failed']) == (2,49,1)
+    if reject_unknown:
+        # the rejected chunk is bisected down to the bad mnemonic, not re-sent one mnemonic at a time
+        assert 2 < mock.requests['multi-series'] < 25
+    else:
+        # the server's per-item error is returned as sent
+        assert [j['mnemonic'] for j in js['data'] if j['error']] == ['BAD.X']
+        assert mock.requests['multi-series'] == 2
+    # the rejected probes are reported through last_fanout_errors, not printed
+    assert 'Error' not in capsys.readouterr().out
+
+def test_response_keeps_the_single_request_shape(mock_server):
+    mock = mock_server()
+    api = mock.client()
+    one = api.get_multiseries_json(GOOD[:3])
+    many = api.get_multiseries_json(GOOD)
+    assert set(one) == set(many) == {'error','data'}
+    assert one['error'] is None and [j['mnemonic'] for j in many['data']] == GOOD
+    assert api.last_fanout_errors == []
+
+def test_single_chunk_reports_errors_and_stats(mock_server):
+    mock = mock_server(unknown=['BAD.X'],reject_unknown=True)
+    api = mock.client()
+    js = api.get_multiseries_json(GOOD[:5] + ['BAD.X'])
+    assert [j['mnemonic'] for j in js['data']] == GOOD[:5] and js['error'] is None
+    assert api.last_fanout_errors[0]['mnemonics'] == ['BAD.X']
+    assert api.last_fanout_stats['chunks'] == 1 and api.last_fanout_stats['series'] == 5
+
+def test_client_error_is_bisected_not_retried(mock_server):
+    mock = mock_server()
+    mock.inject(400)
+    api = mock.client()
+    js = api.get_multiseries_json(GOOD[:4])
+    assert [j['mnemonic'] for j in js['data']] == GOOD[:4]
+    assert api.last_fanout_errors == []
+    assert mock.requests['multi-series'] == 3
+
+def test_server_error_is_retried_not_bisected(mock_server):
+    mock = mock_server()
+    mock.inject(500,count=6)
+    api = mock.client()
+    # nothing came back: the same empty result as a failed single request
+    assert api.get_multiseries_json(GOOD[:4]) == {}
+    assert api.last_fanout_errors[0]['mnemonics'] == GOOD[:4]
+    assert 'Status 500' in api.last_fanout_errors[0]['error']
+    assert mock.requests['multi-series'] == 6
+    assert api.get_multiseries(GOOD[:4]) != {}
+
+def test_get_multiseries_skips_failed(mock_server):
+    mock = mock_server(unknown=['BAD.X'])
+    ret = mock.client().get_multiseries(GOOD[:3] + ['BAD.X'])
+    assert list(ret) == GOOD[:3]
+    assert all(len(s) == 120 for s in ret.values())
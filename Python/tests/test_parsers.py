@@ -0,0 +1,103 @@
+import io
+import tracemalloc
+import numpy as np
+import pandas as pd
+import pytest
+import dbapi
+
+DOWN = (b'Mnemonic:,FET.IUSA,FRFED.IUSA,\r\nDescription:,"Employment, total",Fed funds,\r\nNative Frequency:,MONTHLY,MONTHLY,\r\n'
+        b'1/31/2000,ND,5.45,\r\n2/29/2000,130.5,5.73,\r\n3/31/2000,131.2,ND,\r\n')
+ACROSS = b'Mnemonic\tDescription\t2000Q1\t2000Q2\t2000Q3\nFGDP$.IUSA\tGDP\t1\t2\t3\nX.Y\tother\tND\t5\t6\n'
+XML = (b'<?xml version="1.0"?><basket><series mnemonic="A.B"><description>desc</description><freqCode>QUARTERLY</freqCode>'
+       b'<data><obs date="2001-03-31" value="1.5"/><obs date="2001-06-30" value="ND"/><obs date="2001-09-30" value="2"/></data></series>'
+       b'<series><mnemonic>C.D</mnemonic><obs><date>2001</date><value>7</value></obs><obs><date>2002</date><value>8</value></obs></series></basket>')
+
+def test_csv_dates_down():
+    batch = dbapi.parse_basket_output(DOWN)
+    assert batch.mnemonics == ['FET.IUSA','FRFED.IUSA']
+    # leading and trailing ND observations are trimmed per series
+    assert batch.starts == ['2000-02-29','2000-01-31'] and batch.freqs == ['M','M']
+    assert np.array_equal(batch.values('FET.IUSA'),[130.5,131.2])
+    assert np.array_equal(batch.values('FRFED.IUSA'),[5.45,5.73])
+    assert batch.meta['description'] == ['Employment, total','Fed funds']
+    frames, meta = batch.to_frames()
+    assert list(frames['M'].index.strftime('%Y-%m-%d')) == ['2000-01-31','2000-02-29','2000-03-31']
+    assert np.isnan(frames['M'].loc['2000-01-31','FET.IUSA'])
+
+def test_text_dates_across():
+    batch = dbapi.parse_basket_output(ACROSS,dtype='float32')
+    assert batch.mnemonics == ['FGDP$.IUSA','X.Y']
+    assert batch.starts == ['2000-03-31','2000-06-30'] and batch.freqs == ['Q-DEC','Q-DEC']
+    assert batch.values('X.Y').dtype == np.float32 and np.array_equal(batch.values('X.Y'),[5,6])
+
+def test_xml(tmp_path):
+    batch = dbapi.parse_basket_output(XML)
+    assert batch.mnemonics == ['A.B','C.D']
+    assert batch.freqs == ['Q-DEC','A-DEC'] and batch.starts == ['2001-03-31','2001-12-31']
+    assert np.array_equal(batch.values('A.B'),[1.5,np.nan,2],equal_nan=True)
+    assert batch.meta['description'] == ['desc',None]
+    # a path is parsed incrementally, with the same result
+    path = tmp_path/'output.xml'
+    path.write_bytes(XML)
+    from_file = dbapi.parse_basket_output(str(path))
+    assert from_file.mnemonics == batch.mnemonics and np.array_equal(from_file.values('C.D'),batch.values('C.D'))
+
+def test_excel():
+    pytest.importorskip('openpyxl')
+    grid = pd.read_csv(io.BytesIO(DOWN),header=None,dtype=object)
+    buffer = io.BytesIO()
+    grid.to_excel(buffer,header=False,index=False)
+    batch = dbapi.parse_basket_output(buffer.getvalue())
+    assert batch.mnemonics == ['FET.IUSA','FRFED.IUSA']
+    assert np.array_equal(batch.values('FET.IUSA'),[130.5,131.2])
+
+def test_parallel_parse_matches_serial():
+    lines = [f'{d:%m/%d/%Y},{i},{"ND" if i % 7 == 0 else i/2}'.encode() for i, d in enumerate(pd.date_range('2000-01-01',periods=300))]
+    data = b'\n'.join(lines) + b'\n'
+    texts, values = dbapi._parse_block(data,',',1)
+    parallel_texts, parallel_values = dbapi._parse_block(data,',',1,workers=3,chunk_size=1024)
+    assert parallel_texts == texts
+    assert np.array_equal(parallel_values,values,equal_nan=True)
+
+def test_xml_and_csv_with_copy_on_write():
+    with pd.option_context('mode.copy_on_write',True):
+        assert np.array_equal(dbapi.parse_basket_output(XML).values('A.B'),[1.5,np.nan,2],equal_nan=True)
+        assert np.array_equal(dbapi.parse_basket_output(DOWN).values('FET.IUSA'),[130.5,131.2])
+
+def test_excel_dates_across():
+    openpyxl = pytest.importorskip('openpyxl')
+    book = openpyxl.Workbook()
+    book.active.append(['Mnemonic','Description'] + [pd.Timestamp(d).to_pydatetime() for d in ('2000-03-31','2000-06-30','2000-09-30')])
+    book.active.append(['A.B','first',1,2,None])
+    book.active.append(['C.D','second','ND',5,6])
+    buffer = io.BytesIO()
+    book.save(buffer)
+    batch = dbapi.parse_basket_output(buffer.getvalue())
+    assert batch.mnemonics == ['A.B','C.D'] and batch.freqs == ['Q-DEC','Q-DEC'] and batch.starts == ['2000-03-31','2000-06-30']
+    assert np.array_equal(batch.values('C.D'),[5,6]) and batch.meta['description'] == ['first','second']
+
+def test_records_stream_into_the_batch():
+    records = (('S%d' % i,'M','2000-01-31',np.full(3,float(i)),{}) for i in range(1000))
+    batch = dbapi.SeriesBatch.from_records(records,'float32')
+    assert len(batch) == 1000 and len(batch.buffer) == 3000 and list(batch.values('S999')) == [999.0]*3
+
+def test_file_is_parsed_in_bounded_memory(tmp_path, monkeypatch):
+    # 2,000 series x 500 observations, ~17 MB of text: only a few blocks of text are held at a time, next to
+    # the 4 MB float32 batch
+    monkeypatch.setattr(dbapi,'_CHUNK_BYTES',256*1024)
+    path = tmp_path/'output.csv'
+    dates = pd.date_range('1980-01-31',periods=500,freq='M').strftime('%Y-%m-%d')
+    rng = np.random.default_rng(0)
+    with open(path,'w') as f:
+        f.write('Mnemonic,Description,' + ','.join(dates) + '\n')
+        for i in range(2000):
+            f.write(f'S{i}.X,series {i},' + ','.join(f'{v:.12f}' for v in rng.uniform(100,1000,500)) + '\n')
+    size = path.stat().st_size
+    tracemalloc.start()
+    try:
+        batch = dbapi.parse_basket_output(str(path),dtype='float32')
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert len(batch) == 2000 and batch.starts[0] == '1980-01-31' and len(batch.values('S1999.X')) == 500
+    assert peak < size / 2
@@ -0,0 +1,64 @@
+import time
+import email.utils
+import dbapi
+
+class _Response:
+    def __init__(self, headers:dict):
+        self.headers = headers
+
+def test_burst_then_paced():
+    limiter = dbapi.RateLimiter(rate=20,per=1.0,burst=3)
+    assert [limiter.acquire() for i in range(3)] == [0.0,0.0,0.0]
+    t0 = time.perf_counter()
+    limiter.acquire()
+    assert 0.03 < time.perf_counter() - t0 < 0.5
+    assert limiter.stats()['requests'] == 4
+
+def test_throttle_blocks_until_retry_after():
+    limiter = dbapi.RateLimiter(rate=1000,burst=10,jitter=0)
+    assert abs(limiter.throttle(0.2) - 0.2) < 0.01
+    t0 = time.perf_counter()
+    limiter.acquire()
+    assert time.perf_counter() - t0 >= 0.19
+    assert limiter.stats()['throttled'] == 1
+
+def test_throttle_backs_off_exponentially_until_success():
+    limiter = dbapi.RateLimiter(backoff=1.0,jitter=0)
+    delays = [round(limiter.throttle()) for i in range(3)]
+    assert delays == [1,2,4]
+    limiter.success()
+    limiter._blocked_until = 0.0
+    assert round(limiter.throttle()) == 1
+
+def test_lock_file_shares_the_bucket(tmp_path):
+    a = dbapi.RateLimiter(rate=1,per=60.0,burst=2,lock_file=str(tmp_path/'limiter'))
+    b = dbapi.RateLimiter(rate=1,per=60.0,burst=2,lock_file=str(tmp_path/'limiter'))
+    a.acquire()
+    b.acquire()
+    assert b.stats()['tokens'] < 1
+    a.throttle(30)
+    assert b.stats()['blocked_for'] > 29
+
+def test_retry_after_header():
+    assert dbapi._retry_after(_Response({})) is None
+    assert dbapi._retry_after(_Response({'Retry-After':'7'})) == 7.0
+    assert dbapi._retry_after(_Response({'Retry-After':'-3'})) == 0.0
+    assert dbapi._retry_after(_Response({'Retry-After':'soon'})) is None
+    when = email.utils.formatdate(time.time() + 30,usegmt=True)
+    assert 25 < dbapi._retry_after(_Response({'Retry-After':when})) <= 30
+
+def test_429_is_retried_after_the_servers_delay(mock_server):
+    mock = mock_server(retry_after=0)
+    limiter = dbapi.RateLimiter(rate=1000,burst=10,jitter=0)
+    api = mock.client(rate_limiter=limiter)
+    mock.inject(429,count=3)
+    assert api.health() == {'status':'ok'}
+    assert mock.requests['health'] == 4
+    assert limiter.stats()['throttled'] == 3 and limiter.stats()['requests'] == 5
+
+def test_429_without_limiter(mock_server):
+    mock = mock_server(retry_after=0)
+    api = mock.client()
+    mock.inject(429,count=2)
+    assert api.health() == {'status':'ok'}
+    assert mock.requests['health'] == 3
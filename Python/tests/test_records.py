@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import dbapi
+
+MNEMONICS = [f'R{i}.IUSA' for i in range(5)]
+
+def test_series_record_matches_get_series(mock_server):
+    mock = mock_server()
+    api = mock.client()
+    record = api.get_series('A.B',as_record=True)
+    assert isinstance(record,dbapi.SeriesRecord) and not hasattr(record,'__dict__')
+    with pytest.raises(AttributeError):
+        record.extra = 1
+    assert len(record) == 120 and isinstance(record.values,np.ndarray)
+    s = api.get_series('A.B')
+    pd.testing.assert_series_equal(record.to_pandas(),s)
+    assert record.index.equals(s.index)
+
+def test_series_batch_shares_one_buffer(mock_server):
+    mock = mock_server()
+    api = mock.client()
+    batch = api.get_multiseries(MNEMONICS,as_records=True)
+    assert isinstance(batch,dbapi.SeriesBatch) and len(batch) == 5
+    assert list(batch.offsets) == [0,120,240,360,480,600] and batch.buffer.dtype == np.float64
+    assert np.shares_memory(batch.values('R2.IUSA'),batch.buffer)
+    assert 'r2.iusa' in batch and 'X.Y' not in batch
+    assert batch[-1].mnemonic == 'R4.IUSA' and [r.mnemonic for r in batch] == MNEMONICS
+    with pytest.raises(KeyError):
+        batch['X.Y']
+
+def test_series_batch_converts_like_get_multiseries(mock_server):
+    mock = mock_server()
+    api = mock.client()
+    batch = api.get_multiseries(MNEMONICS,as_records=True)
+    series = api.get_multiseries(MNEMONICS)
+    for m in MNEMONICS:
+        pd.testing.assert_series_equal(batch.to_pandas(m),series[m])
+    assert list(batch.to_dict()) == MNEMONICS
+    frames, meta = batch.to_frames()
+    expected, expected_meta = api.get_multiseries(MNEMONICS,as_frame=True)
+    pd.testing.assert_frame_equal(frames['M'],expected['M'])
+    assert list(meta.index) == list(expected_meta.index)
+
+def test_float32_batch_halves_the_buffer(mock_server):
+    mock = mock_server()
+    api = mock.client()
+    batch = api.get_multiseries(MNEMONICS,as_records=True)
+    small = api.get_multiseries(MNEMONICS,as_records=True,dtype='float32')
+    assert small.buffer.dtype == np.float32 and small.buffer.nbytes * 2 == batch.buffer.nbytes
+    np.testing.assert_allclose(small.values(0),batch.values(0),rtol=1e-6)
+
+def test_from_records_keeps_metadata():
+    records = [('A.B','MS','2020-01-01',[1.0,np.nan],{'description':'first'}),('C.D','QS-OCT','2020-10-01',[3.0],{})]
+    batch = dbapi.SeriesBatch.from_records(iter(records))
+    assert batch['A.B'].description == 'first' and batch['C.D'].description is None
+    assert np.isnan(batch.values(0)[1]) and list(batch.values(1)) == [3.0]
+    assert batch[1].to_pandas().index[0] == pd.Timestamp('2020-10-01')
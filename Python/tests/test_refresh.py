@@ -0,0 +1,58 @@
+import numpy as np
+import dbapi
+
+def _truncated(cache, mnemonic:str, periods:int):
+    # the stored copy of mnemonic cut back to its first `periods` observations, as stored before a data release
+    key = dbapi.SeriesCache.key('series',mnemonic)
+    js, stale = cache.lookup(key)
+    js['data']['data'] = js['data']['data'][:periods]
+    js['data']['periods'] = periods
+    js['dateUpdated'] = '2019-01-01T00:00:00Z'
+    cache.put(key,js)
+
+def test_refresh_merges_tail(mock_server, tmp_path):
+    mock = mock_server()
+    api = mock.client(cache=str(tmp_path/'cache.db'))
+    full = np.array(api.get_series_json('A.X')['data']['data'])
+    _truncated(api.cache,'A.X',100)
+    ret = api.refresh(None,['A.X'],overlap=4)
+    assert ret['merged'] == ['A.X']
+    # the tail starts `overlap` periods before the last stored one
+    assert ret['periods_fetched'] == 25 and ret['periods_stored'] == 120
+    js, stale = api.cache.lookup(dbapi.SeriesCache.key('series','A.X'))
+    assert np.array_equal(js['data']['data'],full)
+    assert js['data']['startDate'][:10] == '1970-01-31' and js['data']['periods'] == 120
+
+def test_refresh_outcomes(mock_server, tmp_path):
+    mock = mock_server()
+    api = mock.client(cache=str(tmp_path/'cache.db'))
+    api.get_series_json('A.X')
+    api.get_series_json('B.X')
+    _truncated(api.cache,'B.X',100)
+    mock.revise('B.X')
+    ret = api.refresh(None,['A.X','B.X','C.X'])
+    assert ret['unchanged'] == ['A.X']
+    # B.X was revised before its overlap and C.X was never stored: both are pulled whole
+    assert sorted(ret['reloaded']) == ['B.X','C.X'] and ret['merged'] == [] and ret['failed'] == []
+    revised = mock.client().get_series_json('B.X')
+    js, stale = api.cache.lookup(dbapi.SeriesCache.key('series','B.X'))
+    assert np.array_equal(js['data']['data'],np.array(revised['data']['data']))
+    assert js['dateUpdated'] == revised['dateUpdated']
+
+def test_refresh_into_separate_store(mock_server, tmp_path):
+    mock = mock_server()
+    store = dbapi.SeriesCache(str(tmp_path/'store.db'))
+    ret = mock.client().refresh(store,['A.X'])
+    assert ret['reloaded'] == ['A.X']
+    assert store.stats()['entries'] == 1
+
+def test_refresh_failures_are_reported_not_printed(mock_server, tmp_path, capsys):
+    mock = mock_server()
+    api = mock.client(cache=str(tmp_path/'cache.db'))
+    api.get_series_json('A.X')
+    def broken(store, mnemonic, *args):
+        raise ValueError('broken store')
+    api._refresh_series = broken
+    ret = api.refresh(None,['A.X','B.X'])
+    assert sorted(ret['failed']) == ['A.X','B.X']
+    assert capsys.readouterr().out == ''
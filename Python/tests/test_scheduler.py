@@ -0,0 +1,55 @@
+import time
+import pytest
+import dbapi
+
+def _baskets(api, n:int):
+    ids = []
+    for i in range(n):
+        basket_id = api.create_basket(f'scheduled {i}',filetype=dbapi.DBFileType.JSON)['basketId']
+        api.add_series_to_basket(basket_id,[f'S{i}.X'])
+        ids.append(basket_id)
+    return ids
+
+def test_one_status_request_per_tick(mock_server):
+    mock = mock_server(order_time=0.3)
+    api = mock.client()
+    baskets = _baskets(api,10)
+    with dbapi.OrderScheduler(api,min_interval=0.2) as scheduler:
+        futures = []
+        for basket_id in baskets:
+            futures.append(scheduler.run(basket_id))
+            time.sleep(0.01)
+        scheduler.wait(timeout=10)
+    assert all(f.result()['dateFinished'] is not None for f in futures)
+    stats = scheduler.stats()
+    # submitting does not poll: every status request is one listing per tick
+    assert mock.requests['orders'] - 10 == stats['polls'] == stats['status_requests']
+    assert 'orders/{id}' not in mock.requests
+    assert stats['polls'] <= 4
+
+def test_download_on_completion(mock_server):
+    mock = mock_server(order_time=0.1)
+    api = mock.client()
+    basket_id, = _baskets(api,1)
+    with dbapi.OrderScheduler(api,min_interval=0.05,download=True) as scheduler:
+        output = scheduler.run(basket_id).result(timeout=10)
+    assert list(output) == ['S0.X'] and len(output['S0.X']) == 120
+
+def test_order_missing_from_listing_is_polled_by_id(mock_server):
+    mock = mock_server(order_time=0.1)
+    api = mock.client()
+    basket_id, = _baskets(api,1)
+    order = api.run_basket(basket_id)
+    api.get_orders = lambda: []
+    with dbapi.OrderScheduler(api,min_interval=0.05) as scheduler:
+        assert scheduler.submit(order).result(timeout=10)['dateFinished'] is not None
+    assert mock.requests['orders/{id}'] == scheduler.stats()['status_requests'] - scheduler.stats()['polls']
+
+def test_timeout(mock_server):
+    mock = mock_server(order_time=60)
+    api = mock.client()
+    basket_id, = _baskets(api,1)
+    with dbapi.OrderScheduler(api,min_interval=0.05) as scheduler:
+        future = scheduler.run(basket_id,timeout=0.2)
+        with pytest.raises(TimeoutError):
+            future.result(timeout=10)
@@ -0,0 +1,60 @@
+import asyncio
+
+import dbapi
+
+def test_search_all_pages_in_order(mock_server):
+    mock = mock_server()
+    results = mock.client().search_all('gdp',rows=100)
+    assert [r['mnemonic'] for r in results] == [f'GDP{i}.IUSA' for i in range(1000)]
+    assert mock.requests['search'] == 10
+
+def test_search_iter_stops_at_the_limit(mock_server):
+    mock = mock_server()
+    api = mock.client()
+    assert len(api.search_all('gdp',rows=100,limit=250)) == 250
+    assert mock.requests['search'] == 3
+    it = api.search_iter('cpi',rows=100)
+    assert [next(it)['mnemonic'] for i in range(5)] == [f'CPI{i}.IUSA' for i in range(5)]
+    it.close()
+
+def test_completed_query_is_answered_from_the_index(mock_server, tmp_path):
+    mock = mock_server()
+    api = mock.client()
+    index = dbapi.SearchIndex(str(tmp_path/'search.db'))
+    first = api.search_all('gdp',rows=200,index=index)
+    sent = mock.requests['search']
+    # the query key ignores case and spacing
+    assert api.search_all(' GDP ',rows=200,index=index) == first
+    assert api.search_all('gdp',rows=200,index=index,limit=10) == first[:10]
+    assert mock.requests['search'] == sent
+    stats = index.stats()
+    assert stats['results'] == 1000 and stats['queries'] == 1 and stats['hits'] == 2
+    api.search_all('gdp',rows=200,index=index,max_age=0)
+    assert mock.requests['search'] == 2 * sent
+
+def test_limited_query_is_not_stored(mock_server, tmp_path):
+    mock = mock_server()
+    api = mock.client()
+    path = str(tmp_path/'search.db')
+    api.search_all('gdp',rows=100,limit=150,index=path)
+    assert dbapi.SearchIndex(path).query('gdp') is None
+    assert dbapi.SearchIndex(path).stats()['results'] == 200
+
+def test_index_find(mock_server, tmp_path):
+    mock = mock_server()
+    index = dbapi.SearchIndex(str(tmp_path/'search.db'))
+    mock.client().search_all('gdp',rows=100,limit=100,index=index)
+    mock.client().search_all('cpi',rows=100,limit=100,index=index)
+    found = index.find('synthetic CPI 42')
+    assert found[0]['mnemonic'] == 'CPI42.IUSA'
+    assert {r['mnemonic'][:3] for r in index.find('series',limit=500)} == {'GDP','CPI'}
+    assert [r['mnemonic'] for r in index.get(['CPI1.IUSA','X.Y','GDP2.IUSA'])] == ['CPI1.IUSA','GDP2.IUSA']
+
+def test_async_search_all(mock_server, tmp_path):
+    mock = mock_server()
+    async def main():
+        async with mock.client(dbapi.AsyncDataBuffetAPI) as api:
+            return await api.search_all('gdp',rows=100,limit=450,index=str(tmp_path/'search.db'))
+    results = asyncio.run(main())
+    assert [r['mnemonic'] for r in results] == [f'GDP{i}.IUSA' for i in range(450)]
+    assert mock.requests['search'] == 5
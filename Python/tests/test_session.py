@@ -0,0 +1,45 @@
+import threading
+import dbapi
+
+def test_requests_share_one_connection(mock_server):
+    mock = mock_server()
+    api = mock.client()
+    for i in range(20):
+        assert api.health() == {'status':'ok'}
+    api.get_series_json('A.X')
+    # the token request and every API request go over one keep-alive connection
+    assert mock.connections == 1
+    assert api.session is api.session
+
+def test_close_drops_the_session(mock_server):
+    mock = mock_server()
+    with mock.client() as api:
+        api.health()
+        session = api.session
+    assert api._session is None
+    api.health()
+    assert api.session is not session and mock.connections == 2
+
+def test_threads_are_capped_by_a_blocking_pool(mock_server):
+    mock = mock_server(latency=0.01)
+    api = mock.client(pool_maxsize=4,pool_block=True,coalesce=False)
+    api.health()
+    def work():
+        for i in range(10):
+            api.health()
+    threads = [threading.Thread(target=work) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert mock.requests['health'] == 81
+    assert mock.connections <= 4
+
+def test_session_headers(mock_server):
+    mock = mock_server()
+    assert mock.client().session.headers['Accept-Encoding'] == 'gzip, deflate'
+    api = mock.client(gzip=False,keep_alive=False)
+    assert api.session.headers['Accept-Encoding'] == 'identity' and api.session.headers['Connection'] == 'close'
+    api.health()
+    api.health()
+    assert mock.connections == 3
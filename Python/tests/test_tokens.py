@@ -0,0 +1,68 @@
+import os
+import stat
+import time
+import threading
+import dbapi
+
+class _Fetch:
+    def __init__(self, expires_in:float=3600, delay:float=0.05):
+        self.calls = 0
+        self.expires_in = expires_in
+        self.delay = delay
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        time.sleep(self.delay)
+        with self._lock:
+            self.calls += 1
+            return f'Bearer token-{self.calls}', self.expires_in
+
+def _concurrently(fn, n:int=10):
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(fn())) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+def test_concurrent_callers_share_one_fetch():
+    fetch = _Fetch()
+    tokens = dbapi.TokenManager(fetch)
+    assert set(_concurrently(tokens.get)) == {'Bearer token-1'}
+    assert fetch.calls == 1
+    # callers that all saw the same rejected token share one refresh
+    assert set(_concurrently(lambda: tokens.refresh('Bearer token-1'))) == {'Bearer token-2'}
+    assert fetch.calls == 2
+
+def test_token_is_refreshed_before_it_expires():
+    fetch = _Fetch(expires_in=100,delay=0)
+    tokens = dbapi.TokenManager(fetch,margin=300)
+    assert tokens.get() == 'Bearer token-1' and tokens.get() == 'Bearer token-2'
+    tokens.margin = 10
+    assert tokens.get() == 'Bearer token-2'
+
+def test_cache_file_is_private_and_shared(tmp_path):
+    path = str(tmp_path/'token.json')
+    fetch = _Fetch(delay=0)
+    assert dbapi.TokenManager(fetch,'key',cache_file=path).get() == 'Bearer token-1'
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    assert dbapi.TokenManager(fetch,'key',cache_file=path).get() == 'Bearer token-1'
+    assert fetch.calls == 1
+    # another access key does not pick up the cached token
+    assert dbapi.TokenManager(fetch,'other key',cache_file=path).get() == 'Bearer token-2'
+
+def test_clients_share_the_token_file(mock_server, tmp_path):
+    mock = mock_server()
+    path = str(tmp_path/'token.json')
+    for i in range(3):
+        mock.client(token_cache=path).health()
+    assert mock.requests['oauth2/token'] == 1
+
+def test_401_gets_a_new_token(mock_server):
+    mock = mock_server()
+    api = mock.client()
+    api.health()
+    mock.inject(401)
+    assert api.health() == {'status':'ok'}
+    assert mock.requests['oauth2/token'] == 2 and api.tokens.refreshes == 2
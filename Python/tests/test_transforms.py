@@ -0,0 +1,37 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import dbapi
+import dbapi_validate_transforms
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),'fixtures','transforms.json')
+
+def test_engine_agrees_with_the_reference_fixtures():
+    with open(FIXTURES,'r') as f:
+        assert dbapi_validate_transforms.validate(json.load(f))
+
+def test_reference_fixtures_are_up_to_date():
+    with open(FIXTURES,'r') as f:
+        assert json.load(f) == json.loads(json.dumps(dbapi_validate_transforms.reference_fixtures()))
+
+def test_another_anchor_is_rebucketed():
+    s = pd.Series(np.arange(1.0,9.0),index=pd.date_range('2000-03-31',periods=8,freq='Q-DEC'))
+    out = dbapi.convert(s,'QTRNOV',dbapi.ConversionType.Constant)
+    assert out.index.freqstr == 'Q-NOV' and out.index[1] == pd.Timestamp('2000-05-31')
+    # Mar-May: one month of the first quarter, two of the second
+    assert out.iloc[1] == (1 + 2 + 2) / 3 and np.isnan(out.iloc[0]) and np.isnan(out.iloc[-1])
+    summed = dbapi.convert(s,'QTRNOV',dbapi.ConversionType.Constant,observed='SUMMED')
+    assert summed.iloc[1] == 1 / 3 + 2 * 2 / 3
+
+def test_weekly_anchor_is_rebucketed():
+    s = pd.Series(np.arange(6.0),index=pd.date_range('2020-01-05',periods=6,freq='W-SUN'))
+    out = dbapi.convert(s,'WMON',dbapi.ConversionType.Constant)
+    assert out.index.freqstr == 'W-MON'
+    np.testing.assert_allclose(out.iloc[1:-1],np.arange(5) + 1 / 7)
+
+def test_same_periods_are_returned_unchanged():
+    s = pd.Series(np.arange(4.0),index=pd.date_range('2000-03-31',periods=4,freq='Q-DEC'))
+    pd.testing.assert_series_equal(dbapi.convert(s,'QUARTERLY'),s)
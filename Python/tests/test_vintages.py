@@ -0,0 +1,79 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import dbapi
+
+MNEMONICS = ['A.B','C.D']
+VINTAGES = [('201901',1),('201907',1)]
+
+def test_load_vintages_into_a_cube(mock_server, tmp_path):
+    mock = mock_server()
+    api = mock.client()
+    stats = api.load_vintages(str(tmp_path),MNEMONICS,VINTAGES)
+    assert stats['fetched'] == 4 and stats['skipped'] == 0 and stats['failed'] == []
+    cube = dbapi.VintageCube(str(tmp_path))
+    assert sorted(cube.mnemonics()) == MNEMONICS and sorted(cube.vintages('a.b')) == VINTAGES
+    frame = cube.to_frame('A.B')
+    assert list(frame.index) == VINTAGES
+    for (vintage, version), row in zip(frame.index,frame.values):
+        s = api.get_series('A.B',vintage=vintage,vintage_version=version)
+        np.testing.assert_array_equal(row[:len(s)],s.values)
+        assert np.isnan(row[len(s):]).all()
+
+def test_loaded_vintages_are_skipped(mock_server, tmp_path):
+    mock = mock_server()
+    api = mock.client()
+    api.load_vintages(str(tmp_path),MNEMONICS,VINTAGES)
+    sent = mock.requests['series']
+    stats = api.load_vintages(str(tmp_path),MNEMONICS,VINTAGES + [('202001',1)])
+    assert stats['fetched'] == 2 and stats['skipped'] == 4
+    assert mock.requests['series'] == sent + 2
+
+def test_vintages_default_to_the_listing(mock_server, tmp_path):
+    mock = mock_server()
+    api = mock.client()
+    stats = api.load_vintages(str(tmp_path),['A.B'])
+    assert stats['fetched'] == 24 and mock.requests['vintages'] == 1
+    listed = [(v['vintage'],v['version']) for v in api.get_series_vintages('A.B')]
+    assert sorted(dbapi.VintageCube(str(tmp_path)).vintages('A.B')) == sorted(listed)
+
+def test_failed_vintages_are_reported(mock_server, tmp_path):
+    mock = mock_server(unknown=['BAD.X'])
+    api = mock.client()
+    stats = api.load_vintages(str(tmp_path),['A.B','BAD.X'],VINTAGES)
+    assert stats['fetched'] == 2
+    assert sorted((f['mnemonic'],f['vintage']) for f in stats['failed']) == [('BAD.X','201901'),('BAD.X','201907')]
+
+def test_cube_widens_the_date_axis(tmp_path):
+    cube = dbapi.VintageCube(str(tmp_path))
+    cube.add('X.Y','2020',1,'MS','2020-03-01',[1.0,2.0,3.0])
+    cube.add('X.Y','2021',1,'MS','2020-01-01',[0.5,1.5,2.5,3.5,4.5,5.5])
+    cube.add('X.Y','2019',1,'MS','2020-02-01',[9.0])
+    assert cube.dates('X.Y')[0] == pd.Timestamp('2020-01-01') and len(cube.dates('X.Y')) == 6
+    array = cube.array('X.Y')
+    assert not array.flags.writeable
+    np.testing.assert_array_equal(array,[[np.nan,np.nan,1,2,3,np.nan],[0.5,1.5,2.5,3.5,4.5,5.5],[np.nan,9,np.nan,np.nan,np.nan,np.nan]])
+    # rows come back oldest vintage first
+    assert list(cube.history('X.Y','2020-03-01')) == [pytest.approx(np.nan,nan_ok=True),1.0,2.5]
+    with pytest.raises(Exception):
+        cube.add('X.Y','2022',1,'QS-JAN','2020-01-01',[1.0])
+
+def test_revisions_are_differences_between_vintages(tmp_path):
+    cube = dbapi.VintageCube(str(tmp_path))
+    cube.add('X.Y','2020',1,'MS','2020-01-01',[1.0,2.0,3.0])
+    cube.add('X.Y','2021',1,'MS','2020-01-01',[1.5,2.0,2.0])
+    revisions = cube.revisions('X.Y',start='2020-02-01')
+    assert list(revisions.columns) == list(cube.dates('X.Y')[1:]) and list(revisions.iloc[0]) == [0.0,-1.0]
+    assert revisions.index[0] == ('2021',1)
+
+def test_async_load_vintages(mock_server, tmp_path):
+    mock = mock_server()
+    async def main():
+        async with mock.client(dbapi.AsyncDataBuffetAPI) as api:
+            return await api.load_vintages(str(tmp_path),MNEMONICS,VINTAGES)
+    stats = asyncio.run(main())
+    assert stats['fetched'] == 4 and stats['failed'] == []
+    assert dbapi.VintageCube(str(tmp_path)).to_frame('C.D').shape[0] == 2